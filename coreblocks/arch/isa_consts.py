@@ -164,6 +164,7 @@ class ExceptionCause(IntEnum, shape=5):
     STORE_PAGE_FAULT = 15
     _COREBLOCKS_ASYNC_INTERRUPT = 24
     _COREBLOCKS_MISPREDICTION = 25
+    _COREBLOCKS_LOAD_REPLAY = 26
 
 
 @unique
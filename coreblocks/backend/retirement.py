@@ -48,6 +48,9 @@ class Retirement(Elaboratable):
 
         self.instret_csr = DoubleCounterCSR(gen_params, CSRAddress.INSTRET, CSRAddress.INSTRETH)
         self.perf_instr_ret = HwCounter("backend.retirement.retired_instr", "Number of retired instructions")
+        self.perf_instr_squashed = HwCounter(
+            "backend.retirement.squashed_instr", "Number of instructions squashed by a rollback"
+        )
         self.perf_trap_latency = FIFOLatencyMeasurer(
             "backend.retirement.trap_latency",
             "Cycles spent flushing the core after a trap",
@@ -66,13 +69,22 @@ class Retirement(Elaboratable):
     def elaborate(self, platform):
         m = TModule()
 
-        m.submodules += [self.perf_instr_ret, self.perf_trap_latency]
+        m.submodules += [self.perf_instr_ret, self.perf_instr_squashed, self.perf_trap_latency]
 
         m_csr = self.dependency_manager.get_dependency(CSRInstancesKey()).m_mode
         m.submodules.instret_csr = self.instret_csr
 
         side_fx = Signal(init=1)
 
+        # The ROB stores only whether an instruction starts a new tag. Tags are freed in order,
+        # so the tag of the ROB head is tracked here.
+        retiring_tag = Signal(self.gen_params.tag_bits)
+
+        def free_tag(rob_entry):
+            with m.If(rob_entry.rob_data.tag_increment):
+                self.checkpoint_tag_free(m)
+                m.d.sync += retiring_tag.eq(retiring_tag + 1)
+
         def free_phys_reg(rp_dst: Value):
             # mark reg in Register File as free
             self.rf_free(m, rp_dst)
@@ -101,12 +113,21 @@ class Retirement(Elaboratable):
             self.c_rat_restore(m, rl_dst=rob_entry.rob_data.rl_dst, rp_dst=rat_out.old_rp_dst)
 
         retire_valid = Signal()
+        head_squashed = Signal()
         with Transaction().body(m) as validate_transaction:
             # Ensure that when exception is processed, correct entry is alredy in ExceptionCauseRegister
             rob_entry = self.rob_peek(m)
             ecr_entry = self.exception_cause_get(m)
+
+            # Instructions on a mispredicted path were squashed when the branch was rolled back.
+            head_tag = Signal(self.gen_params.tag_bits)
+            m.d.comb += head_tag.eq(retiring_tag + rob_entry.rob_data.tag_increment)
+            m.d.comb += head_squashed.eq(~self.checkpoint_get_active_tags(m).active_tags[head_tag])
+
             m.d.comb += retire_valid.eq(
-                ~rob_entry.exception | (rob_entry.exception & ecr_entry.valid & (ecr_entry.rob_id == rob_entry.rob_id))
+                head_squashed
+                | ~rob_entry.exception
+                | (rob_entry.exception & ecr_entry.valid & (ecr_entry.rob_id == rob_entry.rob_id))
             )
 
         continue_pc_override = Signal()
@@ -119,14 +140,13 @@ class Retirement(Elaboratable):
                     rob_entry = self.rob_peek(m)
                     self.rob_retire(m)
 
-                    with m.If(rob_entry.rob_data.tag_increment):
-                        self.checkpoint_tag_free(m)
+                    free_tag(rob_entry)
 
                     core_empty = self.instr_decrement(m)
 
                     commit = Signal()
 
-                    with m.If(rob_entry.exception):
+                    with m.If(rob_entry.exception & ~head_squashed):
                         self.perf_trap_latency.start(m)
 
                         cause_register = self.exception_cause_get(m)
@@ -152,6 +172,13 @@ class Retirement(Elaboratable):
                             # Do not modify trap related CSRs
                             m.d.av_comb += arch_trap.eq(0)
 
+                            m.d.sync += continue_pc_override.eq(1)
+                            m.d.sync += continue_pc.eq(cause_register.pc)
+                        with m.Elif(cause_register.cause == ExceptionCause._COREBLOCKS_LOAD_REPLAY):
+                            # Load which read stale data - flush core and execute the load again.
+                            m.d.av_comb += commit.eq(0)
+                            m.d.av_comb += arch_trap.eq(0)
+
                             m.d.sync += continue_pc_override.eq(1)
                             m.d.sync += continue_pc.eq(cause_register.pc)
                         with m.Else():
@@ -181,7 +208,11 @@ class Retirement(Elaboratable):
 
                     # Condition is used to avoid FRAT locking during normal operation
                     with condition(m) as cond:
-                        with cond(commit):
+                        with cond(head_squashed):
+                            # FRAT was already restored by the rollback, only the result is discarded.
+                            free_phys_reg(rob_entry.rob_data.rp_dst)
+                            self.perf_instr_squashed.incr(m)
+                        with cond(~head_squashed & commit):
                             retire_instr(rob_entry)
                         with cond():
                             # Not using default condition, because we want to block if branch is not ready
@@ -197,8 +228,7 @@ class Retirement(Elaboratable):
                     rob_entry = self.rob_peek(m)
                     self.rob_retire(m)
 
-                    with m.If(rob_entry.rob_data.tag_increment):
-                        self.checkpoint_tag_free(m)
+                    free_tag(rob_entry)
 
                     core_empty = self.instr_decrement(m)
 
@@ -237,8 +267,8 @@ class Retirement(Elaboratable):
 
                     m.next = "NORMAL"
 
-        # Disable executing any side effects from instructions in core when it is flushed
-        m.d.comb += side_fx.eq(~fsm.ongoing("TRAP_FLUSH"))
+        # Disable executing any side effects from instructions in core when it is flushed or squashed
+        m.d.comb += side_fx.eq(~fsm.ongoing("TRAP_FLUSH") & ~head_squashed)
 
         @def_method(m, self.core_state, nonexclusive=True)
         def _():
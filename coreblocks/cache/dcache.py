@@ -0,0 +1,473 @@
+from functools import reduce
+import operator
+
+from amaranth import *
+import amaranth.lib.memory as memory
+
+from transactron.core import def_method, Priority, TModule
+from transactron import Method, Transaction
+from coreblocks.params import GenParams, DCacheParameters
+from coreblocks.interface.layouts import DCacheLayouts
+from transactron.utils import assign, OneHotSwitchDynamic
+from transactron.lib import *
+from transactron.lib import logging
+from transactron.lib.simultaneous import condition
+from coreblocks.peripherals.bus_adapter import BusMasterInterface
+from coreblocks.func_blocks.fu.lsu.pma import PMAChecker
+
+from coreblocks.cache.iface import CacheInterface, CacheRefillerInterface
+from transactron.utils.transactron_helpers import make_layout
+
+__all__ = [
+    "DCache",
+    "DCacheBypass",
+]
+
+log = logging.HardwareLogger("backend.dcache")
+
+
+class DCacheBypass(Elaboratable, CacheInterface):
+    """Sends all loads and stores directly to the bus."""
+
+    def __init__(
+        self, layouts: DCacheLayouts, params: DCacheParameters, bus_master: BusMasterInterface, depth: int = 4
+    ) -> None:
+        """
+        Parameters
+        ----------
+        layouts : DCacheLayouts
+            Instance of DCacheLayouts used to create cache methods.
+        params : DCacheParameters
+            Data cache parameters.
+        bus_master : BusMasterInterface
+            The bus master used to access memory.
+        depth : int
+            Number of requests which can be sent to the bus before the first response is accepted.
+        """
+        self.layouts = layouts
+        self.params = params
+        self.bus_master = bus_master
+        self.depth = depth
+
+        self.issue_req = Method(i=layouts.issue_req)
+        self.accept_res = Method(o=layouts.accept_res)
+        self.flush = Method()
+
+    def elaborate(self, platform):
+        m = TModule()
+
+        m.submodules.requests = requests = BasicFifo([("store", 1)], self.depth)
+
+        @def_method(m, self.issue_req)
+        def _(addr: Value, data: Value, byte_mask: Value, store: Value) -> None:
+            word_addr = addr >> self.params.word_width_bytes_log
+            with condition(m) as branch:
+                with branch(store):
+                    self.bus_master.request_write(m, addr=word_addr, data=data, sel=byte_mask)
+                with branch():
+                    self.bus_master.request_read(m, addr=word_addr, sel=byte_mask, burst=0, wrap_log=0)
+
+            requests.write(m, store=store)
+
+        @def_method(m, self.accept_res)
+        def _():
+            data = Signal(self.params.word_width)
+            err = Signal()
+
+            request = requests.read(m)
+            with condition(m) as branch:
+                with branch(request.store):
+                    res = self.bus_master.get_write_response(m)
+                    m.d.comb += err.eq(res.err)
+                with branch():
+                    res = self.bus_master.get_read_response(m)
+                    m.d.comb += err.eq(res.err)
+                    m.d.comb += data.eq(res.data)
+
+            return {"data": data, "error": err}
+
+        @def_method(m, self.flush)
+        def _() -> None:
+            pass
+
+        return m
+
+
+class DCache(Elaboratable, CacheInterface):
+    """A simple set-associative, non-blocking data cache.
+
+    The cache is write-through and doesn't allocate lines on stores. Every store is sent
+    to the bus and, if it hits, the cached word is updated after the bus confirms the write.
+    Accesses to regions marked as MMIO by the physical memory attributes are never cached.
+
+    A load miss starts a refill of its line. The refiller returns the missing word first,
+    and the load is answered as soon as it arrives. While the rest of the line is being
+    refilled, the cache keeps serving loads which hit (hit-under-miss). Misses, stores and
+    uncached loads need the bus, so they wait until the refill is over. Results are always
+    returned in the order of requests.
+
+    The replacement policy is round robin: one global counter selects the way which is
+    refilled next.
+    """
+
+    def __init__(self, gen_params: GenParams, refiller: CacheRefillerInterface, bus_master: BusMasterInterface) -> None:
+        """
+        Parameters
+        ----------
+        gen_params : GenParams
+            Core generation parameters.
+        refiller : CacheRefillerInterface
+            Refiller of the cache lines. It should return the word with the address passed to
+            `start_refill` first, and it has to finish using the bus before returning the last word.
+        bus_master : BusMasterInterface
+            The bus master used for stores and uncached loads. Shared with the refiller.
+        """
+        self.gen_params = gen_params
+        self.layouts = gen_params.get(DCacheLayouts)
+        self.params = gen_params.dcache_params
+
+        self.refiller = refiller
+        self.bus_master = bus_master
+
+        self.issue_req = Method(i=self.layouts.issue_req)
+        self.accept_res = Method(o=self.layouts.accept_res)
+        self.flush = Method()
+        self.flush.add_conflict(self.issue_req, Priority.LEFT)
+
+        self.addr_layout = make_layout(
+            ("offset", self.params.offset_bits),
+            ("index", self.params.index_bits),
+            ("tag", self.params.tag_bits),
+        )
+
+        self.perf_loads = HwCounter("backend.dcache.loads", "Number of cacheable loads sent to the L1 Data Cache")
+        self.perf_hits = HwCounter("backend.dcache.hits")
+        self.perf_misses = HwCounter("backend.dcache.misses")
+        self.perf_hits_under_miss = HwCounter(
+            "backend.dcache.hits_under_miss", "Number of hits served while a line was being refilled"
+        )
+        self.perf_stores = HwCounter("backend.dcache.stores")
+        self.perf_uncached = HwCounter("backend.dcache.uncached", "Number of loads from uncached regions")
+        self.perf_errors = HwCounter("backend.dcache.refill_errors")
+        self.perf_flushes = HwCounter("backend.dcache.flushes")
+
+    def deserialize_addr(self, raw_addr: Value) -> dict[str, Value]:
+        return {
+            "offset": raw_addr[: self.params.offset_bits],
+            "index": raw_addr[self.params.index_start_bit : self.params.index_end_bit + 1],
+            "tag": raw_addr[-self.params.tag_bits :],
+        }
+
+    def elaborate(self, platform):
+        m = TModule()
+
+        m.submodules += [
+            self.perf_loads,
+            self.perf_hits,
+            self.perf_misses,
+            self.perf_hits_under_miss,
+            self.perf_stores,
+            self.perf_uncached,
+            self.perf_errors,
+            self.perf_flushes,
+        ]
+
+        m.submodules.mem = self.mem = DCacheMemory(self.params)
+        m.submodules.pma_checker = pma_checker = PMAChecker(self.gen_params)
+        m.submodules.res_fwd = res_fwd = Forwarder(self.layouts.accept_res)
+
+        flush_start = Signal()
+        flush_finish = Signal()
+
+        with Transaction().body(m):
+            self.perf_flushes.incr(m, enable_call=flush_finish)
+
+        with m.FSM(init="FLUSH") as fsm:
+            with m.State("FLUSH"):
+                with m.If(flush_finish):
+                    m.next = "LOOKUP"
+
+            with m.State("LOOKUP"):
+                with m.If(flush_start):
+                    m.next = "FLUSH"
+
+        # Replacement policy
+        way_selector = Signal(self.params.num_of_ways, init=1)
+
+        # The request which is currently looked up
+        req_valid = Signal()
+        req = Signal(self.layouts.issue_req)
+        req_uncached = Signal()
+
+        # The request is waiting for its word to be refilled, or for a response from the bus
+        waiting_for_refill = Signal()
+        waiting_for_bus = Signal()
+
+        refill_active = Signal()
+        refill_way = Signal(self.params.num_of_ways)
+        refill_addr = Signal(self.addr_layout)
+        refill_error = Signal()
+        refill_words = Signal(self.params.words_in_line)  # words of the refilled line which already arrived
+
+        mem_read_addr = Signal(self.addr_layout)
+        prev_mem_read_addr = Signal(self.addr_layout)
+        m.d.comb += assign(mem_read_addr, prev_mem_read_addr)
+
+        m.d.comb += [
+            self.mem.tag_rd_index.eq(mem_read_addr.index),
+            self.mem.data_rd_addr.index.eq(mem_read_addr.index),
+            self.mem.data_rd_addr.offset.eq(mem_read_addr.offset),
+        ]
+
+        # Memory outputs always correspond to the looked up request, because the memories
+        # are re-read every cycle and their read ports are transparent.
+        tag_hit = [tag_data.valid & (tag_data.tag == prev_mem_read_addr.tag) for tag_data in self.mem.tag_rd_data]
+        tag_hit_any = reduce(operator.or_, tag_hit)
+
+        # The line which is being refilled isn't valid yet, but the words which already arrived can be read.
+        refill_hit = (
+            refill_active
+            & (prev_mem_read_addr.index == refill_addr.index)
+            & (prev_mem_read_addr.tag == refill_addr.tag)
+            & refill_words.bit_select(prev_mem_read_addr.offset[self.params.word_width_bytes_log :], 1)
+        )
+
+        mem_out = Signal(self.params.word_width)
+        for i in OneHotSwitchDynamic(m, Mux(refill_hit, refill_way, Cat(tag_hit))):
+            m.d.comb += mem_out.eq(self.mem.data_rd_data[i])
+
+        lookup = fsm.ongoing("LOOKUP") & req_valid & ~waiting_for_refill & ~waiting_for_bus
+        cached_load = ~req.store & ~req_uncached
+
+        responding_now = Signal()
+        accepting_requests = ~req_valid | responding_now
+
+        # Fast path - load hits. They can be served during a refill.
+        with Transaction(name="Hit").body(m, ready=lookup & cached_load & (tag_hit_any | refill_hit)):
+            self.perf_hits.incr(m)
+            self.perf_hits_under_miss.incr(m, enable_call=refill_active)
+
+            res_fwd.write(m, data=mem_out, error=0)
+            m.d.comb += responding_now.eq(1)
+            m.d.sync += req_valid.eq(0)
+
+        with Transaction(name="Miss").body(m, ready=lookup & cached_load & ~tag_hit_any & ~refill_active):
+            self.perf_misses.incr(m)
+
+            # Start from the requested word
+            word_addr = Cat(C(0, self.params.word_width_bytes_log), req.addr[self.params.word_width_bytes_log :])
+            log.debug(m, True, "Refilling line 0x{:x}", word_addr)
+            self.refiller.start_refill(m, addr=word_addr)
+
+            m.d.sync += assign(refill_addr, prev_mem_read_addr)
+            m.d.sync += refill_way.eq(way_selector)
+            m.d.sync += refill_error.eq(0)
+            m.d.sync += refill_words.eq(0)
+            m.d.sync += refill_active.eq(1)
+            m.d.sync += waiting_for_refill.eq(1)
+            m.d.sync += way_selector.eq(way_selector.rotate_left(1))
+
+            # The victim line is invalidated for the duration of the refill
+            m.d.comb += [
+                self.mem.way_wr_en.eq(way_selector),
+                self.mem.tag_wr_index.eq(prev_mem_read_addr.index),
+                self.mem.tag_wr_data.valid.eq(0),
+                self.mem.tag_wr_en.eq(1),
+            ]
+
+        # Slow path - stores and uncached loads
+        with Transaction(name="BusRequest").body(m, ready=lookup & ~cached_load & ~refill_active):
+            word_addr = req.addr >> self.params.word_width_bytes_log
+            with condition(m) as branch:
+                with branch(req.store):
+                    self.bus_master.request_write(m, addr=word_addr, data=req.data, sel=req.byte_mask)
+                with branch():
+                    self.bus_master.request_read(m, addr=word_addr, sel=req.byte_mask, burst=0, wrap_log=0)
+
+            m.d.sync += waiting_for_bus.eq(1)
+
+        with Transaction(name="BusResponse").body(m, ready=waiting_for_bus):
+            data = Signal(self.params.word_width)
+            err = Signal()
+
+            with condition(m) as branch:
+                with branch(req.store):
+                    res = self.bus_master.get_write_response(m)
+                    m.d.comb += err.eq(res.err)
+                with branch():
+                    res = self.bus_master.get_read_response(m)
+                    m.d.comb += err.eq(res.err)
+                    m.d.comb += data.eq(res.data)
+
+            res_fwd.write(m, data=data, error=err)
+            m.d.comb += responding_now.eq(1)
+            m.d.sync += waiting_for_bus.eq(0)
+            m.d.sync += req_valid.eq(0)
+
+            # Write-through - update the cached word only when the write succeeded
+            with m.If(req.store & tag_hit_any & ~err):
+                m.d.comb += [
+                    self.mem.way_wr_en.eq(Cat(tag_hit)),
+                    self.mem.data_wr_addr.index.eq(prev_mem_read_addr.index),
+                    self.mem.data_wr_addr.offset.eq(prev_mem_read_addr.offset),
+                    self.mem.data_wr_data.eq(req.data),
+                    self.mem.data_wr_en.eq(req.byte_mask),
+                ]
+
+        # Refilling
+        def write_refilled_word(ret):
+            deserialized = self.deserialize_addr(ret.addr)
+
+            self.perf_errors.incr(m, enable_call=ret.error)
+
+            m.d.comb += [
+                self.mem.way_wr_en.eq(refill_way),
+                self.mem.data_wr_addr.index.eq(deserialized["index"]),
+                self.mem.data_wr_addr.offset.eq(deserialized["offset"]),
+                self.mem.data_wr_data.eq(ret.data),
+                self.mem.data_wr_en.eq(C(1).replicate(self.params.word_width_bytes)),
+            ]
+
+            with m.If(ret.error):
+                m.d.sync += refill_error.eq(1)
+            with m.Else():
+                m.d.sync += refill_words.bit_select(deserialized["offset"][self.params.word_width_bytes_log :], 1).eq(1)
+
+            with m.If(ret.last):
+                m.d.sync += refill_active.eq(0)
+                m.d.comb += [
+                    self.mem.tag_wr_index.eq(refill_addr.index),
+                    self.mem.tag_wr_data.valid.eq(~refill_error & ~ret.error),
+                    self.mem.tag_wr_data.tag.eq(refill_addr.tag),
+                    self.mem.tag_wr_en.eq(1),
+                ]
+
+        # The first refilled word is the one the load is waiting for. The remaining words
+        # are accepted by a separate transaction, which doesn't conflict with load hits.
+        with Transaction(name="RefillFirst").body(m, ready=waiting_for_refill):
+            ret = self.refiller.accept_refill(m)
+            write_refilled_word(ret)
+
+            res_fwd.write(m, data=ret.data, error=ret.error)
+            m.d.comb += responding_now.eq(1)
+            m.d.sync += waiting_for_refill.eq(0)
+            m.d.sync += req_valid.eq(0)
+
+        with Transaction(name="RefillRest").body(m, ready=~waiting_for_refill):
+            ret = self.refiller.accept_refill(m)
+            write_refilled_word(ret)
+
+        @def_method(m, self.accept_res)
+        def _():
+            return res_fwd.read(m)
+
+        @def_method(m, self.issue_req, ready=accepting_requests)
+        def _(addr: Value, data: Value, byte_mask: Value, store: Value) -> None:
+            m.d.comb += pma_checker.addr.eq(addr)
+            uncached = pma_checker.result.mmio
+            self.perf_loads.incr(m, enable_call=~store & ~uncached)
+            self.perf_stores.incr(m, enable_call=store)
+            self.perf_uncached.incr(m, enable_call=~store & uncached)
+
+            deserialized = self.deserialize_addr(addr)
+            m.d.comb += assign(mem_read_addr, deserialized)
+            m.d.sync += assign(prev_mem_read_addr, deserialized)
+
+            m.d.sync += assign(req, {"addr": addr, "data": data, "byte_mask": byte_mask, "store": store})
+            m.d.sync += req_uncached.eq(uncached)
+            m.d.sync += req_valid.eq(1)
+
+        # Flush logic
+        flush_index = Signal(self.params.index_bits)
+        with m.If(fsm.ongoing("FLUSH")):
+            m.d.sync += flush_index.eq(flush_index + 1)
+
+        @def_method(m, self.flush, ready=accepting_requests & ~refill_active)
+        def _() -> None:
+            log.info(m, True, "Flushing the cache...")
+            m.d.sync += flush_index.eq(0)
+            m.d.comb += flush_start.eq(1)
+
+        m.d.comb += flush_finish.eq(flush_index == self.params.num_of_sets - 1)
+
+        with m.If(fsm.ongoing("FLUSH")):
+            m.d.comb += [
+                self.mem.way_wr_en.eq(C(1).replicate(self.params.num_of_ways)),
+                self.mem.tag_wr_index.eq(flush_index),
+                self.mem.tag_wr_data.valid.eq(0),
+                self.mem.tag_wr_data.tag.eq(0),
+                self.mem.tag_wr_en.eq(1),
+            ]
+
+        return m
+
+
+class DCacheMemory(Elaboratable):
+    """A helper module for managing memories used in the data cache.
+
+    Like in the instruction cache, all address and write data lines are shared between ways
+    and writes are multiplexed using one-hot `way_wr_en` signal. The data memory is addressed
+    using machine words and `data_wr_en` selects the written bytes.
+    """
+
+    def __init__(self, params: DCacheParameters) -> None:
+        self.params = params
+
+        self.tag_data_layout = make_layout(("valid", 1), ("tag", self.params.tag_bits))
+
+        self.way_wr_en = Signal(self.params.num_of_ways)
+
+        self.tag_rd_index = Signal(self.params.index_bits)
+        self.tag_rd_data = Array([Signal(self.tag_data_layout) for _ in range(self.params.num_of_ways)])
+        self.tag_wr_index = Signal(self.params.index_bits)
+        self.tag_wr_en = Signal()
+        self.tag_wr_data = Signal(self.tag_data_layout)
+
+        self.data_addr_layout = make_layout(("index", self.params.index_bits), ("offset", self.params.offset_bits))
+
+        self.data_rd_addr = Signal(self.data_addr_layout)
+        self.data_rd_data = Array([Signal(self.params.word_width) for _ in range(self.params.num_of_ways)])
+        self.data_wr_addr = Signal(self.data_addr_layout)
+        self.data_wr_en = Signal(self.params.word_width_bytes)
+        self.data_wr_data = Signal(self.params.word_width)
+
+    def elaborate(self, platform):
+        m = TModule()
+
+        for i in range(self.params.num_of_ways):
+            way_wr = self.way_wr_en[i]
+
+            tag_mem = memory.Memory(shape=self.tag_data_layout, depth=self.params.num_of_sets, init=[])
+            tag_mem_wp = tag_mem.write_port()
+            tag_mem_rp = tag_mem.read_port(transparent_for=[tag_mem_wp])
+            m.submodules[f"tag_mem_{i}"] = tag_mem
+
+            m.d.comb += [
+                assign(self.tag_rd_data[i], tag_mem_rp.data),
+                tag_mem_rp.addr.eq(self.tag_rd_index),
+                tag_mem_wp.addr.eq(self.tag_wr_index),
+                assign(tag_mem_wp.data, self.tag_wr_data),
+                tag_mem_wp.en.eq(self.tag_wr_en & way_wr),
+            ]
+
+            data_mem = memory.Memory(
+                shape=self.params.word_width, depth=self.params.num_of_sets * self.params.words_in_line, init=[]
+            )
+            data_mem_wp = data_mem.write_port(granularity=8)
+            data_mem_rp = data_mem.read_port(transparent_for=[data_mem_wp])
+            m.submodules[f"data_mem_{i}"] = data_mem
+
+            # We address the data RAM using machine words, so we have to
+            # discard a few least significant bits from the address.
+            rd_addr = Cat(self.data_rd_addr.offset, self.data_rd_addr.index)[self.params.word_width_bytes_log :]
+            wr_addr = Cat(self.data_wr_addr.offset, self.data_wr_addr.index)[self.params.word_width_bytes_log :]
+
+            m.d.comb += [
+                self.data_rd_data[i].eq(data_mem_rp.data),
+                data_mem_rp.addr.eq(rd_addr),
+                data_mem_wp.addr.eq(wr_addr),
+                assign(data_mem_wp.data, self.data_wr_data),
+                data_mem_wp.en.eq(self.data_wr_en & way_wr.replicate(self.params.word_width_bytes)),
+            ]
+
+        return m
@@ -1,6 +1,3 @@
-from functools import reduce
-import operator
-
 from amaranth import *
 from amaranth.lib.data import View
 import amaranth.lib.memory as memory
@@ -8,7 +5,7 @@ from amaranth.utils import exact_log2
 
 from transactron.core import def_method, Priority, TModule
 from transactron import Method, Transaction
-from coreblocks.params import ICacheParameters
+from coreblocks.params import ICacheParameters, ICacheReplacementPolicy
 from coreblocks.interface.layouts import ICacheLayouts
 from transactron.utils import assign, OneHotSwitchDynamic
 from transactron.lib import *
@@ -16,6 +13,7 @@ from transactron.lib import logging
 from coreblocks.peripherals.bus_adapter import BusMasterInterface
 
 from coreblocks.cache.iface import CacheInterface, CacheRefillerInterface
+from coreblocks.cache.prefetcher import ICachePrefetcher
 from transactron.utils.transactron_helpers import make_layout
 
 __all__ = [
@@ -50,6 +48,8 @@ class ICacheBypass(Elaboratable, CacheInterface):
                 m,
                 addr=addr >> exact_log2(self.params.word_width_bytes),
                 sel=C(1).replicate(self.bus_master.params.data_width // self.bus_master.params.granularity),
+                burst=0,
+                wrap_log=0,
             )
 
         @def_method(m, self.accept_res)
@@ -70,15 +70,25 @@ class ICacheBypass(Elaboratable, CacheInterface):
 class ICache(Elaboratable, CacheInterface):
     """A simple set-associative instruction cache.
 
-    The replacement policy is a pseudo random scheme. Every time a line is trashed,
-    we select the next way we write to (we keep one global counter for selecting the next way).
+    The replacement policy is selected by the `replacement` parameter. The pseudo-LRU and LRU
+    policies are kept separately for every set, and are updated on every hit and refill.
 
     Refilling a cache line is abstracted away from this module. ICache module needs two methods
     from the refiller `refiller_start`, which is called whenever we need to refill a cache line.
+    It is passed the address of the fetch block which missed - the refiller should return that
+    fetch block first, and then the rest of the line, wrapping around at the end of the line.
     `refiller_accept` should be ready to be called whenever the refiller has another fetch block
     ready to be written to cache. `refiller_accept` should set `last` bit when either an error
     occurs or the transfer is over. After issuing `last` bit, `refiller_accept` shouldn't be ready
     until the next transfer is started.
+
+    The fetch block which missed is returned as soon as it arrives from the refiller, so that
+    the fetch can restart while the rest of the line is being refilled. During the refill,
+    requests which hit in other lines are served (hit-under-miss), and requests to the line
+    being refilled are served as soon as their fetch block arrives. Requests which miss wait
+    until the refill is finished.
+
+    If `prefetch_lines` is set in the parameters, the refiller is wrapped in an `ICachePrefetcher`.
     """
 
     def __init__(self, layouts: ICacheLayouts, params: ICacheParameters, refiller: CacheRefillerInterface) -> None:
@@ -112,8 +122,14 @@ class ICache(Elaboratable, CacheInterface):
         )
 
         self.perf_loads = HwCounter("frontend.icache.loads", "Number of requests to the L1 Instruction Cache")
-        self.perf_hits = HwCounter("frontend.icache.hits")
-        self.perf_misses = HwCounter("frontend.icache.misses")
+        self.perf_hits = HwCounter("frontend.icache.hits", "Number of requests which hit in the cache")
+        self.perf_misses = HwCounter("frontend.icache.misses", "Number of requests which caused a refill")
+        self.perf_hits_under_miss = HwCounter(
+            "frontend.icache.hits_under_miss", "Number of requests which hit in the cache during a refill"
+        )
+        self.perf_evictions = HwCounter(
+            "frontend.icache.evictions", "Number of refills which replaced a valid cache line"
+        )
         self.perf_errors = HwCounter("frontend.icache.fetch_errors")
         self.perf_flushes = HwCounter("frontend.icache.flushes")
         self.req_latency = FIFOLatencyMeasurer(
@@ -137,19 +153,26 @@ class ICache(Elaboratable, CacheInterface):
             self.perf_loads,
             self.perf_hits,
             self.perf_misses,
+            self.perf_hits_under_miss,
+            self.perf_evictions,
             self.perf_errors,
             self.perf_flushes,
             self.req_latency,
         ]
 
         m.submodules.mem = self.mem = ICacheMemory(self.params)
+
+        refiller = self.refiller
+        prefetcher = None
+        if self.params.prefetch_lines:
+            m.submodules.prefetcher = refiller = prefetcher = ICachePrefetcher(self.layouts, self.params, self.refiller)
+
         m.submodules.req_zipper = req_zipper = ArgumentsToResultsZipper(self.addr_layout, self.layouts.accept_res)
 
         # State machine logic
         needs_refill = Signal()
         refill_finish = Signal()
         refill_error = Signal()
-        refill_error_saved = Signal()
 
         flush_start = Signal()
         flush_finish = Signal()
@@ -172,11 +195,6 @@ class ICache(Elaboratable, CacheInterface):
                 with m.If(refill_finish):
                     m.next = "LOOKUP"
 
-        # Replacement policy
-        way_selector = Signal(self.params.num_of_ways, init=1)
-        with m.If(refill_finish):
-            m.d.sync += way_selector.eq(way_selector.rotate_left(1))
-
         # Fast path - read requests
         mem_read_addr = Signal(self.addr_layout)
         prev_mem_read_addr = Signal(self.addr_layout)
@@ -186,33 +204,92 @@ class ICache(Elaboratable, CacheInterface):
         forwarding_response_now = Signal()
         accepting_requests = ~mem_read_output_valid | forwarding_response_now
 
-        with Transaction(name="MemRead").body(
-            m, ready=fsm.ongoing("LOOKUP") & (mem_read_output_valid | refill_error_saved)
-        ):
-            req_addr = req_zipper.peek_arg(m)
+        # The line being refilled, and the way it is written to
+        refill_addr = Signal(self.addr_layout)
+        refill_way = Signal(self.params.num_of_ways)
+        # The request which caused the refill waits for the first fetch block from the refiller
+        restart_pending = Signal()
+
+        # Fetch blocks of the line being refilled which were already written to the memory
+        refill_arrived = Signal(self.params.fetch_blocks_in_line)
+        refilling = fsm.ongoing("REFILL")
+
+        def fetch_block_in_line(offset: Value) -> Value:
+            return offset[self.params.fetch_block_bytes_log :]
+
+        def lookup(req_addr: View) -> Value:
+            """Returns the one-hot way in which the request hits."""
+            # The way which is being refilled doesn't hold the old line anymore
+            refill_set = refilling & (req_addr.index == refill_addr.index)
+            tag_hit = Cat(
+                tag_data.valid & (tag_data.tag == req_addr.tag) & ~(refill_set & refill_way[i])
+                for i, tag_data in enumerate(self.mem.tag_rd_data)
+            )
+            refill_hit = (
+                refill_set
+                & (req_addr.tag == refill_addr.tag)
+                & refill_arrived.bit_select(fetch_block_in_line(req_addr.offset), 1)
+            )
+            return Mux(refill_hit, refill_way, tag_hit)
+
+        def respond_hit(req_addr: View, hit_way: Value):
+            m.d.comb += forwarding_response_now.eq(1)
+            self.perf_hits.incr(m)
+            m.d.comb += [
+                self.mem.access_index.eq(req_addr.index),
+                self.mem.access_way.eq(hit_way),
+                self.mem.access_en.eq(1),
+            ]
+            mem_out = Signal(self.params.fetch_block_bytes * 8)
+            for i in OneHotSwitchDynamic(m, hit_way):
+                m.d.av_comb += mem_out.eq(self.mem.data_rd_data[i])
 
-            tag_hit = [tag_data.valid & (tag_data.tag == req_addr.tag) for tag_data in self.mem.tag_rd_data]
-            tag_hit_any = reduce(operator.or_, tag_hit)
+            req_zipper.write_results(m, fetch_block=mem_out, error=0)
 
-            with m.If(tag_hit_any | refill_error_saved):
-                m.d.comb += forwarding_response_now.eq(1)
-                self.perf_hits.incr(m, enable_call=tag_hit_any)
-                mem_out = Signal(self.params.fetch_block_bytes * 8)
-                for i in OneHotSwitchDynamic(m, Cat(tag_hit)):
-                    m.d.av_comb += mem_out.eq(self.mem.data_rd_data[i])
+        with Transaction(name="MemRead").body(m, ready=fsm.ongoing("LOOKUP") & mem_read_output_valid):
+            req_addr = req_zipper.peek_arg(m)
+            hit_way = lookup(req_addr)
+
+            m.d.comb += self.mem.victim_index.eq(req_addr.index)
 
-                req_zipper.write_results(m, fetch_block=mem_out, error=refill_error_saved)
-                m.d.sync += refill_error_saved.eq(0)
-                m.d.sync += mem_read_output_valid.eq(0)
+            with m.If(hit_way.any()):
+                respond_hit(req_addr, hit_way)
             with m.Else():
                 self.perf_misses.incr(m)
 
                 m.d.comb += needs_refill.eq(1)
-
-                # Align to the beginning of the cache line
-                aligned_addr = self.serialize_addr(req_addr) & ~((1 << self.params.offset_bits) - 1)
+                m.d.sync += assign(refill_addr, req_addr)
+                m.d.sync += refill_way.eq(self.mem.victim_way)
+                # The replacement state is updated when the line is allocated, so that hits
+                # served during the refill are ordered after it
+                m.d.comb += [
+                    self.mem.fill_index.eq(req_addr.index),
+                    self.mem.fill_way.eq(self.mem.victim_way),
+                    self.mem.fill_en.eq(1),
+                ]
+                m.d.sync += refill_arrived.eq(0)
+                m.d.sync += restart_pending.eq(1)
+
+                victim_valid = Cat(tag_data.valid for tag_data in self.mem.tag_rd_data) & self.mem.victim_way
+                self.perf_evictions.incr(m, enable_call=victim_valid.any())
+
+                # Align to the beginning of the fetch block, the refill starts from it
+                aligned_addr = self.serialize_addr(req_addr) & ~(self.params.fetch_block_bytes - 1)
                 log.debug(m, True, "Refilling line 0x{:x}", aligned_addr)
-                self.refiller.start_refill(m, addr=aligned_addr)
+                refiller.start_refill(m, addr=aligned_addr)
+
+        # Hit-under-miss - during a refill, requests which hit are served. Misses wait until
+        # the refill is finished.
+        with Transaction(name="MemReadRefilling").body(m, ready=refilling & ~restart_pending & mem_read_output_valid):
+            req_addr = req_zipper.peek_arg(m)
+            hit_way = lookup(req_addr)
+
+            with m.If(hit_way.any()):
+                respond_hit(req_addr, hit_way)
+                self.perf_hits_under_miss.incr(m)
+
+        with m.If(forwarding_response_now):
+            m.d.sync += mem_read_output_valid.eq(0)
 
         @def_method(m, self.accept_res)
         def _():
@@ -244,17 +321,19 @@ class ICache(Elaboratable, CacheInterface):
         with m.If(fsm.ongoing("FLUSH")):
             m.d.sync += flush_index.eq(flush_index + 1)
 
-        @def_method(m, self.flush, ready=accepting_requests)
+        @def_method(m, self.flush, ready=accepting_requests & ~fsm.ongoing("REFILL"))
         def _() -> None:
             log.info(m, True, "Flushing the cache...")
             m.d.sync += flush_index.eq(0)
             m.d.comb += flush_start.eq(1)
+            if prefetcher is not None:
+                prefetcher.flush(m)
 
         m.d.comb += flush_finish.eq(flush_index == self.params.num_of_sets - 1)
 
         # Slow path - data refilling
         with Transaction().body(m):
-            ret = self.refiller.accept_refill(m)
+            ret = refiller.accept_refill(m)
             deserialized = self.deserialize_addr(ret.addr)
 
             self.perf_errors.incr(m, enable_call=ret.error)
@@ -268,8 +347,16 @@ class ICache(Elaboratable, CacheInterface):
             m.d.comb += self.mem.data_wr_en.eq(1)
             m.d.comb += refill_finish.eq(ret.last)
             m.d.comb += refill_error.eq(ret.error)
-            with m.If(ret.error):
-                m.d.sync += refill_error_saved.eq(1)
+
+            with m.If(~ret.error):
+                m.d.sync += refill_arrived.eq(refill_arrived | (1 << fetch_block_in_line(deserialized["offset"])))
+
+            # Early restart - the first fetch block is the one which was requested
+            with condition(m, nonblocking=True) as branch:
+                with branch(restart_pending):
+                    m.d.comb += forwarding_response_now.eq(1)
+                    req_zipper.write_results(m, fetch_block=ret.fetch_block, error=ret.error)
+            m.d.sync += restart_pending.eq(0)
 
         with m.If(fsm.ongoing("FLUSH")):
             m.d.comb += [
@@ -281,10 +368,10 @@ class ICache(Elaboratable, CacheInterface):
             ]
         with m.Else():
             m.d.comb += [
-                self.mem.way_wr_en.eq(way_selector),
-                self.mem.tag_wr_index.eq(mem_read_addr.index),
+                self.mem.way_wr_en.eq(refill_way),
+                self.mem.tag_wr_index.eq(refill_addr.index),
                 self.mem.tag_wr_data.valid.eq(~refill_error),
-                self.mem.tag_wr_data.tag.eq(mem_read_addr.tag),
+                self.mem.tag_wr_data.tag.eq(refill_addr.tag),
                 self.mem.tag_wr_en.eq(refill_finish),
             ]
 
@@ -299,6 +386,11 @@ class ICacheMemory(Elaboratable):
     ways are separately exposed (as an array).
 
     The data memory is addressed using fetch blocks.
+
+    The module also keeps the state of the replacement policy. The way to be replaced
+    in the set `victim_index` is given by the one-hot `victim_way` signal. Accesses to
+    a line (`access_*` signals) and allocations of a line for a refill (`fill_*` signals)
+    update the state. If both happen in the same cycle, the access is ignored.
     """
 
     def __init__(self, params: ICacheParameters) -> None:
@@ -324,6 +416,64 @@ class ICacheMemory(Elaboratable):
         self.data_wr_en = Signal()
         self.data_wr_data = Signal(self.fetch_block_bits)
 
+        self.victim_index = Signal(self.params.index_bits)
+        self.victim_way = Signal(self.params.num_of_ways)
+        self.access_index = Signal(self.params.index_bits)
+        self.access_way = Signal(self.params.num_of_ways)
+        self.access_en = Signal()
+        self.fill_index = Signal(self.params.index_bits)
+        self.fill_way = Signal(self.params.num_of_ways)
+        self.fill_en = Signal()
+
+    def plru_victim(self, state: Value) -> Value:
+        """Follows the tree bits from the root. A bit set to 1 points to the upper half of the ways."""
+        ways = self.params.num_of_ways
+        victim = []
+        for w in range(ways):
+            path = []
+            node = 0
+            for level in reversed(range(exact_log2(ways))):
+                bit = (w >> level) & 1
+                path.append(state[node] == bit)
+                node = 2 * node + 1 + bit
+            victim.append(Cat(path).all())
+        return Cat(victim)
+
+    def plru_update(self, state: Value, way: Value) -> Value:
+        """Points the tree bits on the path to the accessed way away from it."""
+        ways = self.params.num_of_ways
+        bits = []
+        for node in range(ways - 1):
+            # A node at depth `d` covers `ways >> d` consecutive ways
+            depth = (node + 1).bit_length() - 1
+            size = ways >> depth
+            first = (node + 1 - 2**depth) * size
+            lower = way[first : first + size // 2]
+            upper = way[first + size // 2 : first + size]
+            bits.append(Mux(lower.any(), 1, Mux(upper.any(), 0, state[node])))
+        return Cat(bits)
+
+    def lru_pairs(self) -> list[tuple[int, int]]:
+        ways = self.params.num_of_ways
+        return [(i, j) for i in range(ways) for j in range(i + 1, ways)]
+
+    def lru_victim(self, state: Value) -> Value:
+        """The bit of the pair (i, j), i < j, is set if way i was used less recently than way j."""
+        ways = self.params.num_of_ways
+        pairs = self.lru_pairs()
+        victim = []
+        for w in range(ways):
+            older = [state[k] if i == w else ~state[k] for k, (i, j) in enumerate(pairs) if w in (i, j)]
+            victim.append(Cat(older).all())
+        return Cat(victim)
+
+    def lru_update(self, state: Value, way: Value) -> Value:
+        """Makes the accessed way the most recently used one."""
+        bits = []
+        for k, (i, j) in enumerate(self.lru_pairs()):
+            bits.append(Mux(way[i], 0, Mux(way[j], 1, state[k])))
+        return Cat(bits)
+
     def elaborate(self, platform):
         m = TModule()
 
@@ -363,4 +513,35 @@ class ICacheMemory(Elaboratable):
                 data_mem_wp.en.eq(self.data_wr_en & way_wr),
             ]
 
+        if self.params.num_of_ways == 1:
+            m.d.comb += self.victim_way.eq(1)
+        elif self.params.replacement == ICacheReplacementPolicy.ROUND_ROBIN:
+            way_selector = Signal(self.params.num_of_ways, init=1)
+            with m.If(self.fill_en):
+                m.d.sync += way_selector.eq(way_selector.rotate_left(1))
+            m.d.comb += self.victim_way.eq(way_selector)
+        else:
+            if self.params.replacement == ICacheReplacementPolicy.PLRU:
+                state_bits = self.params.num_of_ways - 1
+                victim, update = self.plru_victim, self.plru_update
+            else:
+                state_bits = len(self.lru_pairs())
+                victim, update = self.lru_victim, self.lru_update
+
+            m.submodules.repl_mem = repl_mem = memory.Memory(shape=state_bits, depth=self.params.num_of_sets, init=[])
+            victim_rp = repl_mem.read_port(domain="comb")
+            update_rp = repl_mem.read_port(domain="comb")
+            update_wp = repl_mem.write_port()
+
+            # Refills have priority over accesses
+            update_way = Mux(self.fill_en, self.fill_way, self.access_way)
+            m.d.comb += [
+                victim_rp.addr.eq(self.victim_index),
+                self.victim_way.eq(victim(victim_rp.data)),
+                update_rp.addr.eq(Mux(self.fill_en, self.fill_index, self.access_index)),
+                update_wp.addr.eq(update_rp.addr),
+                update_wp.data.eq(update(update_rp.data, update_way)),
+                update_wp.en.eq(self.fill_en | self.access_en),
+            ]
+
         return m
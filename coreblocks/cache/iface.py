@@ -33,7 +33,8 @@ class CacheRefillerInterface(HasElaborate, Protocol):
     Parameters
     ----------
     start_refill : Method
-        A method that is used to start a refill for a given cache line.
+        A method that is used to start a refill of the cache line containing the given address.
+        The refill starts from the given address and wraps around at the end of the line.
     accept_refill : Method
         A method that is used to accept one fetch block from the requested cache line.
     """
@@ -0,0 +1,249 @@
+from amaranth import *
+
+from transactron.core import def_method, Priority, TModule
+from transactron import Method, Transaction
+from coreblocks.params import ICacheParameters
+from coreblocks.interface.layouts import ICacheLayouts
+from transactron.lib import logging
+from transactron.lib.metrics import HwCounter
+from transactron.lib.simultaneous import condition
+
+from coreblocks.cache.iface import CacheRefillerInterface
+
+__all__ = ["ICachePrefetcher"]
+
+log = logging.HardwareLogger("frontend.icache.prefetcher")
+
+
+class ICachePrefetcher(Elaboratable, CacheRefillerInterface):
+    """Next-line instruction prefetcher.
+
+    The prefetcher is placed between the instruction cache and its refiller, and provides
+    the same interface as the refiller. It prefetches the next `prefetch_lines` cache lines
+    to a small prefetch buffer, which can hold that many lines. Refills of the lines found
+    in the buffer are served from it, without using the bus.
+
+    Prefetching is triggered by a miss to the line following the previous missed line,
+    and by a refill served from the prefetch buffer. Any other miss stops prefetching.
+    A prefetch is started only when the refiller is idle. A refill which arrives while
+    a prefetch is in progress waits for it to finish.
+
+    Lines with errors are not kept in the buffer.
+
+    Attributes
+    ----------
+    start_refill : Method
+        Starts a refill of a cache line, see `CacheRefillerInterface`.
+    accept_refill : Method
+        Accepts one fetch block of the refilled line, see `CacheRefillerInterface`.
+    flush : Method
+        Invalidates the prefetch buffer and stops prefetching.
+    """
+
+    def __init__(self, layouts: ICacheLayouts, params: ICacheParameters, refiller: CacheRefillerInterface) -> None:
+        """
+        Parameters
+        ----------
+        layouts : ICacheLayouts
+            Instance of ICacheLayouts used to create the methods.
+        params : ICacheParameters
+            Parameters of the instruction cache. The number of prefetched lines is
+            taken from `prefetch_lines`.
+        refiller : CacheRefillerInterface
+            The refiller used to fetch the lines from memory.
+        """
+        self.layouts = layouts
+        self.params = params
+        self.refiller = refiller
+
+        self.start_refill = Method(i=layouts.start_refill)
+        self.accept_refill = Method(o=layouts.accept_refill)
+        self.flush = Method()
+
+        self.perf_prefetches = HwCounter(
+            "frontend.icache.prefetcher.prefetches", "Number of cache lines prefetched to the prefetch buffer"
+        )
+        self.perf_hits = HwCounter(
+            "frontend.icache.prefetcher.hits", "Number of refills served from the prefetch buffer"
+        )
+
+    def elaborate(self, platform):
+        m = TModule()
+
+        m.submodules += [self.perf_prefetches, self.perf_hits]
+
+        lines = self.params.prefetch_lines
+        blocks = self.params.fetch_blocks_in_line
+        line_addr_bits = self.params.addr_width - self.params.offset_bits
+
+        def line_addr(addr: Value) -> Value:
+            return addr[self.params.offset_bits :]
+
+        def block_in_line(addr: Value) -> Value:
+            return addr[self.params.fetch_block_bytes_log : self.params.offset_bits]
+
+        # Prefetch buffer. An entry is valid from the moment its prefetch is started,
+        # it can be used after the whole line has arrived.
+        entry_valid = Array(Signal(name=f"entry_valid{i}") for i in range(lines))
+        entry_done = Array(Signal(name=f"entry_done{i}") for i in range(lines))
+        entry_line = Array(Signal(line_addr_bits, name=f"entry_line{i}") for i in range(lines))
+        entry_data = Array(
+            Array(Signal(self.params.fetch_block_bytes * 8, name=f"entry_data{i}_{j}") for j in range(blocks))
+            for i in range(lines)
+        )
+
+        def lookup(line: Value, done: bool) -> Value:
+            return Cat(entry_valid[i] & (entry_done[i] if done else 1) & (entry_line[i] == line) for i in range(lines))
+
+        # A demand refill was started in the refiller
+        demand = Signal()
+        # A prefetch was started in the refiller
+        prefetching = Signal()
+        fill_entry = Signal(range(lines))
+        # A refill is being served from the prefetch buffer
+        serving = Signal()
+        serve_entry = Signal(range(lines))
+        serve_block = Signal(range(blocks))
+        serve_count = Signal(range(blocks))
+        # A refill waits for the prefetch to finish
+        pending = Signal()
+        pending_addr = Signal(self.params.addr_width)
+        pending_sequential = Signal()
+
+        # The stream of lines to prefetch
+        stream_next = Signal(line_addr_bits)
+        stream_left = Signal(range(lines + 1))
+        last_miss = Signal(line_addr_bits)
+        last_miss_valid = Signal()
+
+        victim_rr = Signal(range(lines))
+
+        def serve(hit: Value, addr: Value):
+            m.d.sync += serving.eq(1)
+            for i in range(lines):
+                with m.If(hit[i]):
+                    m.d.sync += serve_entry.eq(i)
+            m.d.sync += serve_block.eq(block_in_line(addr))
+            m.d.sync += serve_count.eq(0)
+
+            # The stream continues past the served line
+            m.d.sync += stream_next.eq(line_addr(addr) + 1)
+            m.d.sync += stream_left.eq(lines)
+
+        @def_method(m, self.start_refill, ready=~demand & ~serving & ~pending)
+        def _(addr):
+            line = line_addr(addr)
+            hit = lookup(line, True)
+
+            self.perf_hits.incr(m, enable_call=hit.any())
+            with m.If(hit.any()):
+                serve(hit, addr)
+            with m.Else():
+                # The refill is started by a separate transaction, because it can't start
+                # while a prefetch is in progress
+                m.d.sync += pending.eq(1)
+                m.d.sync += pending_addr.eq(addr)
+                m.d.sync += pending_sequential.eq(last_miss_valid & (line == last_miss + 1))
+
+            m.d.sync += last_miss.eq(line)
+            m.d.sync += last_miss_valid.eq(1)
+
+        with Transaction(name="Dispatch").body(m, ready=pending & ~prefetching):
+            # The line could have been prefetched while the request was waiting
+            hit = lookup(line_addr(pending_addr), True)
+
+            with condition(m) as branch:
+                with branch(hit.any()):
+                    serve(hit, pending_addr)
+                with branch(~hit.any()):
+                    self.refiller.start_refill(m, addr=pending_addr)
+                    m.d.sync += demand.eq(1)
+
+                    # Two misses to consecutive lines start a new stream
+                    with m.If(pending_sequential):
+                        m.d.sync += stream_next.eq(line_addr(pending_addr) + 1)
+                        m.d.sync += stream_left.eq(lines)
+                    with m.Else():
+                        m.d.sync += stream_left.eq(0)
+
+            m.d.sync += pending.eq(0)
+
+        # Choose an invalid entry if there is one
+        victim = Signal(range(lines))
+        m.d.comb += victim.eq(victim_rr)
+        for i in reversed(range(lines)):
+            with m.If(~entry_valid[i]):
+                m.d.comb += victim.eq(i)
+
+        with Transaction(name="Prefetch").body(
+            m, ready=~demand & ~prefetching & ~serving & ~pending & (stream_left != 0)
+        ) as prefetch:
+            in_buffer = lookup(stream_next, False).any()
+
+            # Lines already in the buffer are skipped
+            with condition(m) as branch:
+                with branch(in_buffer):
+                    pass
+                with branch(~in_buffer):
+                    log.debug(m, True, "Prefetching line 0x{:x}", stream_next << self.params.offset_bits)
+                    self.perf_prefetches.incr(m)
+                    self.refiller.start_refill(m, addr=stream_next << self.params.offset_bits)
+
+                    m.d.sync += prefetching.eq(1)
+                    m.d.sync += fill_entry.eq(victim)
+                    m.d.sync += entry_valid[victim].eq(1)
+                    m.d.sync += entry_done[victim].eq(0)
+                    m.d.sync += entry_line[victim].eq(stream_next)
+                    m.d.sync += victim_rr.eq(Mux(victim_rr == lines - 1, 0, victim_rr + 1))
+
+            m.d.sync += stream_next.eq(stream_next + 1)
+            m.d.sync += stream_left.eq(stream_left - 1)
+
+        # Requests from the cache have priority over prefetches
+        prefetch.add_conflict(self.start_refill, Priority.RIGHT)
+
+        with Transaction(name="Fill").body(m, ready=prefetching):
+            ret = self.refiller.accept_refill(m)
+
+            m.d.sync += entry_data[fill_entry][block_in_line(ret.addr)].eq(ret.fetch_block)
+            with m.If(ret.error):
+                m.d.sync += entry_valid[fill_entry].eq(0)
+                m.d.sync += stream_left.eq(0)
+            with m.If(ret.last):
+                m.d.sync += prefetching.eq(0)
+                m.d.sync += entry_done[fill_entry].eq(1)
+
+        @def_method(m, self.accept_refill, ready=demand | serving)
+        def _():
+            ret = Signal(self.layouts.accept_refill)
+
+            with condition(m) as branch:
+                with branch(serving):
+                    last = serve_count == blocks - 1
+                    m.d.comb += ret.addr.eq(
+                        Cat(C(0, self.params.fetch_block_bytes_log), serve_block, entry_line[serve_entry])
+                    )
+                    m.d.comb += ret.fetch_block.eq(entry_data[serve_entry][serve_block])
+                    m.d.comb += ret.last.eq(last)
+
+                    m.d.sync += serve_block.eq(serve_block + 1)
+                    m.d.sync += serve_count.eq(serve_count + 1)
+                    with m.If(last):
+                        m.d.sync += serving.eq(0)
+                        m.d.sync += entry_valid[serve_entry].eq(0)
+                with branch(demand):
+                    refill = self.refiller.accept_refill(m)
+                    m.d.comb += ret.eq(refill)
+                    with m.If(refill.last):
+                        m.d.sync += demand.eq(0)
+
+            return ret
+
+        @def_method(m, self.flush)
+        def _():
+            for i in range(lines):
+                m.d.sync += entry_valid[i].eq(0)
+            m.d.sync += stream_left.eq(0)
+            m.d.sync += last_miss_valid.eq(0)
+
+        return m
@@ -1,7 +1,7 @@
 from amaranth import *
 from coreblocks.cache.icache import CacheRefillerInterface
-from coreblocks.params import ICacheParameters
-from coreblocks.interface.layouts import ICacheLayouts
+from coreblocks.params import ICacheParameters, DCacheParameters
+from coreblocks.interface.layouts import ICacheLayouts, DCacheLayouts
 from coreblocks.peripherals.bus_adapter import BusMasterInterface
 from transactron.core import Transaction, Method, TModule, def_method
 from transactron.lib import Forwarder
@@ -9,10 +9,18 @@ from transactron.lib import Forwarder
 from amaranth.utils import exact_log2
 
 
-__all__ = ["SimpleCommonBusCacheRefiller"]
+__all__ = ["SimpleCommonBusCacheRefiller", "CommonBusDCacheRefiller"]
 
 
 class SimpleCommonBusCacheRefiller(Elaboratable, CacheRefillerInterface):
+    """Instruction cache refiller.
+
+    Refills a cache line fetch block by fetch block. The refill starts from the fetch block
+    whose address was passed to `start_refill` and wraps around at the end of the line.
+    The line is read from the bus in a single wrapping burst. After an error, the refill
+    ends - the words which are still requested by the burst are dropped.
+    """
+
     def __init__(self, layouts: ICacheLayouts, params: ICacheParameters, bus_master: BusMasterInterface):
         self.layouts = layouts
         self.params = params
@@ -27,6 +35,8 @@ class SimpleCommonBusCacheRefiller(Elaboratable, CacheRefillerInterface):
         m.submodules.resp_fwd = resp_fwd = Forwarder(self.layouts.accept_refill)
 
         cache_line_address = Signal(self.params.word_width - self.params.offset_bits)
+        word_in_line_bits = exact_log2(self.params.words_in_line)
+        first_word = Signal(word_in_line_bits)
 
         refill_active = Signal()
         flushing = Signal()
@@ -35,10 +45,13 @@ class SimpleCommonBusCacheRefiller(Elaboratable, CacheRefillerInterface):
         req_word_counter = Signal(range(self.params.words_in_line))
 
         with Transaction().body(m, ready=sending_requests):
+            # The whole line is read in a single burst
             self.bus_master.request_read(
                 m,
-                addr=Cat(req_word_counter, cache_line_address),
+                addr=Cat((first_word + req_word_counter)[:word_in_line_bits], cache_line_address),
                 sel=C(1).replicate(self.bus_master.params.data_width // self.bus_master.params.granularity),
+                burst=req_word_counter != self.params.words_in_line - 1,
+                wrap_log=word_in_line_bits,
             )
 
             m.d.sync += req_word_counter.eq(req_word_counter + 1)
@@ -58,8 +71,9 @@ class SimpleCommonBusCacheRefiller(Elaboratable, CacheRefillerInterface):
             m.d.sync += block_buffer.eq(block[self.params.word_width :])
 
             words_in_fetch_block_log = exact_log2(self.params.words_in_fetch_block)
-            current_fetch_block = resp_word_counter[words_in_fetch_block_log:]
-            word_in_fetch_block = resp_word_counter[:words_in_fetch_block_log]
+            resp_word = (first_word + resp_word_counter)[:word_in_line_bits]
+            current_fetch_block = resp_word[words_in_fetch_block_log:]
+            word_in_fetch_block = resp_word[:words_in_fetch_block_log]
 
             with m.If(~flushing):
                 with m.If((word_in_fetch_block == self.params.words_in_fetch_block - 1) | bus_response.err):
@@ -81,18 +95,104 @@ class SimpleCommonBusCacheRefiller(Elaboratable, CacheRefillerInterface):
                 with m.If(resp_word_counter == self.params.words_in_line - 1):
                     m.d.sync += refill_active.eq(0)
                 with m.Elif(bus_response.err):
-                    m.d.sync += sending_requests.eq(0)
+                    # The burst has to be finished, the remaining words are dropped
                     m.d.sync += flushing.eq(1)
 
             m.d.sync += resp_word_counter.eq(resp_word_counter + 1)
 
-        with m.If(flushing & (resp_word_counter == req_word_counter)):
+        with m.If(flushing & ~sending_requests & (resp_word_counter == req_word_counter)):
             m.d.sync += refill_active.eq(0)
             m.d.sync += flushing.eq(0)
 
         @def_method(m, self.start_refill, ready=~refill_active)
         def _(addr) -> None:
             m.d.sync += cache_line_address.eq(addr[self.params.offset_bits :])
+            m.d.sync += first_word.eq(addr[exact_log2(self.params.word_width_bytes) : self.params.offset_bits])
+            m.d.sync += req_word_counter.eq(0)
+            m.d.sync += sending_requests.eq(1)
+
+            m.d.sync += resp_word_counter.eq(0)
+
+            m.d.sync += refill_active.eq(1)
+
+        @def_method(m, self.accept_refill)
+        def _():
+            return resp_fwd.read(m)
+
+        return m
+
+
+class CommonBusDCacheRefiller(Elaboratable, CacheRefillerInterface):
+    """Data cache refiller.
+
+    Refills a cache line word by word. The refill starts from the word whose address
+    was passed to `start_refill` and wraps around at the end of the line, so the word
+    which caused the miss is returned first. The line is read in a single burst, wrapping
+    at the line boundary. An error doesn't stop the refill - every word of the line is
+    returned and `last` is set on the final one. Thanks to that, the bus is idle when
+    `last` is returned.
+    """
+
+    def __init__(self, layouts: DCacheLayouts, params: DCacheParameters, bus_master: BusMasterInterface):
+        self.layouts = layouts
+        self.params = params
+        self.bus_master = bus_master
+
+        self.start_refill = Method(i=layouts.start_refill)
+        self.accept_refill = Method(o=layouts.accept_refill)
+
+    def elaborate(self, platform):
+        m = TModule()
+
+        m.submodules.resp_fwd = resp_fwd = Forwarder(self.layouts.accept_refill)
+
+        cache_line_address = Signal(self.params.word_width - self.params.offset_bits)
+        first_word = Signal(self.params.word_in_line_bits)
+
+        refill_active = Signal()
+
+        sending_requests = Signal()
+        req_word_counter = Signal(range(self.params.words_in_line))
+
+        with Transaction().body(m, ready=sending_requests):
+            self.bus_master.request_read(
+                m,
+                addr=Cat((first_word + req_word_counter)[: self.params.word_in_line_bits], cache_line_address),
+                sel=C(1).replicate(self.bus_master.params.data_width // self.bus_master.params.granularity),
+                burst=req_word_counter != self.params.words_in_line - 1,
+                wrap_log=self.params.word_in_line_bits,
+            )
+
+            m.d.sync += req_word_counter.eq(req_word_counter + 1)
+            with m.If(req_word_counter == (self.params.words_in_line - 1)):
+                m.d.sync += sending_requests.eq(0)
+
+        resp_word_counter = Signal(range(self.params.words_in_line))
+
+        with Transaction().body(m, ready=refill_active):
+            bus_response = self.bus_master.get_read_response(m)
+
+            last = resp_word_counter == self.params.words_in_line - 1
+            resp_fwd.write(
+                m,
+                addr=Cat(
+                    C(0, self.params.word_width_bytes_log),
+                    (first_word + resp_word_counter)[: self.params.word_in_line_bits],
+                    cache_line_address,
+                ),
+                data=bus_response.data,
+                error=bus_response.err,
+                last=last,
+            )
+
+            m.d.sync += resp_word_counter.eq(resp_word_counter + 1)
+            with m.If(last):
+                m.d.sync += refill_active.eq(0)
+
+        @def_method(m, self.start_refill, ready=~refill_active)
+        def _(addr) -> None:
+            m.d.sync += cache_line_address.eq(addr[self.params.offset_bits :])
+            m.d.sync += first_word.eq(addr[self.params.word_width_bytes_log : self.params.offset_bits])
             m.d.sync += req_word_counter.eq(0)
             m.d.sync += sending_requests.eq(1)
 
@@ -0,0 +1,184 @@
+from amaranth import *
+
+from transactron.core import def_method, Priority, TModule
+from transactron import Method, Transaction
+from coreblocks.params import ICacheParameters
+from coreblocks.interface.layouts import ICacheLayouts
+from transactron.lib import logging
+from transactron.lib.metrics import HwCounter
+from transactron.lib.simultaneous import condition
+
+from coreblocks.cache.iface import CacheInterface
+
+__all__ = ["ICacheStreamBuffer"]
+
+log = logging.HardwareLogger("frontend.icache.stream_buffer")
+
+
+class ICacheStreamBuffer(Elaboratable, CacheInterface):
+    """Sequential stream buffer for configurations without the instruction cache.
+
+    The stream buffer is placed in front of `ICacheBypass`, and provides the same interface.
+    It fetches the fetch blocks following the last requested one ahead of the requests,
+    so that the latency of the instruction bus is hidden while the fetch is sequential.
+
+    Up to `stream_blocks` fetch blocks are fetched ahead. They are kept in a ring of entries,
+    which also holds the requests waiting to be accepted. The ring has one more entry than
+    the number of fetched ahead blocks, so that a request which breaks the stream can always
+    make progress. A request to the next block of the stream takes
+    the oldest fetched ahead block. Any other request (e.g. after a redirect) discards
+    the fetched ahead blocks and starts a new stream. The blocks which are still in flight
+    are dropped when they arrive. Fetching ahead stops after an error.
+
+    Attributes
+    ----------
+    issue_req : Method
+        Issues a request, see `CacheInterface`.
+    accept_res : Method
+        Accepts the result of a request, in the order of issue, see `CacheInterface`.
+    flush : Method
+        Discards the fetched ahead blocks and stops the stream.
+    """
+
+    def __init__(self, layouts: ICacheLayouts, params: ICacheParameters, bypass: CacheInterface) -> None:
+        """
+        Parameters
+        ----------
+        layouts : ICacheLayouts
+            Instance of ICacheLayouts used to create the methods.
+        params : ICacheParameters
+            Parameters of the instruction cache. The size of the buffer is taken from `stream_blocks`.
+        bypass : CacheInterface
+            The bypass used to fetch the blocks from the bus.
+        """
+        self.params = params
+        self.bypass = bypass
+
+        self.issue_req = Method(i=layouts.issue_req)
+        self.accept_res = Method(o=layouts.accept_res)
+        self.flush = Method()
+
+        self.perf_prefetches = HwCounter(
+            "frontend.icache.stream_buffer.prefetches", "Number of fetch blocks fetched ahead of the requests"
+        )
+        self.perf_hits = HwCounter(
+            "frontend.icache.stream_buffer.hits", "Number of requests served by a fetched ahead block"
+        )
+
+    def elaborate(self, platform):
+        m = TModule()
+
+        m.submodules += [self.perf_prefetches, self.perf_hits]
+
+        depth = self.params.stream_blocks + 1
+        block_bytes = self.params.fetch_block_bytes
+
+        def incr(ptr: Value):
+            return Mux(ptr == depth - 1, 0, ptr + 1)
+
+        # An entry is valid from the moment its request is sent to the bus, until it is accepted
+        # or dropped. The entries are allocated, filled and freed in the ring order.
+        entry_valid = Array(Signal(name=f"entry_valid{i}") for i in range(depth))
+        entry_done = Array(Signal(name=f"entry_done{i}") for i in range(depth))
+        # The entry was requested by `issue_req`
+        entry_claimed = Array(Signal(name=f"entry_claimed{i}") for i in range(depth))
+        # The entry belongs to a discarded stream
+        entry_stale = Array(Signal(name=f"entry_stale{i}") for i in range(depth))
+        entry_data = Array(Signal(self.params.fetch_block_bytes * 8, name=f"entry_data{i}") for i in range(depth))
+        entry_error = Array(Signal(name=f"entry_error{i}") for i in range(depth))
+
+        alloc_ptr = Signal(range(depth))  # next entry to be requested from the bus
+        fill_ptr = Signal(range(depth))  # next entry to be filled by a bus response
+        claim_ptr = Signal(range(depth))  # oldest fetched ahead entry
+        read_ptr = Signal(range(depth))  # oldest entry
+
+        streaming = Signal()
+        stream_addr = Signal(self.params.addr_width)  # address of the next block to be fetched ahead
+        claim_addr = Signal(self.params.addr_width)  # address of the block at `claim_ptr`
+        ahead = Signal(range(depth + 1))  # number of fetched ahead entries
+
+        def alloc(addr: Value, claimed: bool):
+            self.bypass.issue_req(m, addr=addr)
+            m.d.sync += entry_valid[alloc_ptr].eq(1)
+            m.d.sync += entry_done[alloc_ptr].eq(0)
+            m.d.sync += entry_claimed[alloc_ptr].eq(claimed)
+            m.d.sync += entry_stale[alloc_ptr].eq(0)
+            m.d.sync += alloc_ptr.eq(incr(alloc_ptr))
+
+        def discard():
+            for i in range(depth):
+                with m.If(entry_valid[i] & ~entry_claimed[i]):
+                    m.d.sync += entry_stale[i].eq(1)
+            m.d.sync += ahead.eq(0)
+
+        with Transaction(name="Fill").body(m):
+            res = self.bypass.accept_res(m)
+
+            m.d.sync += entry_done[fill_ptr].eq(1)
+            m.d.sync += entry_data[fill_ptr].eq(res.fetch_block)
+            m.d.sync += entry_error[fill_ptr].eq(res.error)
+            m.d.sync += fill_ptr.eq(incr(fill_ptr))
+
+            # Don't fetch past an error. A new stream started in this cycle isn't stopped, because
+            # the statements of `issue_req` are placed after this transaction.
+            with m.If(res.error & ~entry_stale[fill_ptr]):
+                m.d.sync += streaming.eq(0)
+
+        @def_method(m, self.issue_req)
+        def _(addr: Value) -> None:
+            hit = (ahead != 0) & (addr == claim_addr)
+
+            self.perf_hits.incr(m, enable_call=hit)
+
+            with condition(m) as branch:
+                with branch(hit):
+                    m.d.sync += entry_claimed[claim_ptr].eq(1)
+                    m.d.sync += claim_ptr.eq(incr(claim_ptr))
+                    m.d.sync += claim_addr.eq(claim_addr + block_bytes)
+                    m.d.sync += ahead.eq(ahead - 1)
+                with branch(~hit & ~entry_valid[alloc_ptr]):
+                    discard()
+                    alloc(addr, True)
+                    m.d.sync += claim_ptr.eq(incr(alloc_ptr))
+                    m.d.sync += claim_addr.eq(addr + block_bytes)
+                    m.d.sync += stream_addr.eq(addr + block_bytes)
+                    m.d.sync += streaming.eq(1)
+
+        with Transaction(name="Prefetch").body(
+            m, ready=streaming & ~entry_valid[alloc_ptr] & (ahead != self.params.stream_blocks)
+        ) as prefetch:
+            log.debug(m, True, "Fetching ahead 0x{:x}", stream_addr)
+            self.perf_prefetches.incr(m)
+            alloc(stream_addr, False)
+            m.d.sync += stream_addr.eq(stream_addr + block_bytes)
+            m.d.sync += ahead.eq(ahead + 1)
+
+        # Requests have priority over fetching ahead
+        prefetch.add_conflict(self.issue_req, Priority.RIGHT)
+        prefetch.add_conflict(self.flush, Priority.RIGHT)
+
+        with Transaction(name="Drop").body(
+            m, ready=entry_valid[read_ptr] & entry_done[read_ptr] & entry_stale[read_ptr]
+        ):
+            m.d.sync += entry_valid[read_ptr].eq(0)
+            m.d.sync += read_ptr.eq(incr(read_ptr))
+
+        @def_method(
+            m,
+            self.accept_res,
+            ready=entry_valid[read_ptr] & entry_done[read_ptr] & entry_claimed[read_ptr] & ~entry_stale[read_ptr],
+        )
+        def _():
+            m.d.sync += entry_valid[read_ptr].eq(0)
+            m.d.sync += read_ptr.eq(incr(read_ptr))
+
+            return {"fetch_block": entry_data[read_ptr], "error": entry_error[read_ptr]}
+
+        @def_method(m, self.flush)
+        def _() -> None:
+            discard()
+            m.d.sync += streaming.eq(0)
+
+        self.flush.add_conflict(self.issue_req)
+
+        return m
@@ -25,7 +25,7 @@ from coreblocks.scheduler.scheduler import Scheduler
 from coreblocks.backend.announcement import ResultAnnouncement
 from coreblocks.backend.retirement import Retirement
 from coreblocks.peripherals.bus_adapter import WishboneMasterAdapter
-from coreblocks.peripherals.wishbone import WishboneMaster, WishboneInterface
+from coreblocks.peripherals.wishbone import WishboneMaster, PipelinedWishboneMaster, WishboneInterface
 from transactron.lib.metrics import HwMetricsEnabledKey
 
 __all__ = ["Core"]
@@ -51,8 +51,13 @@ class Core(Component):
         if self.gen_params.debug_signals_enabled:
             self.dm.add_dependency(HwMetricsEnabledKey(), True)
 
-        self.wb_master_instr = WishboneMaster(self.gen_params.wb_params, "instr")
-        self.wb_master_data = WishboneMaster(self.gen_params.wb_params, "data")
+        def wishbone_master(pipelined: bool, name: str) -> WishboneMaster | PipelinedWishboneMaster:
+            if pipelined:
+                return PipelinedWishboneMaster(self.gen_params.wb_params, max_req=self.gen_params.wb_max_requests)
+            return WishboneMaster(self.gen_params.wb_params, name)
+
+        self.wb_master_instr = wishbone_master(self.gen_params.wb_instr_pipelined, "instr")
+        self.wb_master_data = wishbone_master(self.gen_params.wb_data_pipelined, "data")
 
         self.bus_master_instr_adapter = WishboneMasterAdapter(self.wb_master_instr)
         self.bus_master_data_adapter = WishboneMasterAdapter(self.wb_master_data)
@@ -73,6 +78,8 @@ class Core(Component):
             self.gen_params,
             rob_get_indices=self.ROB.get_indices,
             fetch_stall_exception=self.frontend.stall,
+            fetch_cancel_stall_exception=self.frontend.cancel_stall,
+            get_active_tags=self.CRAT.get_active_tags,
         )
 
         self.func_blocks_unifier = FuncBlocksUnifier(
@@ -88,8 +95,12 @@ class Core(Component):
     def elaborate(self, platform):
         m = TModule()
 
-        connect(m.top_module, flipped(self.wb_instr), self.wb_master_instr.wb_master)
-        connect(m.top_module, flipped(self.wb_data), self.wb_master_data.wb_master)
+        for wb, master in [(self.wb_instr, self.wb_master_instr), (self.wb_data, self.wb_master_data)]:
+            connect(
+                m.top_module,
+                flipped(wb),
+                master.wb if isinstance(master, PipelinedWishboneMaster) else master.wb_master,
+            )
 
         m.submodules.wb_master_instr = self.wb_master_instr
         m.submodules.wb_master_data = self.wb_master_data
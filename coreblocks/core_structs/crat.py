@@ -12,7 +12,7 @@ from transactron.utils import DependencyContext, assign, cyclic_mask, mod_incr,
 
 from coreblocks.params import GenParams
 from coreblocks.interface.layouts import RATLayouts
-from coreblocks.interface.keys import CoreStateKey, RollbackKey
+from coreblocks.interface.keys import ActiveTagsKey, CoreStateKey, RollbackKey
 
 log = logging.HardwareLogger("core_structs.crat")
 
@@ -41,7 +41,8 @@ class CheckpointRAT(Elaboratable):
     get_active_tags: Method
         Gets bit array of tags that are currently active.
         If bit is set it means that a tag is on a valid
-        speculation path.
+        speculation path. Also returns bit array of tags that have a checkpoint, so can be rolled back to.
+        Automatically registered to `ActiveTagsKey`.
     tag: Method
         Tag stage of CheckpointRAT. Issues instruction speculation tags.
         It needs rollback_tag information from core `Frontend`, that identifies first instruction fetched after
@@ -81,6 +82,7 @@ class CheckpointRAT(Elaboratable):
 
         self.free_tag = Method()
         self.get_active_tags = Method(o=layouts.get_active_tags_out)
+        self.dm.add_dependency(ActiveTagsKey(), self.get_active_tags)
 
     def elaborate(self, platform):
         m = TModule()
@@ -385,9 +387,10 @@ class CheckpointRAT(Elaboratable):
 
         @def_method(m, self.get_active_tags, nonexclusive=True)
         def _():
-            out = Signal(ArrayLayout(1, 2**self.gen_params.tag_bits))
-            m.d.av_comb += out.eq(active_tags)
-            return {"active_tags": out}
+            out = Signal.like(self.get_active_tags.data_out)
+            m.d.av_comb += out.active_tags.eq(active_tags)
+            m.d.av_comb += out.checkpointed_tags.eq(checkpointed_tags)
+            return out
 
         m.submodules.perf_tags = perf_tags = HwExpHistogram(
             "struct.crat.tags_allocated",
@@ -2,6 +2,8 @@ from amaranth import *
 import amaranth.lib.memory as memory
 from transactron import Method, Transaction, def_method, TModule
 from transactron.lib.metrics import *
+from transactron.utils import DependencyContext
+from coreblocks.interface.keys import ROBIndicesKey
 from coreblocks.interface.layouts import ROBLayouts
 from coreblocks.params import GenParams
 
@@ -20,6 +22,7 @@ class ReorderBuffer(Elaboratable):
         self.exception = Array(Signal() for _ in range(2**self.params.rob_entries_bits))
         self.data = memory.Memory(shape=layouts.data_layout, depth=2**self.params.rob_entries_bits, init=[])
         self.get_indices = Method(o=layouts.get_indices)
+        DependencyContext.get().add_dependency(ROBIndicesKey(), self.get_indices)
 
         self.perf_rob_wait_time = FIFOLatencyMeasurer(
             "backend.rob.wait_time",
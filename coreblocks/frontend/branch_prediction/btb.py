@@ -0,0 +1,152 @@
+from amaranth import *
+from amaranth.lib import memory
+from amaranth.lib.data import ArrayLayout, StructLayout
+
+from transactron import Method, TModule, def_method
+from transactron.lib.metrics import HwCounter
+from transactron.utils.transactron_helpers import make_layout
+
+from coreblocks.arch import CfiType, Extension
+from coreblocks.params import GenParams
+from coreblocks.interface.layouts import CommonLayoutFields, JumpBranchLayouts
+from coreblocks.frontend import FrontendParams
+
+__all__ = ["BranchTargetBuffer"]
+
+
+class BranchTargetBuffer(Elaboratable):
+    """Branch target buffer
+
+    A set-associative cache of targets of taken control flow instructions. It is indexed
+    with the fetch block address, so the fetch unit can look it up in the same cycle it sends
+    the request to the instruction cache and immediately continue from the predicted target.
+    An entry holds the offset of the instruction in the fetch block, its type and its target.
+    Different instructions of the same fetch block can be stored in different ways.
+
+    Entries are allocated when a taken control flow instruction is resolved. The way to replace
+    is selected in the same way as in the instruction cache - one global counter rotates over
+    all the ways. Instructions which cross a fetch block boundary are never stored, because
+    following them from the first fetch block would lose their second half.
+
+    Attributes
+    ----------
+    predict : Method
+        For the given fetch block, returns a mask of instructions which hit in the buffer
+        and the types and targets of these instructions. Combinational.
+    update : Method
+        Records the target of a resolved control flow instruction, if it was taken.
+        Takes `JumpBranchLayouts.verify_branch` as the argument.
+    """
+
+    def __init__(self, gen_params: GenParams) -> None:
+        """
+        Parameters
+        ----------
+        gen_params : GenParams
+            Core generation parameters.
+        """
+        self.gen_params = gen_params
+        self.params = gen_params.bpu_params
+
+        fields = gen_params.get(CommonLayoutFields)
+
+        self.predict = Method(
+            i=make_layout(fields.fb_addr),
+            o=[
+                ("hit", gen_params.fetch_width),
+                ("cfi_types", ArrayLayout(CfiType, gen_params.fetch_width)),
+                ("targets", ArrayLayout(gen_params.isa.xlen, gen_params.fetch_width)),
+            ],
+        )
+        self.update = Method(i=gen_params.get(JumpBranchLayouts).verify_branch)
+
+        self.perf_allocations = HwCounter(
+            "frontend.bpu.btb.allocations", "Number of entries allocated in the branch target buffer"
+        )
+
+    def elaborate(self, platform):
+        m = TModule()
+
+        m.submodules += [self.perf_allocations]
+
+        fetch_width = self.gen_params.fetch_width
+        params = self.gen_params.get(FrontendParams)
+
+        sets_bits = self.params.btb_sets_bits
+        tag_bits = self.gen_params.isa.xlen - self.gen_params.fetch_block_bytes_log - sets_bits
+
+        entry_layout = StructLayout(
+            {
+                "valid": 1,
+                "tag": tag_bits,
+                "slot": self.gen_params.fetch_width_log,
+                "cfi_type": CfiType,
+                "target": self.gen_params.isa.xlen,
+            }
+        )
+        m.submodules.entries = entries = memory.Memory(
+            shape=ArrayLayout(entry_layout, self.params.btb_ways), depth=self.params.btb_sets, init=[]
+        )
+        predict_port = entries.read_port(domain="comb")
+        update_read_port = entries.read_port(domain="comb")
+        update_write_port = entries.write_port(granularity=1)
+
+        way_selector = Signal(self.params.btb_ways, init=1)
+
+        @def_method(m, self.predict)
+        def _(fb_addr):
+            m.d.comb += predict_port.addr.eq(fb_addr[:sets_bits])
+
+            ret = Signal.like(self.predict.data_out)
+            for i in range(fetch_width):
+                for way in range(self.params.btb_ways):
+                    entry = predict_port.data[way]
+                    with m.If(entry.valid & (entry.tag == fb_addr[sets_bits:]) & (entry.slot == i)):
+                        m.d.av_comb += [
+                            ret.hit[i].eq(1),
+                            ret.cfi_types[i].eq(entry.cfi_type),
+                            ret.targets[i].eq(entry.target),
+                        ]
+
+            return ret
+
+        @def_method(m, self.update)
+        def _(arg):
+            fb_addr = params.fb_addr(arg.from_pc)
+            slot = params.fb_instr_idx(arg.from_pc)
+
+            crosses_fetch_block = C(0)
+            if Extension.C in self.gen_params.isa.extensions:
+                crosses_fetch_block = ~arg.rvc & (slot == fetch_width - 1)
+
+            with m.If(arg.taken & ~crosses_fetch_block):
+                m.d.comb += update_read_port.addr.eq(fb_addr[:sets_bits])
+
+                hit_ways = Signal(self.params.btb_ways)
+                for way in range(self.params.btb_ways):
+                    entry = update_read_port.data[way]
+                    m.d.av_comb += hit_ways[way].eq(
+                        entry.valid & (entry.tag == fb_addr[sets_bits:]) & (entry.slot == slot)
+                    )
+
+                new_entry = Signal(entry_layout)
+                m.d.av_comb += [
+                    new_entry.valid.eq(1),
+                    new_entry.tag.eq(fb_addr[sets_bits:]),
+                    new_entry.slot.eq(slot),
+                    new_entry.cfi_type.eq(arg.cfi_type),
+                    new_entry.target.eq(arg.next_pc),
+                ]
+
+                m.d.comb += update_write_port.addr.eq(update_read_port.addr)
+                m.d.comb += update_write_port.data.eq(Cat(new_entry for _ in range(self.params.btb_ways)))
+
+                with m.If(hit_ways.any()):
+                    # The instruction is already known - just refresh its target.
+                    m.d.comb += update_write_port.en.eq(hit_ways)
+                with m.Else():
+                    m.d.comb += update_write_port.en.eq(way_selector)
+                    m.d.sync += way_selector.eq(way_selector.rotate_left(1))
+                    self.perf_allocations.incr(m)
+
+        return m
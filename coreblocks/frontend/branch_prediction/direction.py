@@ -0,0 +1,169 @@
+from amaranth import *
+from amaranth.lib import memory
+from amaranth.lib.data import ArrayLayout, StructLayout
+
+from transactron import Method, TModule, def_method
+from transactron.lib.metrics import HwCounter
+from transactron.utils import LayoutListField
+from transactron.utils.transactron_helpers import make_layout
+
+from coreblocks.arch import CfiType
+from coreblocks.params import GenParams
+from coreblocks.interface.layouts import CommonLayoutFields, JumpBranchLayouts
+from coreblocks.frontend import FrontendParams
+
+__all__ = ["DirectionPredictor"]
+
+
+class DirectionPredictor(Elaboratable):
+    """Conditional branch direction predictor
+
+    The predictor is a table of 2-bit saturating counters. Each row of the table
+    corresponds to a fetch block and holds a counter for every instruction slot in it,
+    so the directions of all branches in a fetch block are predicted at once.
+    Every counter has a valid bit, so that branches which weren't trained yet
+    can fall back to the static prediction.
+
+    The bimodal predictor indexes the table only with the fetch block address. The gshare
+    predictor additionally XORs the index with a global history register. The history
+    is updated only on taken branches by shifting it and mixing in the fetch block address of
+    the branch. This way the history of a fetch block doesn't depend on not taken branches preceding
+    a branch in the same block, so the same index is used when predicting and training.
+
+    There are two copies of the history. The speculative one is updated by the fetch unit
+    and used for predictions. The resolved one is updated by the branch results and
+    used for training. The speculative history is restored from the resolved one on
+    a misprediction or on a flush of the frontend. The fetch unit keeps the speculative
+    history used to predict each fetch block, so that it can repair the history when it
+    redirects itself in a later stage.
+
+    Attributes
+    ----------
+    predict : Method
+        For the given fetch block, returns a mask of instructions for which a prediction
+        is known, a mask of instructions that are predicted to be taken if they are branches
+        and the speculative history used for the prediction. Combinational.
+    update_history : Method
+        Speculatively records a branch in the given fetch block predicted as taken.
+    set_history : Method
+        Sets the speculative history to the given one. If `taken` is set, a taken branch
+        in the given fetch block is recorded on top of it.
+    train : Method
+        Updates the predictor with the result of a resolved branch.
+        Takes `JumpBranchLayouts.verify_branch` as the argument.
+    restore : Method
+        Restores the speculative history from the resolved one.
+    """
+
+    def __init__(self, gen_params: GenParams) -> None:
+        """
+        Parameters
+        ----------
+        gen_params : GenParams
+            Core generation parameters.
+        """
+        self.gen_params = gen_params
+        self.params = gen_params.bpu_params
+
+        fields = gen_params.get(CommonLayoutFields)
+
+        history: LayoutListField = ("history", self.params.history_bits)
+
+        self.predict = Method(
+            i=make_layout(fields.fb_addr),
+            o=make_layout(("known", gen_params.fetch_width), ("taken", gen_params.fetch_width), history),
+        )
+        self.update_history = Method(i=make_layout(fields.fb_addr))
+        self.set_history = Method(i=make_layout(history, fields.fb_addr, ("taken", 1)))
+        self.train = Method(i=gen_params.get(JumpBranchLayouts).verify_branch)
+        self.restore = Method()
+
+        self.perf_branches = HwCounter("frontend.bpu.direction.branches", "Number of resolved conditional branches")
+        self.perf_mispredictions = HwCounter(
+            "frontend.bpu.direction.mispredictions", "Number of conditional branches with a mispredicted direction"
+        )
+
+    def elaborate(self, platform):
+        m = TModule()
+
+        m.submodules += [self.perf_branches, self.perf_mispredictions]
+
+        fetch_width = self.gen_params.fetch_width
+        params = self.gen_params.get(FrontendParams)
+
+        entry_layout = StructLayout({"counter": 2, "valid": 1})
+        m.submodules.counters = counters = memory.Memory(
+            shape=ArrayLayout(entry_layout, fetch_width), depth=self.params.table_size, init=[]
+        )
+        predict_port = counters.read_port(domain="comb")
+        train_read_port = counters.read_port(domain="comb")
+        train_write_port = counters.write_port(granularity=1)
+
+        spec_history = Signal(self.params.history_bits)
+        history = Signal(self.params.history_bits)
+
+        def table_index(fb_addr: Value, history: Value) -> Value:
+            return fb_addr[: self.params.table_bits] ^ history
+
+        def next_history(fb_addr: Value, history: Value) -> Value:
+            return (history << 1)[: self.params.history_bits] ^ fb_addr[: self.params.history_bits]
+
+        @def_method(m, self.predict)
+        def _(fb_addr):
+            m.d.comb += predict_port.addr.eq(table_index(fb_addr, spec_history))
+            return {
+                "known": Cat(predict_port.data[i].valid for i in range(fetch_width)),
+                "taken": Cat(predict_port.data[i].counter[1] for i in range(fetch_width)),
+                "history": spec_history,
+            }
+
+        @def_method(m, self.update_history)
+        def _(fb_addr):
+            m.d.sync += spec_history.eq(next_history(fb_addr, spec_history))
+
+        @def_method(m, self.set_history)
+        def _(history, fb_addr, taken):
+            m.d.sync += spec_history.eq(Mux(taken, next_history(fb_addr, history), history))
+
+        @def_method(m, self.restore)
+        def _():
+            m.d.sync += spec_history.eq(history)
+
+        @def_method(m, self.train)
+        def _(arg):
+            fb_addr = params.fb_addr(arg.from_pc)
+            slot = params.fb_instr_idx(arg.from_pc)
+
+            with m.If(CfiType.is_branch(arg.cfi_type)):
+                self.perf_branches.incr(m)
+
+                m.d.comb += train_read_port.addr.eq(table_index(fb_addr, history))
+                entry = train_read_port.data[slot]
+
+                new_entry = Signal(entry_layout)
+                m.d.av_comb += new_entry.valid.eq(1)
+                with m.If(~entry.valid):
+                    # Start from a weak counter in the direction of the first outcome.
+                    m.d.av_comb += new_entry.counter.eq(Mux(arg.taken, 0b10, 0b01))
+                with m.Elif(arg.taken & (entry.counter != 0b11)):
+                    m.d.av_comb += new_entry.counter.eq(entry.counter + 1)
+                with m.Elif(~arg.taken & (entry.counter != 0b00)):
+                    m.d.av_comb += new_entry.counter.eq(entry.counter - 1)
+                with m.Else():
+                    m.d.av_comb += new_entry.counter.eq(entry.counter)
+
+                m.d.comb += train_write_port.addr.eq(train_read_port.addr)
+                m.d.comb += train_write_port.data.eq(Cat(new_entry for _ in range(fetch_width)))
+                m.d.comb += train_write_port.en.eq(1 << slot)
+
+                self.perf_mispredictions.incr(m, enable_call=arg.misprediction)
+
+                new_history = Mux(arg.taken, next_history(fb_addr, history), history)
+                m.d.sync += history.eq(new_history)
+                with m.If(arg.misprediction):
+                    m.d.sync += spec_history.eq(new_history)
+
+            with m.Elif(arg.misprediction):
+                m.d.sync += spec_history.eq(history)
+
+        return m
@@ -0,0 +1,107 @@
+from amaranth import *
+from amaranth.lib.data import ArrayLayout, StructLayout
+
+from transactron import Method, TModule, def_method
+from transactron.utils.amaranth_ext.coding import PriorityEncoder
+from transactron.utils.transactron_helpers import make_layout
+
+from coreblocks.params import GenParams
+from coreblocks.interface.layouts import CommonLayoutFields, JumpBranchLayouts
+
+__all__ = ["PendingJumpTargets"]
+
+
+class PendingJumpTargets(Elaboratable):
+    """Predicted targets of indirect jumps
+
+    When the fetch unit follows a predicted target of a JALR instruction (found in the branch
+    target buffer or on the return address stack), the target is stored here until the jump
+    is resolved, so that the jump-branch unit can check if the prediction was correct.
+    The index of the entry is passed along with the instruction, so that every instance
+    of a jump is verified against its own prediction - different instances of the same
+    return are usually predicted to different targets.
+
+    When a mispredicted branch is rolled back, only the targets of jumps which didn't leave
+    the frontend yet are removed. Younger jumps which already left it are still executed
+    by the jump-branch unit, which frees their entries.
+
+    Attributes
+    ----------
+    insert : Method
+        Stores the predicted target of a JALR instruction and returns the index of the entry.
+        Ready only if there is a free entry.
+    get : Method
+        Returns the predicted target stored in the given entry and frees it. The target is
+        valid only if the entry holds a jump with the given PC. It has layouts as described by
+        `JumpBranchLayouts.predicted_jump_target_req` and `JumpBranchLayouts.predicted_jump_target_resp`.
+    dispatch : Method
+        Marks the entry as belonging to a jump which left the frontend.
+    rollback : Method
+        Removes the targets of jumps which didn't leave the frontend yet.
+    clear : Method
+        Removes all the pending targets.
+    """
+
+    def __init__(self, gen_params: GenParams) -> None:
+        """
+        Parameters
+        ----------
+        gen_params : GenParams
+            Core generation parameters.
+        """
+        self.gen_params = gen_params
+        self.depth = gen_params.bpu_params.jump_targets_depth
+
+        layouts = gen_params.get(JumpBranchLayouts)
+        fields = gen_params.get(CommonLayoutFields)
+
+        self.insert = Method(i=make_layout(fields.pc, fields.cfi_target), o=make_layout(fields.jump_target_idx))
+        self.get = Method(i=layouts.predicted_jump_target_req, o=layouts.predicted_jump_target_resp)
+        self.dispatch = Method(i=make_layout(fields.jump_target_idx))
+        self.rollback = Method()
+        self.clear = Method()
+
+    def elaborate(self, platform):
+        m = TModule()
+
+        xlen = self.gen_params.isa.xlen
+        entries = Signal(
+            ArrayLayout(StructLayout({"valid": 1, "dispatched": 1, "pc": xlen, "target": xlen}), self.depth)
+        )
+        valids = Cat(entries[i].valid for i in range(self.depth))
+
+        m.submodules.free_prio_encoder = free_prio_encoder = PriorityEncoder(self.depth)
+        m.d.comb += free_prio_encoder.i.eq(~valids)
+
+        @def_method(m, self.insert, ready=~free_prio_encoder.n)
+        def _(pc, cfi_target):
+            entry = entries[free_prio_encoder.o]
+            m.d.sync += [entry.valid.eq(1), entry.dispatched.eq(0), entry.pc.eq(pc), entry.target.eq(cfi_target)]
+
+            return {"jump_target_idx": free_prio_encoder.o}
+
+        @def_method(m, self.get)
+        def _(pc, jump_target_idx):
+            entry = entries[jump_target_idx]
+            m.d.sync += entry.valid.eq(0)
+
+            return {"cfi_target": entry.target, "valid": entry.valid & (entry.pc == pc)}
+
+        @def_method(m, self.rollback)
+        def _():
+            for i in range(self.depth):
+                with m.If(~entries[i].dispatched):
+                    m.d.sync += entries[i].valid.eq(0)
+
+        # Defined after `rollback`, so that a jump leaving the frontend in the same cycle keeps its entry.
+        @def_method(m, self.dispatch)
+        def _(jump_target_idx):
+            entry = entries[jump_target_idx]
+            m.d.sync += [entry.valid.eq(1), entry.dispatched.eq(1)]
+
+        @def_method(m, self.clear)
+        def _():
+            for i in range(self.depth):
+                m.d.sync += entries[i].valid.eq(0)
+
+        return m
@@ -0,0 +1,84 @@
+from amaranth import *
+from amaranth.lib.data import ArrayLayout
+
+from transactron import Method, TModule, def_method
+from transactron.lib.metrics import HwCounter
+from transactron.utils.transactron_helpers import make_layout
+
+from coreblocks.params import GenParams
+from coreblocks.interface.layouts import CommonLayoutFields
+
+__all__ = ["ReturnAddressStack"]
+
+
+class ReturnAddressStack(Elaboratable):
+    """Return address stack
+
+    A circular stack of return addresses, speculatively updated by the fetch unit.
+    Calls push the address of the following instruction and returns pop it, so the target
+    of a return can be predicted without waiting for the jump to be resolved. When the stack
+    overflows, the oldest entries are overwritten.
+
+    Every instruction leaving the fetch unit carries the stack pointer as it was after
+    the instruction was fetched. When a mispredicted instruction is rolled back, the stack
+    pointer is set back to the one it carries with `repair`. Only the pointer is saved,
+    so entries overwritten on a wrong path are not recovered.
+
+    Attributes
+    ----------
+    peek : Method
+        Returns the address on the top of the stack and the current stack pointer.
+    update : Method
+        Pops an address from the stack if `pop` is set, and then pushes `target` if `push` is set.
+    repair : Method
+        Sets the stack pointer to the one saved with a mispredicted instruction.
+    """
+
+    def __init__(self, gen_params: GenParams) -> None:
+        """
+        Parameters
+        ----------
+        gen_params : GenParams
+            Core generation parameters.
+        """
+        self.gen_params = gen_params
+        self.params = gen_params.bpu_params
+
+        fields = gen_params.get(CommonLayoutFields)
+
+        self.peek = Method(o=make_layout(fields.cfi_target, fields.ras_tos))
+        self.update = Method(i=make_layout(("push", 1), ("pop", 1), fields.cfi_target))
+        self.repair = Method(i=make_layout(fields.ras_tos))
+
+        self.perf_repairs = HwCounter(
+            "frontend.bpu.ras.repairs", "Number of times the return address stack pointer was repaired"
+        )
+
+    def elaborate(self, platform):
+        m = TModule()
+
+        m.submodules += [self.perf_repairs]
+
+        entries = Signal(ArrayLayout(self.gen_params.isa.xlen, self.params.ras_depth))
+        tos = Signal(self.params.ras_depth_bits)
+
+        @def_method(m, self.peek, nonexclusive=True)
+        def _():
+            return {"cfi_target": entries[tos], "ras_tos": tos}
+
+        @def_method(m, self.update)
+        def _(push, pop, cfi_target):
+            after_pop = Mux(pop, tos - 1, tos)[: len(tos)]
+            after_push = Mux(push, after_pop + 1, after_pop)[: len(tos)]
+
+            m.d.sync += tos.eq(after_push)
+            with m.If(push):
+                m.d.sync += entries[after_push].eq(cfi_target)
+
+        # Defined last, so that a repair takes precedence over other updates in the same cycle.
+        @def_method(m, self.repair)
+        def _(ras_tos):
+            self.perf_repairs.incr(m)
+            m.d.sync += tos.eq(ras_tos)
+
+        return m
@@ -64,6 +64,8 @@ class DecodeStage(Elaboratable):
             m.d.av_comb += [
                 jb_funct7.rvc.eq(raw.rvc),
                 jb_funct7.predicted_taken.eq(raw.predicted_taken),
+                jb_funct7.ras_tos.eq(raw.ras_tos),
+                jb_funct7.jump_target_idx.eq(raw.jump_target_idx),
             ]
 
             exception_override = Signal()
@@ -10,6 +10,10 @@ from transactron import *
 
 from coreblocks.cache.iface import CacheInterface
 from coreblocks.frontend.decoder.rvc import InstrDecompress, is_instr_compressed
+from coreblocks.frontend.branch_prediction.direction import DirectionPredictor
+from coreblocks.frontend.branch_prediction.btb import BranchTargetBuffer
+from coreblocks.frontend.branch_prediction.jump_targets import PendingJumpTargets
+from coreblocks.frontend.branch_prediction.ras import ReturnAddressStack
 
 from coreblocks.arch import *
 from coreblocks.params import *
@@ -37,6 +41,21 @@ class FetchUnit(Elaboratable):
         Redirects the fetch unit to the specified PC
     flush : Method
         Flushes the fetch unit from the currently processed fetch blocks, so it can be redirected or/and stalled.
+    rollback : Method
+        Flushes the fetch unit like `flush` when a mispredicted instruction is rolled back. Additionally,
+        restores the return address stack pointer saved with the instruction. Keeps the predicted
+        targets of jumps which already left the frontend.
+    verify_branch : Method
+        Trains the branch predictor with the result of a resolved branch.
+        It has layout as described by `JumpBranchLayouts.verify_branch`.
+    predicted_jump_target : Method
+        Returns the target the fetch unit followed for a JALR instruction. The target is looked up
+        with the index which was passed to the backend along with the instruction.
+        It has layouts as described by `JumpBranchLayouts.predicted_jump_target_req` and
+        `JumpBranchLayouts.predicted_jump_target_resp`.
+    dispatch_jump : Method
+        Called when a JALR instruction with a predicted target leaves the frontend, with the index
+        of the entry holding the target. Since then, the target is kept on rollbacks.
     """
 
     def __init__(
@@ -68,6 +87,31 @@ class FetchUnit(Elaboratable):
 
         self.redirect = Method(i=self.layouts.redirect)
         self.flush = Method()
+        self.rollback = Method(i=make_layout(self.gen_params.get(CommonLayoutFields).ras_tos))
+        self.verify_branch = Method(i=self.gen_params.get(JumpBranchLayouts).verify_branch)
+
+        jb_layouts = self.gen_params.get(JumpBranchLayouts)
+        self.predicted_jump_target = Method(
+            i=jb_layouts.predicted_jump_target_req, o=jb_layouts.predicted_jump_target_resp
+        )
+        self.dispatch_jump = Method(i=make_layout(self.gen_params.get(CommonLayoutFields).jump_target_idx))
+
+        self.direction_predictor = None
+        if self.gen_params.bpu_params.direction != DirectionPredictorType.STATIC:
+            self.direction_predictor = DirectionPredictor(self.gen_params)
+
+        self.btb = None
+        if self.gen_params.bpu_params.btb_enable:
+            self.btb = BranchTargetBuffer(self.gen_params)
+
+        self.ras = None
+        if self.gen_params.bpu_params.ras_enable:
+            self.ras = ReturnAddressStack(self.gen_params)
+
+        # Predicted targets of indirect jumps have to be verified by the jump-branch unit.
+        self.pending_jump_targets = None
+        if self.btb is not None or self.ras is not None:
+            self.pending_jump_targets = PendingJumpTargets(self.gen_params)
 
         self.perf_fetch_utilization = TaggedCounter(
             "frontend.fetch.fetch_block_util",
@@ -77,11 +121,23 @@ class FetchUnit(Elaboratable):
         self.perf_fetch_redirects = HwCounter(
             "frontend.fetch.fetch_redirects", "How many times the fetch unit redirected itself"
         )
+        self.perf_btb_redirects = HwCounter(
+            "frontend.fetch.btb_redirects", "How many times the fetch unit followed a target from the BTB"
+        )
 
     def elaborate(self, platform):
         m = TModule()
 
-        m.submodules += [self.perf_fetch_utilization, self.perf_fetch_redirects]
+        m.submodules += [self.perf_fetch_utilization, self.perf_fetch_redirects, self.perf_btb_redirects]
+
+        if self.direction_predictor is not None:
+            m.submodules.direction_predictor = self.direction_predictor
+        if self.btb is not None:
+            m.submodules.btb = self.btb
+        if self.ras is not None:
+            m.submodules.ras = self.ras
+        if self.pending_jump_targets is not None:
+            m.submodules.pending_jump_targets = self.pending_jump_targets
 
         fetch_width = self.gen_params.fetch_width
         fields = self.gen_params.get(CommonLayoutFields)
@@ -99,7 +155,18 @@ class FetchUnit(Elaboratable):
             log.info(m, True, "Sending an instr to the backend pc=0x{:x} instr=0x{:x}", raw_instr.pc, raw_instr.instr)
             self.cont(m, raw_instr)
 
-        m.submodules.cache_requests = cache_requests = BasicFifo(layout=[("addr", self.gen_params.isa.xlen)], depth=2)
+        # The prediction made in stage 0 is passed along with the fetch block. The mask of instructions
+        # predicted taken if they are branches and the speculative history are needed in stage 2
+        # to find branches which the BTB doesn't know the target of and to repair the history.
+        prediction_fields = [
+            ("prediction", self.layouts.bpu_prediction),
+            ("taken_mask", fetch_width),
+            ("history", self.gen_params.bpu_params.history_bits),
+        ]
+
+        m.submodules.cache_requests = cache_requests = BasicFifo(
+            layout=[("addr", self.gen_params.isa.xlen), *prediction_fields], depth=2
+        )
 
         # This limits number of fetch blocks the fetch unit can process
         # at a time. We start counting when sending a request to the cache and
@@ -118,15 +185,73 @@ class FetchUnit(Elaboratable):
         # Fetch - stage 0
         # ================
         # - send a request to the instruction cache
+        # - predict the next fetch block
         #
         with Transaction(name="Fetch_Stage0").body(m):
             self.stall_lock(m)
             req_counter.acquire(m)
             self.icache.issue_req(m, addr=current_pc)
-            cache_requests.write(m, addr=current_pc)
+
+            fetch_block_addr = params.fb_addr(current_pc)
+
+            # Instructions before the current PC are not going to be fetched.
+            fetched_mask = Signal(fetch_width)
+            m.d.av_comb += fetched_mask.eq(C(1).replicate(fetch_width) << params.fb_instr_idx(current_pc))
+
+            prediction = Signal(self.layouts.bpu_prediction)
+            known_mask = Signal(fetch_width)
+            taken_mask = Signal(fetch_width)
+            history = Signal(self.gen_params.bpu_params.history_bits)
+
+            if self.direction_predictor is not None:
+                direction = self.direction_predictor.predict(m, fb_addr=fetch_block_addr)
+                m.d.av_comb += [
+                    known_mask.eq(direction.known),
+                    taken_mask.eq(direction.known & direction.taken),
+                    history.eq(direction.history),
+                ]
+            m.d.av_comb += prediction.branch_mask.eq(known_mask)
 
             # Assume we fallthrough to the next fetch block.
-            m.d.sync += current_pc.eq(params.pc_from_fb(params.fb_addr(current_pc) + 1, 0))
+            next_pc = Signal.like(current_pc)
+            m.d.av_comb += next_pc.eq(params.pc_from_fb(fetch_block_addr + 1, 0))
+
+            if self.btb is not None:
+                btb = self.btb.predict(m, fb_addr=fetch_block_addr)
+
+                # Branches in the BTB were taken recently, so they are predicted taken unless
+                # the direction predictor knows better.
+                btb_taken = Signal(fetch_width)
+                btb_branches = Signal(fetch_width)
+                for i in range(fetch_width):
+                    m.d.av_comb += [
+                        btb_branches[i].eq(btb.hit[i] & CfiType.is_branch(btb.cfi_types[i])),
+                        btb_taken[i].eq(btb.hit[i] & (~btb_branches[i] | ~known_mask[i] | taken_mask[i])),
+                    ]
+                m.d.av_comb += prediction.branch_mask.eq(known_mask | btb_branches)
+
+                # A branch predicted taken, but missing in the BTB, is followed in stage 2, so it stops
+                # the search as well.
+                m.submodules.btb_prio_encoder = btb_prio_encoder = PriorityEncoder(fetch_width)
+                m.d.av_comb += btb_prio_encoder.i.eq((btb_taken | taken_mask) & fetched_mask)
+
+                btb_idx = btb_prio_encoder.o[: self.gen_params.fetch_width_log]
+                with m.If(~btb_prio_encoder.n & btb_taken.bit_select(btb_idx, 1)):
+                    self.perf_btb_redirects.incr(m)
+                    m.d.av_comb += [
+                        prediction.cfi_idx.eq(btb_idx),
+                        prediction.cfi_type.eq(btb.cfi_types[btb_idx]),
+                        prediction.cfi_target.eq(btb.targets[btb_idx]),
+                        prediction.cfi_target_valid.eq(1),
+                        next_pc.eq(btb.targets[btb_idx]),
+                    ]
+                    if self.direction_predictor is not None:
+                        with m.If(CfiType.is_branch(btb.cfi_types[btb_idx])):
+                            self.direction_predictor.update_history(m, fb_addr=fetch_block_addr)
+
+            cache_requests.write(m, addr=current_pc, prediction=prediction, taken_mask=taken_mask, history=history)
+
+            m.d.sync += current_pc.eq(next_pc)
 
         #
         # State passed between stage 1 and stage 2
@@ -139,6 +264,8 @@ class FetchUnit(Elaboratable):
                 ("rvc", fetch_width),
                 ("instrs", ArrayLayout(self.gen_params.isa.ilen, fetch_width)),
                 ("instr_block_cross", 1),
+                ("last_instr_cross", 1),
+                *prediction_fields,
             ]
         )
 
@@ -218,11 +345,19 @@ class FetchUnit(Elaboratable):
                 else:
                     m.d.av_comb += instr_start[i].eq(fetch_block_offset <= i)
 
+            # Whether the last instruction in the fetch block crosses the fetch boundary
+            last_instr_cross = Signal()
+
             if Extension.C in self.gen_params.isa.extensions:
                 valid_instr_mask = Cat(instr_start[:-1], instr_start[-1] & is_rvc[-1])
+                m.d.av_comb += last_instr_cross.eq(~is_rvc[-1] & instr_start[-1])
 
+                # If stage 0 redirected the fetch unit, the next fetch block doesn't continue this one.
                 m.d.sync += prev_half_v.eq(
-                    (flushing_counter <= 1) & (cache_resp.error == 0) & ~is_rvc[-1] & instr_start[-1]
+                    (flushing_counter <= 1)
+                    & (cache_resp.error == 0)
+                    & last_instr_cross
+                    & ~CfiType.valid(target.prediction.cfi_type)
                 )
                 m.d.sync += prev_half.eq(cache_resp.fetch_block[-16:])
                 m.d.sync += prev_half_addr.eq(fetch_block_addr)
@@ -237,6 +372,10 @@ class FetchUnit(Elaboratable):
                 rvc=is_rvc,
                 instrs=expanded_instr,
                 instr_block_cross=instr_block_cross,
+                last_instr_cross=last_instr_cross,
+                prediction=target.prediction,
+                taken_mask=target.taken_mask,
+                history=target.history,
             )
 
         # Make sure to clean the state
@@ -271,8 +410,39 @@ class FetchUnit(Elaboratable):
             # Predecode instructions
             predecoded_instr = [predecoders[i].predecode(m, instrs[i]) for i in range(fetch_width)]
 
-            # No prediction for now
             prediction = Signal(self.layouts.bpu_prediction)
+            m.d.av_comb += prediction.eq(s1_data.prediction)
+
+            if self.direction_predictor is not None:
+                # A branch predicted taken, but missing in the BTB, couldn't be followed in stage 0.
+                # It is reported without a target and the prediction checker redirects the fetch unit
+                # to the target computed from the predecoded offset. Branches unknown to the predictor
+                # are left to the static prediction.
+                taken_branches = Signal(fetch_width)
+                for i in range(fetch_width):
+                    m.d.av_comb += taken_branches[i].eq(
+                        CfiType.is_branch(predecoded_instr[i].cfi_type) & s1_data.taken_mask[i]
+                    )
+
+                m.submodules.taken_branch_prio_encoder = taken_branch_prio_encoder = PriorityEncoder(fetch_width)
+                m.d.av_comb += taken_branch_prio_encoder.i.eq(taken_branches & instr_valid)
+
+                with m.If(
+                    ~taken_branch_prio_encoder.n
+                    & (
+                        ~CfiType.valid(s1_data.prediction.cfi_type)
+                        | (taken_branch_prio_encoder.o < s1_data.prediction.cfi_idx)
+                    )
+                ):
+                    m.d.av_comb += [
+                        prediction.cfi_idx.eq(taken_branch_prio_encoder.o),
+                        prediction.cfi_type.eq(CfiType.BRANCH),
+                        prediction.cfi_target_valid.eq(0),
+                    ]
+
+            ras_top = Signal(make_layout(fields.cfi_target, fields.ras_tos))
+            if self.ras is not None:
+                m.d.av_comb += assign(ras_top, self.ras.peek(m))
 
             # The method is guarded by the If to make sure that the metrics
             # are updated only if not flushing.
@@ -284,6 +454,8 @@ class FetchUnit(Elaboratable):
                     instr_valid=instr_valid,
                     predecoded=predecoded_instr,
                     prediction=prediction,
+                    ret_target=ras_top.cfi_target,
+                    ret_target_valid=self.ras is not None,
                 )
 
             # Is the instruction unsafe (i.e. stalls the frontend until the backend resumes it).
@@ -299,18 +471,29 @@ class FetchUnit(Elaboratable):
             has_unsafe = Signal()
             m.d.av_comb += has_unsafe.eq(~unsafe_prio_encoder.n)
 
+            # Either the prediction was wrong and the fetch unit has to redirect itself,
+            # or the prediction was right and stage 0 already followed the predicted CFI.
+            cfi_taken = Signal()
+            cfi_taken_idx = Signal(range(fetch_width))
+            m.d.av_comb += [
+                cfi_taken.eq(predcheck_res.mispredicted | CfiType.valid(prediction.cfi_type)),
+                cfi_taken_idx.eq(Mux(predcheck_res.mispredicted, predcheck_res.fb_instr_idx, prediction.cfi_idx)),
+            ]
+
             redirect_before_unsafe = Signal()
-            m.d.av_comb += redirect_before_unsafe.eq(predcheck_res.fb_instr_idx < unsafe_idx)
+            m.d.av_comb += redirect_before_unsafe.eq(cfi_taken_idx < unsafe_idx)
 
             redirect = Signal()
+            followed_prediction = Signal()
             unsafe_stall = Signal()
             redirect_or_unsafe_idx = Signal(range(fetch_width))
 
-            with m.If(predcheck_res.mispredicted & (~has_unsafe | redirect_before_unsafe)):
+            with m.If(cfi_taken & (~has_unsafe | redirect_before_unsafe)):
                 m.d.av_comb += [
-                    redirect.eq(~predcheck_res.stall),
-                    unsafe_stall.eq(predcheck_res.stall),
-                    redirect_or_unsafe_idx.eq(predcheck_res.fb_instr_idx),
+                    redirect.eq(predcheck_res.mispredicted & ~predcheck_res.stall),
+                    followed_prediction.eq(~predcheck_res.mispredicted),
+                    unsafe_stall.eq(predcheck_res.mispredicted & predcheck_res.stall),
+                    redirect_or_unsafe_idx.eq(cfi_taken_idx),
                 ]
             with m.Elif(has_unsafe):
                 m.d.av_comb += [
@@ -320,7 +503,7 @@ class FetchUnit(Elaboratable):
 
             # This mask denotes what prefix of instructions we should enqueue.
             valid_instr_prefix = Signal(fetch_width)
-            with m.If(redirect | unsafe_stall):
+            with m.If(redirect | followed_prediction | unsafe_stall):
                 # If there is an instruction that redirects or stalls the frontend, enqueue
                 # instructions only up to that instruction.
                 m.d.av_comb += valid_instr_prefix.eq((1 << (redirect_or_unsafe_idx + 1)) - 1)
@@ -331,6 +514,24 @@ class FetchUnit(Elaboratable):
             fetch_mask = Signal(fetch_width)
             m.d.av_comb += fetch_mask.eq(instr_valid & valid_instr_prefix)
 
+            # The last instruction sent to the backend - the only one which can be a jump.
+            last_cfi_type = Array(predecoded_instr[i].cfi_type for i in range(fetch_width))[redirect_or_unsafe_idx]
+            last_cfi_link = Array(predecoded_instr[i].cfi_link for i in range(fetch_width))[redirect_or_unsafe_idx]
+
+            # Calls push the return address to the return address stack and returns pop it.
+            ras_push = Signal()
+            ras_pop = Signal()
+            ras_tos_after = Signal.like(ras_top.ras_tos)
+            with m.If((redirect | followed_prediction | unsafe_stall) & ~access_fault):
+                m.d.av_comb += [
+                    ras_push.eq(last_cfi_link),
+                    ras_pop.eq(last_cfi_type == CfiType.RET),
+                ]
+            m.d.av_comb += ras_tos_after.eq(ras_top.ras_tos - ras_pop + ras_push)
+
+            # Entry in which the followed target of a JALR is stored until the jump is resolved.
+            jump_target_idx = Signal(self.gen_params.bpu_params.jump_targets_depth_bits)
+
             # Aggregate all signals that will be sent out of the fetch unit.
             raw_instrs = Signal(ArrayLayout(self.layouts.raw_instr, fetch_width))
             for i in range(fetch_width):
@@ -338,7 +539,9 @@ class FetchUnit(Elaboratable):
                     raw_instrs[i].instr.eq(instrs[i]),
                     raw_instrs[i].pc.eq(params.pc_from_fb(fetch_block_addr, i)),
                     raw_instrs[i].rvc.eq(s1_data.rvc[i]),
-                    raw_instrs[i].predicted_taken.eq(redirect & (predcheck_res.fb_instr_idx == i)),
+                    raw_instrs[i].predicted_taken.eq((redirect | followed_prediction) & (redirect_or_unsafe_idx == i)),
+                    raw_instrs[i].ras_tos.eq(Mux(redirect_or_unsafe_idx == i, ras_tos_after, ras_top.ras_tos)),
+                    raw_instrs[i].jump_target_idx.eq(jump_target_idx),
                     raw_instrs[i].access_fault.eq(
                         Mux(s1_data.access_fault, FetchLayouts.AccessFaultFlag.ACCESS_FAULT, 0)
                     ),
@@ -356,6 +559,35 @@ class FetchUnit(Elaboratable):
 
             with condition(m) as branch:
                 with branch(flushing_counter == 0):
+                    if self.direction_predictor is not None:
+                        with m.If(access_fault | unsafe_stall | redirect):
+                            # Discard the history updates made for the fetch blocks that are going to be flushed.
+                            self.direction_predictor.set_history(
+                                m,
+                                history=s1_data.history,
+                                fb_addr=fetch_block_addr,
+                                taken=redirect & CfiType.is_branch(last_cfi_type),
+                            )
+
+                    if self.ras is not None:
+                        with m.If(ras_push | ras_pop):
+                            last_instr = raw_instrs[redirect_or_unsafe_idx]
+                            self.ras.update(
+                                m,
+                                push=ras_push,
+                                pop=ras_pop,
+                                cfi_target=last_instr.pc + Mux(last_instr.rvc, 2, 4),
+                            )
+
+                    if self.pending_jump_targets is not None:
+                        with m.If((redirect | followed_prediction) & CfiType.is_jalr(last_cfi_type)):
+                            pending_jump = self.pending_jump_targets.insert(
+                                m,
+                                pc=raw_instrs[redirect_or_unsafe_idx].pc,
+                                cfi_target=Mux(redirect, predcheck_res.redirect_target, prediction.cfi_target),
+                            )
+                            m.d.av_comb += jump_target_idx.eq(pending_jump.jump_target_idx)
+
                     with m.If(access_fault | unsafe_stall):
                         # TODO: Raise different code for page fault when supported
                         # could be passed in 3rd bit of access_fault
@@ -363,9 +595,21 @@ class FetchUnit(Elaboratable):
                         self.stall_unsafe(m)
                     with m.Elif(redirect):
                         self.perf_fetch_redirects.incr(m)
+
                         new_pc = Signal.like(current_pc)
                         m.d.av_comb += new_pc.eq(predcheck_res.redirect_target)
 
+                        if Extension.C in self.gen_params.isa.extensions:
+                            # If stage 0 wrongly redirected the fetch unit, the fetch unit falls through
+                            # to the next fetch block, but stage 1 has already forgotten the first half
+                            # of the last instruction. Restore it.
+                            with m.If(s1_data.last_instr_cross & (predcheck_res.fb_instr_idx == fetch_width - 1)):
+                                m.d.sync += [
+                                    prev_half_v.eq(1),
+                                    prev_half.eq(instrs[fetch_width - 1][:16]),
+                                    prev_half_addr.eq(fetch_block_addr),
+                                ]
+
                         log.debug(m, True, "Fetch redirected itself to pc 0x{:x}. Flushing...", new_pc)
                         flush()
                         m.d.sync += current_pc.eq(new_pc)
@@ -381,10 +625,44 @@ class FetchUnit(Elaboratable):
         with m.If(flush_now):
             m.d.sync += flushing_counter.eq(req_counter.count_next)
 
-        @def_method(m, self.flush)
-        def _():
+        def flush_all():
             flush()
             serializer.clear(m)
+            if self.direction_predictor is not None:
+                self.direction_predictor.restore(m)
+
+        @def_method(m, self.flush)
+        def _():
+            flush_all()
+            # Targets of jumps on the flushed path would never be verified.
+            if self.pending_jump_targets is not None:
+                self.pending_jump_targets.clear(m)
+
+        @def_method(m, self.rollback)
+        def _(ras_tos):
+            flush_all()
+            if self.ras is not None:
+                self.ras.repair(m, ras_tos=ras_tos)
+            if self.pending_jump_targets is not None:
+                self.pending_jump_targets.rollback(m)
+
+        @def_method(m, self.verify_branch)
+        def _(arg):
+            if self.direction_predictor is not None:
+                self.direction_predictor.train(m, arg)
+            if self.btb is not None:
+                self.btb.update(m, arg)
+
+        @def_method(m, self.predicted_jump_target)
+        def _(pc, jump_target_idx):
+            if self.pending_jump_targets is not None:
+                return self.pending_jump_targets.get(m, pc=pc, jump_target_idx=jump_target_idx)
+            return {"cfi_target": 0, "valid": 0}
+
+        @def_method(m, self.dispatch_jump)
+        def _(jump_target_idx):
+            if self.pending_jump_targets is not None:
+                self.pending_jump_targets.dispatch(m, jump_target_idx=jump_target_idx)
 
         @def_method(m, self.redirect)
         def _(pc):
@@ -440,25 +718,29 @@ class Predecoder(Elaboratable):
 
             ret = Signal.like(self.predecode.data_out)
 
+            rd_link = (rd == Registers.X1) | (rd == Registers.X5)
+            rs1_link = (rs1 == Registers.X1) | (rs1 == Registers.X5)
+
             with m.Switch(opcode):
                 with m.Case(Opcode.BRANCH):
                     m.d.av_comb += ret.cfi_type.eq(CfiType.BRANCH)
                     m.d.av_comb += ret.cfi_offset.eq(bimm)
                 with m.Case(Opcode.JAL):
-                    m.d.av_comb += ret.cfi_type.eq(
-                        Mux((rd == Registers.X1) | (rd == Registers.X5), CfiType.CALL, CfiType.JAL)
-                    )
+                    m.d.av_comb += ret.cfi_type.eq(Mux(rd_link, CfiType.CALL, CfiType.JAL))
                     m.d.av_comb += ret.cfi_offset.eq(jimm)
+                    m.d.av_comb += ret.cfi_link.eq(rd_link)
                 with m.Case(Opcode.JALR):
-                    m.d.av_comb += ret.cfi_type.eq(
-                        Mux((rs1 == Registers.X1) | (rs1 == Registers.X5), CfiType.RET, CfiType.JALR)
-                    )
+                    # Return address stack hints from the RISC-V spec: a JALR writing the link
+                    # register it jumps to is a call (push only), not a return.
+                    m.d.av_comb += ret.cfi_type.eq(Mux(rs1_link & ~(rd_link & (rd == rs1)), CfiType.RET, CfiType.JALR))
                     m.d.av_comb += ret.cfi_offset.eq(iimm)
+                    m.d.av_comb += ret.cfi_link.eq(rd_link)
                 with m.Default():
                     m.d.av_comb += ret.cfi_type.eq(CfiType.INVALID)
 
             with m.If(quadrant != 0b11):
                 m.d.av_comb += ret.cfi_type.eq(CfiType.INVALID)
+                m.d.av_comb += ret.cfi_link.eq(0)
 
             m.d.av_comb += ret.unsafe.eq(
                 (opcode == Opcode.SYSTEM) | ((opcode == Opcode.MISC_MEM) & (funct3 == Funct3.FENCEI))
@@ -477,7 +759,8 @@ class PredictionChecker(Elaboratable):
 
      - a JAL/JALR instruction was not predicted taken,
      - mistaking non-control flow instructions (CFI) for control flow ones,
-     - getting the target of JAL/BRANCH instructions wrong.
+     - getting the target of JAL/BRANCH instructions wrong,
+     - getting the target of a return wrong, if the return address stack predicted it.
     """
 
     def __init__(self, gen_params: GenParams) -> None:
@@ -521,10 +804,17 @@ class PredictionChecker(Elaboratable):
         ]
 
         @def_method(m, self.check)
-        def _(fb_addr, instr_block_cross, instr_valid, predecoded, prediction):
+        def _(fb_addr, instr_block_cross, instr_valid, predecoded, prediction, ret_target, ret_target_valid):
             decoded_cfi_types = Array([predecoded[i].cfi_type for i in range(self.gen_params.fetch_width)])
             decoded_cfi_offsets = Array([predecoded[i].cfi_offset for i in range(self.gen_params.fetch_width)])
 
+            # Returns with a target known from the return address stack don't have to stall the frontend.
+            def is_predicted_ret(idx: Value) -> Value:
+                return ret_target_valid & (decoded_cfi_types[idx] == CfiType.RET)
+
+            def stalls(idx: Value) -> Value:
+                return CfiType.is_jalr(decoded_cfi_types[idx]) & ~is_predicted_ret(idx)
+
             # First find all the instructions that would redirect the fetch unit.
             decoded_redirections = Signal(self.gen_params.fetch_width)
             for i in range(self.gen_params.fetch_width):
@@ -552,8 +842,8 @@ class PredictionChecker(Elaboratable):
             def get_decoded_target_for(idx: Value) -> Value:
                 base = params.pc_from_fb(fb_addr, idx) + decoded_cfi_offsets[idx]
                 if Extension.C in self.gen_params.isa.extensions:
-                    return base - Mux(instr_block_cross & (idx == 0), 2, 0)
-                return base
+                    base = base - Mux(instr_block_cross & (idx == 0), 2, 0)
+                return Mux(is_predicted_ret(idx), ret_target, base)
 
             # Target of a CFI that would redirect the frontend according to the prediction
             decoded_target_for_predicted_cfi = Signal(self.gen_params.isa.xlen)
@@ -568,13 +858,18 @@ class PredictionChecker(Elaboratable):
                 | ~CfiType.valid(prediction.cfi_type)
             )
 
+            # The branch target buffer learns CFI types from the jump-branch unit, which doesn't
+            # distinguish calls and returns, so only the main types are compared.
             mispredicted_cfi_type = CfiType.valid(prediction.cfi_type) & (
-                prediction.cfi_type != decoded_cfi_types[prediction.cfi_idx]
+                ~instr_valid.bit_select(prediction.cfi_idx, 1)
+                | (Value.cast(prediction.cfi_type)[0:2] != Value.cast(decoded_cfi_types[prediction.cfi_idx])[0:2])
             )
 
-            mispredicted_cfi_target = (CfiType.is_branch(prediction.cfi_type) | CfiType.is_jal(prediction.cfi_type)) & (
-                ~prediction.cfi_target_valid | (decoded_target_for_predicted_cfi != prediction.cfi_target)
-            )
+            mispredicted_cfi_target = (
+                CfiType.is_branch(prediction.cfi_type)
+                | CfiType.is_jal(prediction.cfi_type)
+                | is_predicted_ret(prediction.cfi_idx)
+            ) & (~prediction.cfi_target_valid | (decoded_target_for_predicted_cfi != prediction.cfi_target))
 
             ret = Signal.like(self.check.data_out)
 
@@ -584,7 +879,7 @@ class PredictionChecker(Elaboratable):
                     ret,
                     {
                         "mispredicted": 1,
-                        "stall": CfiType.is_jalr(decoded_cfi_types[pd_redirect_idx]),
+                        "stall": stalls(pd_redirect_idx),
                         "fb_instr_idx": pd_redirect_idx,
                         "redirect_target": decoded_target_for_decoded_cfi,
                     },
@@ -596,7 +891,7 @@ class PredictionChecker(Elaboratable):
                     ret,
                     {
                         "mispredicted": 1,
-                        "stall": CfiType.is_jalr(decoded_cfi_types[pd_redirect_idx]),
+                        "stall": stalls(pd_redirect_idx),
                         "fb_instr_idx": Mux(pd_redirection_enc.n, self.gen_params.fetch_width - 1, pd_redirect_idx),
                         "redirect_target": Mux(pd_redirection_enc.n, fallthrough_addr, decoded_target_for_decoded_cfi),
                     },
@@ -2,7 +2,7 @@ from amaranth import *
 
 from transactron.core import *
 from transactron.lib import BasicFifo, Connect, Pipe
-from transactron.utils import assign
+from transactron.utils import ModuleConnector, assign, from_method_layout
 from transactron.utils.dependencies import DependencyContext
 
 from coreblocks.arch.optypes import OpType
@@ -11,9 +11,16 @@ from coreblocks.frontend.decoder.decode_stage import DecodeStage
 from coreblocks.frontend.fetch.fetch import FetchUnit
 from coreblocks.frontend.stall_controller import StallController
 from coreblocks.cache.icache import ICache, ICacheBypass
+from coreblocks.cache.stream_buffer import ICacheStreamBuffer
 from coreblocks.cache.refiller import SimpleCommonBusCacheRefiller
 from coreblocks.interface.layouts import *
-from coreblocks.interface.keys import BranchVerifyKey, FlushICacheKey, PredictedJumpTargetKey, RollbackKey
+from coreblocks.interface.keys import (
+    BranchRollbackKey,
+    BranchVerifyKey,
+    FlushICacheKey,
+    PredictedJumpTargetKey,
+    RollbackKey,
+)
 from coreblocks.peripherals.bus_adapter import BusMasterInterface
 
 
@@ -47,14 +54,15 @@ class RollbackTagger(Elaboratable):
         with Transaction().body(m):
             instr = self.get_instr(m)
 
-            is_branch = instr.exec_fn.op_type == OpType.BRANCH
-            # no need to make checkpoint at JALR, we currently stall the fetch on it
+            # JALR targets are predicted (e.g. returns by the return address stack), so they can be
+            # mispredicted just like branches.
+            is_speculative = (instr.exec_fn.op_type == OpType.BRANCH) | (instr.exec_fn.op_type == OpType.JALR)
 
             out = Signal(self.gen_params.get(SchedulerLayouts).scheduler_in)
             m.d.av_comb += assign(out, instr)
             m.d.av_comb += out.rollback_tag.eq(rollback_tag)
             m.d.av_comb += out.rollback_tag_v.eq(rollback_tag_v)
-            m.d.av_comb += out.commit_checkpoint.eq(is_branch)
+            m.d.av_comb += out.commit_checkpoint.eq(is_speculative)
 
             m.d.sync += rollback_tag_v.eq(0)
 
@@ -79,6 +87,11 @@ class CoreFrontend(Elaboratable):
         Resume the frontend from the given PC after an exception.
     stall: Method
         Stall and flush the frontend.
+    cancel_stall: Method
+        Cancel the stall caused by an exception, which was squashed by a rollback.
+    rollback: Method
+        Squash the instructions fetched after a mispredicted branch and resume the frontend from
+        the correct PC. Notifies all `RollbackKey` listeners. Automatically registered to `BranchRollbackKey`.
     """
 
     def __init__(self, *, gen_params: GenParams, instr_bus: BusMasterInterface):
@@ -91,6 +104,9 @@ class CoreFrontend(Elaboratable):
         if gen_params.icache_params.enable:
             self.icache_refiller = SimpleCommonBusCacheRefiller(cache_layouts, self.gen_params.icache_params, instr_bus)
             self.icache = ICache(cache_layouts, self.gen_params.icache_params, self.icache_refiller)
+        elif gen_params.icache_params.stream_blocks:
+            self.icache_bypass = ICacheBypass(cache_layouts, gen_params.icache_params, instr_bus)
+            self.icache = ICacheStreamBuffer(cache_layouts, gen_params.icache_params, self.icache_bypass)
         else:
             self.icache = ICacheBypass(cache_layouts, gen_params.icache_params, instr_bus)
 
@@ -106,18 +122,17 @@ class CoreFrontend(Elaboratable):
             self.stall_ctrl.stall_unsafe,
         )
 
+        self.connections.add_dependency(PredictedJumpTargetKey(), self.fetch.predicted_jump_target)
+
         self.output_pipe = Pipe(self.gen_params.get(SchedulerLayouts).scheduler_in)
         self.decode_buff = Connect(self.gen_params.get(DecodeLayouts).decoded_instr)
 
-        # TODO: move and implement these methods
-        jb_layouts = self.gen_params.get(JumpBranchLayouts)
-        self.target_pred_req = Method(i=jb_layouts.predicted_jump_target_req)
-        self.target_pred_resp = Method(o=jb_layouts.predicted_jump_target_resp)
-        DependencyContext.get().add_dependency(PredictedJumpTargetKey(), (self.target_pred_req, self.target_pred_resp))
-
-        self.consume_instr = self.output_pipe.read
+        self.consume_instr = Method(o=self.gen_params.get(SchedulerLayouts).scheduler_in)
         self.resume_from_exception = self.stall_ctrl.resume_from_exception
         self.stall = Method()
+        self.cancel_stall = self.stall_ctrl.cancel_stall_exception
+        self.rollback = Method(i=self.gen_params.get(JumpBranchLayouts).rollback)
+        self.connections.add_dependency(BranchRollbackKey(), self.rollback)
 
         self.rollback_tagger = RollbackTagger(self.gen_params)
 
@@ -126,6 +141,8 @@ class CoreFrontend(Elaboratable):
 
         if self.gen_params.icache_params.enable:
             m.submodules.icache_refiller = self.icache_refiller
+        elif self.gen_params.icache_params.stream_blocks:
+            m.submodules.icache_bypass = self.icache_bypass
         m.submodules.icache = self.icache
 
         m.submodules.fetch = self.fetch
@@ -146,27 +163,41 @@ class CoreFrontend(Elaboratable):
         m.submodules.stall_ctrl = self.stall_ctrl
         self.stall_ctrl.redirect_frontend.provide(self.fetch.redirect)
 
-        # TODO: Remove when Branch Predictor implemented
-        with Transaction(name="DiscardBranchVerify").body(m):
-            read = self.connections.get_dependency(BranchVerifyKey())
-            read(m)  # Consume to not block JB Unit
+        with Transaction(name="BranchVerify").body(m):
+            verify = self.connections.get_dependency(BranchVerifyKey())
+            self.fetch.verify_branch(m, verify(m))
 
-        @def_method(m, self.target_pred_req)
+        @def_method(m, self.consume_instr)
         def _():
-            pass
+            instr = self.output_pipe.read(m)
+
+            # Instructions which left the frontend are not squashed by `flush_frontend`, so the predicted
+            # target of a jump has to be kept until the jump-branch unit verifies it.
+            funct7_info = Signal(from_method_layout(self.gen_params.get(JumpBranchLayouts).funct7_info))
+            m.d.av_comb += funct7_info.eq(instr.exec_fn.funct7)
+            with m.If((instr.exec_fn.op_type == OpType.JALR) & funct7_info.predicted_taken):
+                self.fetch.dispatch_jump(m, jump_target_idx=funct7_info.jump_target_idx)
 
-        @def_method(m, self.target_pred_resp)
-        def _(arg):
-            return {"valid": 0, "cfi_target": 0}
+            return instr
 
         def flush_frontend():
-            self.fetch.flush(m)
             self.instr_buffer.clear(m)
             self.output_pipe.clean(m)
 
         @def_method(m, self.stall)
         def _():
+            self.fetch.flush(m)
             flush_frontend()
             self.stall_ctrl.stall_exception(m)
 
+        rollback_listeners, rollback_unifiers = self.connections.get_dependency(RollbackKey())
+        m.submodules.rollback_unifiers = ModuleConnector(**rollback_unifiers)
+
+        @def_method(m, self.rollback)
+        def _(tag, pc, ras_tos):
+            rollback_listeners(m, tag=tag)
+            self.fetch.rollback(m, ras_tos=ras_tos)
+            flush_frontend()
+            self.stall_ctrl.resume_from_rollback(m, pc=pc)
+
         return m
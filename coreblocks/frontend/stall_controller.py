@@ -37,6 +37,11 @@ class StallController(Elaboratable):
         A non-exclusive method whose readiness denotes if the frontend is currently stalled.
     resume_from_exception: Method
         Signals that the backend handled the exception and the frontend can be resumed.
+    resume_from_rollback: Method
+        Signals that a mispredicted branch was rolled back and the frontend should continue from the given PC.
+        Unsafe instructions fetched after the branch are squashed, so the frontend doesn't wait for them.
+    cancel_stall_exception: Method
+        Signals that the exception the frontend was stalled for was squashed by a rollback.
     redirect_frontend : Method (bodyless)
         A method that will be called when the frontend needs to be redirected. Should be always
         ready.
@@ -52,6 +57,8 @@ class StallController(Elaboratable):
         self.stall_guard = Method()
         self.resume_from_exception = Method(i=layouts.resume)
         self._resume_from_unsafe = Method(i=layouts.resume)
+        self.resume_from_rollback = Method(i=layouts.resume)
+        self.cancel_stall_exception = Method()
 
         self.redirect_frontend = Method(i=layouts.redirect)
 
@@ -95,12 +102,26 @@ class StallController(Elaboratable):
             log.info(m, True, "Resuming from exception new_pc=0x{:x}", pc)
             self.redirect_frontend(m, pc=pc)
 
+        @def_method(m, self.cancel_stall_exception)
+        def _():
+            log.info(m, True, "Squashed exception, the frontend doesn't wait for it anymore")
+            m.d.sync += stalled_exception.eq(0)
+
         @def_method(m, self.stall_unsafe)
         def _():
             log.assertion(m, ~stalled_unsafe, "Can't be stalled twice because of an unsafe instruction")
             log.info(m, True, "Stalling the frontend because of an unsafe instruction")
             m.d.sync += stalled_unsafe.eq(1)
 
+        # Defined after `stall_unsafe`, because the fetch unit can stall on a squashed instruction
+        # in the same cycle.
+        @def_method(m, self.resume_from_rollback)
+        def _(pc):
+            m.d.sync += stalled_unsafe.eq(0)
+
+            log.info(m, True, "Resuming after a rollback new_pc=0x{:x}", pc)
+            self.redirect_frontend(m, pc=pc)
+
         # Fetch can be resumed to unstall from 'unsafe' instructions, and stalled because
         # of exception report, both can happen at any time during normal execution.
         @def_method(m, self.stall_exception)
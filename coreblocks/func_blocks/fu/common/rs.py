@@ -71,8 +71,9 @@ class RSBase(Elaboratable):
 
     def _elaborate(self, m: TModule, takeable_mask: ValueLike, alloc: Method, free_idx: Method, order: Method):
         # The role of _elaborate is to accomodate FifoRS, which is currently
-        # used in the LSU. This is a stop-gap - if one day a real LSU
-        # is implemented, FifoRS should be removed.
+        # used with LSUDummy. LSUDummy, and the atomic operations built on top
+        # of it, expect the memory instructions in program order. The out-of-order
+        # LoadStoreQueue uses a normal RS.
 
         # The alloc, free_idx, order parameters follow the interface of
         # Transactron's PreservedOrderAllocator.
@@ -5,8 +5,8 @@ from coreblocks.params import *
 from .rs import RS, RSBase
 from coreblocks.scheduler.wakeup_select import WakeupSelect
 from transactron import Method, TModule
-from coreblocks.func_blocks.interface.func_protocols import FuncUnit, FuncBlock
-from transactron.lib import FIFO, Collector, Connect
+from coreblocks.func_blocks.interface.func_protocols import FuncUnit, ReservingFuncUnit, FuncBlock
+from transactron.lib import FIFO, Collector, Connect, MethodProduct
 from coreblocks.arch import OpType
 from coreblocks.interface.layouts import RSLayouts, FuncUnitLayouts
 
@@ -23,7 +23,8 @@ class RSFuncBlock(FuncBlock, Elaboratable):
     insert: Method
         RS insert method.
     select: Method
-        RS select method.
+        RS select method. It also reserves a place in the functional unit, if the
+        unit requires it (see `ReservingFuncUnit`).
     update: Method
         RS update method.
     get_result: Method
@@ -61,6 +62,11 @@ class RSFuncBlock(FuncBlock, Elaboratable):
         self.fu_layouts = gen_params.get(FuncUnitLayouts)
         self.func_units = list(func_units)
 
+        # The type of the instruction isn't known when an RS entry is selected, so a place
+        # is reserved for every instruction put to this block.
+        self.reserves = [fu.reserve for fu, _, _ in self.func_units if isinstance(fu, ReservingFuncUnit)]
+        assert not self.reserves or len(self.func_units) == 1
+
         self.insert = Method(i=self.rs_layouts.rs.insert_in)
         self.select = Method(o=self.rs_layouts.rs.select_out)
         self.update = Method(i=self.rs_layouts.rs.update_in)
@@ -99,7 +105,11 @@ class RSFuncBlock(FuncBlock, Elaboratable):
         m.submodules.collector = collector = Collector.create(targets)
 
         self.insert.provide(self.rs.insert)
-        self.select.provide(self.rs.select)
+        if self.reserves:
+            m.submodules.select = select = MethodProduct.create([self.rs.select] + self.reserves)
+            self.select.provide(select.method)
+        else:
+            self.select.provide(self.rs.select)
         self.update.provide(self.rs.update[0])
         self.get_result.provide(collector.method)
 
@@ -11,11 +11,14 @@ from transactron.lib import *
 from transactron.lib import logging
 from transactron.utils import DependencyContext, from_method_layout
 from coreblocks.params import GenParams, FunctionalComponentParams
-from coreblocks.arch import Funct3, OpType, ExceptionCause, Extension
+from coreblocks.arch import Funct3, OpType, ExceptionCause, Extension, CfiType
 from coreblocks.interface.layouts import FuncUnitLayouts, JumpBranchLayouts, CommonLayoutFields
 from coreblocks.interface.keys import (
+    ActiveTagsKey,
     AsyncInterruptInsertSignalKey,
+    BranchRollbackKey,
     BranchVerifyKey,
+    CoreStateKey,
     ExceptionReportKey,
     PredictedJumpTargetKey,
 )
@@ -131,6 +134,9 @@ class JumpBranchFuncUnit(FuncUnit, Elaboratable):
             "backend.fu.jumpbranch.misaligned", "Number of instructions with misaligned target address"
         )
         self.perf_mispredictions = HwCounter("backend.fu.jumpbranch.mispredictions", "Number of branch mispredictions")
+        self.perf_rollbacks = HwCounter(
+            "backend.fu.jumpbranch.rollbacks", "Number of mispredictions recovered by rolling back to a checkpoint"
+        )
 
         self.exception_report = self.dm.get_dependency(ExceptionReportKey())()
 
@@ -141,9 +147,13 @@ class JumpBranchFuncUnit(FuncUnit, Elaboratable):
             self.perf_instr,
             self.perf_misaligned,
             self.perf_mispredictions,
+            self.perf_rollbacks,
         ]
 
-        jump_target_req, jump_target_resp = self.dm.get_dependency(PredictedJumpTargetKey())
+        predicted_jump_target = self.dm.get_dependency(PredictedJumpTargetKey())
+        branch_rollback = self.dm.get_dependency(BranchRollbackKey())
+        get_active_tags = self.dm.get_dependency(ActiveTagsKey())
+        core_state = self.dm.get_dependency(CoreStateKey())
 
         m.submodules.jb = jb = JumpBranch(self.gen_params, fn=self.jb_fn)
         m.submodules.decoder = decoder = self.jb_fn.get_decoder(self.gen_params)
@@ -159,18 +169,51 @@ class JumpBranchFuncUnit(FuncUnit, Elaboratable):
             ("reg_res", self.gen_params.isa.xlen),
             ("taken", 1),
             fields.predicted_taken,
+            fields.rvc,
+            fields.ras_tos,
+            fields.jump_target_idx,
             fields.tag,
         )
         m.submodules.instr_fifo = instr_fifo = BasicFifo(instr_fifo_layout, 2)
 
+        # Rollbacks are performed in a separate transaction, because they clean the frontend and would
+        # otherwise conflict with it every time a jump is resolved. The rollback is forwarded in the same
+        # cycle, so that the branch can't retire before it.
+        m.submodules.rollback_fwd = rollback_fwd = Forwarder(self.gen_params.get(JumpBranchLayouts).rollback)
+
+        with Transaction(name="BranchRollback").body(m):
+            self.perf_rollbacks.incr(m)
+            branch_rollback(m, rollback_fwd.read(m))
+
+        # The core state is read in a separate transaction, because a rollback checks it too.
+        flushing = Signal()
+        with Transaction().body(m):
+            m.d.comb += flushing.eq(core_state(m).flushing)
+
         with Transaction().body(m):
             instr = instr_fifo.read(m)
-            target_prediction = jump_target_resp(m)
 
             jump_result = Mux(instr.taken, instr.jmp_addr, instr.reg_res)
             is_auipc = instr.type == JumpBranchFn.Fn.AUIPC
+            is_jalr = instr.type == JumpBranchFn.Fn.JALR
+
+            # Instructions with an inactive tag were already squashed by a rollback of an older branch.
+            # They must not affect the frontend.
+            tags = get_active_tags(m)
+            tag_active = Signal()
+            can_rollback = Signal()
+            m.d.av_comb += tag_active.eq(tags.active_tags[instr.tag])
+            m.d.av_comb += can_rollback.eq(tag_active & tags.checkpointed_tags[instr.tag] & ~flushing)
+
+            # The frontend followed a predicted JALR target, which has to be checked. The target is fetched
+            # for squashed jumps too, so that it is freed.
+            target_prediction = Signal(self.gen_params.get(JumpBranchLayouts).predicted_jump_target_resp)
+            with m.If(is_jalr & instr.predicted_taken):
+                m.d.av_comb += target_prediction.eq(
+                    predicted_jump_target(m, pc=instr.pc, jump_target_idx=instr.jump_target_idx)
+                )
 
-            predicted_addr_correctly = (instr.type != JumpBranchFn.Fn.JALR) | (
+            predicted_addr_correctly = ~is_jalr | (
                 target_prediction.valid & (target_prediction.cfi_target == instr.jmp_addr)
             )
 
@@ -178,7 +221,7 @@ class JumpBranchFuncUnit(FuncUnit, Elaboratable):
             m.d.av_comb += misprediction.eq(
                 ~(is_auipc | (predicted_addr_correctly & (instr.taken == instr.predicted_taken)))
             )
-            self.perf_mispredictions.incr(m, enable_call=misprediction)
+            self.perf_mispredictions.incr(m, enable_call=misprediction & tag_active)
 
             jmp_addr_misaligned = (
                 instr.jmp_addr & (0b1 if Extension.C in self.gen_params.isa.extensions else 0b11)
@@ -200,6 +243,7 @@ class JumpBranchFuncUnit(FuncUnit, Elaboratable):
                     cause=ExceptionCause.INSTRUCTION_ADDRESS_MISALIGNED,
                     pc=instr.pc,
                     mtval=instr.jmp_addr,
+                    tag=instr.tag,
                 )
 
             with m.Elif(async_interrupt_active & ~is_auipc):
@@ -209,18 +253,50 @@ class JumpBranchFuncUnit(FuncUnit, Elaboratable):
                 # and exception would be lost.
                 m.d.comb += exception.eq(1)
                 self.exception_report(
-                    m, rob_id=instr.rob_id, cause=ExceptionCause._COREBLOCKS_ASYNC_INTERRUPT, pc=jump_result, mtval=0
+                    m,
+                    rob_id=instr.rob_id,
+                    cause=ExceptionCause._COREBLOCKS_ASYNC_INTERRUPT,
+                    pc=jump_result,
+                    mtval=0,
+                    tag=instr.tag,
                 )
-            with m.Elif(misprediction):
+            with m.Elif(misprediction & can_rollback):
                 # Async interrupts can have priority, because `jump_result` is handled in the same way.
                 # No extra misprediction penalty will be introducted at interrupt return to `jump_result` address.
+                # Younger instructions are squashed right away, and fetching restarts from `jump_result`.
+                rollback_fwd.write(m, tag=instr.tag, pc=jump_result, ras_tos=instr.ras_tos)
+            with m.Elif(misprediction & tag_active):
+                # There is no checkpoint to roll back to (or the core is being flushed) - flush the core
+                # when the branch retires and continue from the correct pc.
                 m.d.comb += exception.eq(1)
                 self.exception_report(
-                    m, rob_id=instr.rob_id, cause=ExceptionCause._COREBLOCKS_MISPREDICTION, pc=jump_result, mtval=0
+                    m,
+                    rob_id=instr.rob_id,
+                    cause=ExceptionCause._COREBLOCKS_MISPREDICTION,
+                    pc=jump_result,
+                    mtval=0,
+                    tag=instr.tag,
                 )
 
-            with m.If(~is_auipc):
-                self.fifo_branch_resolved.write(m, from_pc=instr.pc, next_pc=jump_result, misprediction=misprediction)
+            with m.If(~is_auipc & tag_active):
+                cfi_type = Signal(CfiType)
+                with m.Switch(instr.type):
+                    with m.Case(JumpBranchFn.Fn.JAL):
+                        m.d.av_comb += cfi_type.eq(CfiType.JAL)
+                    with m.Case(JumpBranchFn.Fn.JALR):
+                        m.d.av_comb += cfi_type.eq(CfiType.JALR)
+                    with m.Default():
+                        m.d.av_comb += cfi_type.eq(CfiType.BRANCH)
+
+                self.fifo_branch_resolved.write(
+                    m,
+                    from_pc=instr.pc,
+                    next_pc=jump_result,
+                    cfi_type=cfi_type,
+                    rvc=instr.rvc,
+                    taken=instr.taken,
+                    misprediction=misprediction,
+                )
                 log.debug(
                     m,
                     True,
@@ -252,8 +328,6 @@ class JumpBranchFuncUnit(FuncUnit, Elaboratable):
             m.d.top_comb += funct7_info.eq(arg.exec_fn.funct7)
             m.d.top_comb += jb.in_rvc.eq(funct7_info.rvc)
 
-            jump_target_req(m)
-
             instr_fifo.write(
                 m,
                 rob_id=arg.rob_id,
@@ -264,6 +338,9 @@ class JumpBranchFuncUnit(FuncUnit, Elaboratable):
                 reg_res=jb.reg_res,
                 taken=jb.taken,
                 predicted_taken=funct7_info.predicted_taken,
+                rvc=funct7_info.rvc,
+                ras_tos=funct7_info.ras_tos,
+                jump_target_idx=funct7_info.jump_target_idx,
                 tag=arg.tag,
             )
             self.perf_instr.incr(m, decoder.decode_fn)
@@ -11,11 +11,21 @@ from coreblocks.params import *
 from coreblocks.arch import OpType
 from coreblocks.peripherals.bus_adapter import BusMasterInterface
 from coreblocks.frontend.decoder import *
-from coreblocks.interface.layouts import LSULayouts, FuncUnitLayouts
+from coreblocks.interface.layouts import LSULayouts, FuncUnitLayouts, DCacheLayouts
 from coreblocks.func_blocks.interface.func_protocols import FuncUnit
 from coreblocks.func_blocks.fu.lsu.pma import PMAChecker
 from coreblocks.func_blocks.fu.lsu.lsu_requester import LSURequester
-from coreblocks.interface.keys import CoreStateKey, ExceptionReportKey, CommonBusDataKey, InstructionPrecommitKey
+from coreblocks.func_blocks.fu.lsu.store_buffer import StoreBuffer
+from coreblocks.cache.dcache import DCache, DCacheBypass
+from coreblocks.cache.iface import CacheInterface
+from coreblocks.cache.refiller import CommonBusDCacheRefiller
+from coreblocks.interface.keys import (
+    CoreStateKey,
+    ExceptionReportKey,
+    CommonBusDataKey,
+    InstructionPrecommitKey,
+    StoresDrainedKey,
+)
 
 __all__ = ["LSUDummy", "LSUComponent"]
 
@@ -25,6 +35,15 @@ class LSUDummy(FuncUnit, Elaboratable):
     Very simple LSU, which serializes all stores and loads.
     It isn't fully compliant with RiscV spec. Doesn't support checking if
     address is in correct range. Addresses have to be aligned.
+
+    Stores to main memory are committed as soon as they enter the store buffer.
+    MMIO accesses wait until the store buffer is drained.
+
+    Attributes
+    ----------
+    stores_drained : Method
+        Ready only when all committed stores were written to memory. Available only if
+        the store buffer is enabled.
     """
 
     def __init__(self, gen_params: GenParams, bus: BusMasterInterface) -> None:
@@ -49,6 +68,10 @@ class LSUDummy(FuncUnit, Elaboratable):
 
         self.bus = bus
 
+        if self.gen_params.store_buffer_depth:
+            self.stores_drained = Method()
+            self.dependency_manager.add_dependency(StoresDrainedKey(), self.stores_drained)
+
         self.log = HardwareLogger("backend.lsu.dummylsu")
 
     def elaborate(self, platform):
@@ -63,10 +86,34 @@ class LSUDummy(FuncUnit, Elaboratable):
         # Signals for handling issue logic
         request_rob_id = Signal(self.gen_params.rob_entries_bits)
         rob_id_match = Signal()
+        squashed = Signal()  # the request is at the head of the ROB, but it was squashed by a rollback
         is_load = Signal()
 
         m.submodules.pma_checker = pma_checker = PMAChecker(self.gen_params)
-        m.submodules.requester = requester = LSURequester(self.gen_params, self.bus)
+        dcache: CacheInterface
+        dcache_params = self.gen_params.dcache_params
+        if dcache_params.enable:
+            m.submodules.dcache_refiller = dcache_refiller = CommonBusDCacheRefiller(
+                self.gen_params.get(DCacheLayouts), dcache_params, self.bus
+            )
+            m.submodules.dcache = dcache = DCache(self.gen_params, dcache_refiller, self.bus)
+        else:
+            m.submodules.dcache = dcache = DCacheBypass(self.gen_params.get(DCacheLayouts), dcache_params, self.bus)
+
+        stores_drained = Signal(init=1)
+        if self.gen_params.store_buffer_depth:
+            m.submodules.store_buffer = store_buffer = StoreBuffer(
+                self.gen_params, dcache, self.gen_params.store_buffer_depth
+            )
+            m.d.comb += stores_drained.eq(store_buffer.empty)
+
+            @def_method(m, self.stores_drained, ready=stores_drained)
+            def _():
+                pass
+
+            dcache = store_buffer
+
+        m.submodules.requester = requester = LSURequester(self.gen_params, dcache)
 
         m.submodules.requests = requests = Forwarder(self.fu_layouts.issue)
         m.submodules.results_noop = results_noop = FIFO(self.lsu_layouts.accept, 2)
@@ -86,12 +133,12 @@ class LSUDummy(FuncUnit, Elaboratable):
                 issued_noop.write(m, arg)
 
         # Issues load/store requests when the instruction is known, is a LOAD/STORE, and just before commit.
-        # Memory loads can be issued speculatively.
+        # Memory loads can be issued speculatively. MMIO accesses are ordered after the buffered stores.
         pmas = pma_checker.result
         can_reorder = is_load & ~pmas["mmio"]
-        want_issue = rob_id_match | can_reorder
+        want_issue = (rob_id_match & (~pmas["mmio"] | stores_drained)) | can_reorder
 
-        do_issue = ~flush & want_issue
+        do_issue = ~flush & ~squashed & want_issue
         with Transaction().body(m, ready=do_issue):
             arg = requests.read(m)
 
@@ -115,8 +162,8 @@ class LSUDummy(FuncUnit, Elaboratable):
             with m.Else():
                 issued.write(m, arg)
 
-        # Handles flushed instructions as a no-op.
-        with Transaction().body(m, ready=flush):
+        # Handles flushed and squashed instructions as a no-op.
+        with Transaction().body(m, ready=flush | squashed):
             arg = requests.read(m)
             results_noop.write(m, data=0, exception=0, cause=0, addr=0)
             issued_noop.write(m, arg)
@@ -133,7 +180,9 @@ class LSUDummy(FuncUnit, Elaboratable):
                     m.d.comb += arg.eq(issued_noop.read(m))
 
             with m.If(res["exception"]):
-                self.report(m, rob_id=arg["rob_id"], cause=res["cause"], pc=arg["pc"], mtval=res["addr"])
+                self.report(
+                    m, rob_id=arg["rob_id"], cause=res["cause"], pc=arg["pc"], mtval=res["addr"], tag=arg["tag"]
+                )
 
             self.log.debug(m, 1, "accept rob_id={} result=0x{:08x} exception={}", arg.rob_id, res.data, res.exception)
 
@@ -147,8 +196,9 @@ class LSUDummy(FuncUnit, Elaboratable):
 
         with Transaction().body(m):
             precommit = self.dependency_manager.get_dependency(InstructionPrecommitKey())
-            precommit(m, request_rob_id)
+            info = precommit(m, request_rob_id)
             m.d.comb += rob_id_match.eq(1)
+            m.d.comb += squashed.eq(~info.side_fx)
 
         return m
 
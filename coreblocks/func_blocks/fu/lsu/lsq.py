@@ -0,0 +1,477 @@
+from dataclasses import dataclass
+from amaranth import *
+from amaranth.lib.data import ArrayLayout, StructLayout
+from amaranth_types import ValueLike
+
+from transactron import Method, def_method, Transaction, TModule
+from transactron.lib import BasicFifo, FIFO, Forwarder
+from transactron.lib.logging import HardwareLogger
+from transactron.lib.metrics import HwCounter
+from transactron.lib.simultaneous import condition
+from transactron.utils import DependencyContext, popcount
+from transactron.utils.amaranth_ext.coding import PriorityEncoder
+
+from coreblocks.params import *
+from coreblocks.arch import OpType, Funct3, ExceptionCause
+from coreblocks.peripherals.bus_adapter import BusMasterInterface
+from coreblocks.interface.layouts import FuncUnitLayouts, DCacheLayouts
+from coreblocks.func_blocks.interface.func_protocols import ReservingFuncUnit
+from coreblocks.func_blocks.fu.lsu.pma import PMAChecker
+from coreblocks.func_blocks.fu.lsu.lsu_requester import LSURequester
+from coreblocks.func_blocks.fu.lsu.store_buffer import StoreBuffer
+from coreblocks.cache.dcache import DCache, DCacheBypass
+from coreblocks.cache.iface import CacheInterface
+from coreblocks.cache.refiller import CommonBusDCacheRefiller
+from coreblocks.interface.keys import (
+    ActiveTagsKey,
+    CoreStateKey,
+    ExceptionReportKey,
+    CommonBusDataKey,
+    InstructionPrecommitKey,
+    ROBIndicesKey,
+    StoresDrainedKey,
+)
+
+__all__ = ["LoadStoreQueue", "LSQComponent"]
+
+
+class LoadStoreQueue(ReservingFuncUnit, Elaboratable):
+    """
+    Load/store unit which executes memory instructions out of order.
+
+    Every memory instruction takes an entry in the load/store queue. The entries are
+    reserved in program order, when instructions are put to the reservation station,
+    so the oldest instruction always has a place in the queue.
+
+    Loads to main memory are sent to memory as soon as their address is known, also
+    past older stores which didn't compute their address yet. The bytes written by
+    older stores which wait in the queue are forwarded to the loaded data. When a store
+    computes its address, younger loads which already read one of the written bytes
+    are replayed - they are flushed with all younger instructions and fetched again.
+
+    Stores are sent to memory when they reach the head of the ROB. MMIO accesses are
+    never speculative: MMIO loads are executed at the head of the ROB too, and all MMIO
+    accesses wait for the store buffer to drain.
+
+    Attributes
+    ----------
+    reserve : Method
+        Reserves an entry in the queue. Called for every instruction put to the reservation station.
+    stores_drained : Method
+        Ready only when all committed stores were written to memory. Available only if
+        the store buffer is enabled.
+    """
+
+    def __init__(self, gen_params: GenParams, bus: BusMasterInterface, entries: int = 8) -> None:
+        """
+        Parameters
+        ----------
+        gen_params : GenParams
+            Parameters to be used during processor generation.
+        bus : BusMasterInterface
+            An instance of the bus master for interfacing with the data bus.
+        entries : int
+            Number of entries in the load/store queue.
+        """
+
+        self.gen_params = gen_params
+        self.entries = entries
+        self.fu_layouts = gen_params.get(FuncUnitLayouts)
+
+        self.dependency_manager = DependencyContext.get()
+        self.report = self.dependency_manager.get_dependency(ExceptionReportKey())()
+
+        self.issue = Method(i=self.fu_layouts.issue)
+        self.push_result = Method(i=self.fu_layouts.push_result)
+        self.reserve = Method()
+
+        self.bus = bus
+
+        if self.gen_params.store_buffer_depth:
+            self.stores_drained = Method()
+            self.dependency_manager.add_dependency(StoresDrainedKey(), self.stores_drained)
+
+        self.log = HardwareLogger("backend.lsu.lsq")
+
+        self.perf_forwarded = HwCounter(
+            "backend.lsu.lsq.forwarded", "Number of loads which got data from an older store in the queue"
+        )
+        self.perf_replays = HwCounter(
+            "backend.lsu.lsq.replays", "Number of loads replayed because they were executed before an older store"
+        )
+
+    def elaborate(self, platform):
+        m = TModule()
+
+        m.submodules += [self.perf_forwarded, self.perf_replays]
+
+        xlen = self.gen_params.isa.xlen
+        dcache_params = self.gen_params.dcache_params
+        word_bytes = dcache_params.word_width_bytes
+        word_bytes_log = dcache_params.word_width_bytes_log
+
+        flush = Signal()  # exception handling, requests are not issued
+        rob_head = Signal(self.gen_params.rob_entries_bits)
+        rob_size = Signal(self.gen_params.rob_entries_bits)  # number of instructions in the ROB
+        active_tags = Signal(ArrayLayout(1, 2**self.gen_params.tag_bits))
+
+        with Transaction(name="CoreState").body(m):
+            m.d.comb += flush.eq(self.dependency_manager.get_dependency(CoreStateKey())(m).flushing)
+            rob_indices = self.dependency_manager.get_dependency(ROBIndicesKey())(m)
+            m.d.comb += rob_head.eq(rob_indices.start)
+            m.d.comb += rob_size.eq(rob_indices.end - rob_indices.start)
+            m.d.comb += active_tags.eq(self.dependency_manager.get_dependency(ActiveTagsKey())(m).active_tags)
+
+        m.submodules.pma_checker = pma_checker = PMAChecker(self.gen_params)
+        dcache: CacheInterface
+        if dcache_params.enable:
+            m.submodules.dcache_refiller = dcache_refiller = CommonBusDCacheRefiller(
+                self.gen_params.get(DCacheLayouts), dcache_params, self.bus
+            )
+            m.submodules.dcache = dcache = DCache(self.gen_params, dcache_refiller, self.bus)
+        else:
+            m.submodules.dcache = dcache = DCacheBypass(self.gen_params.get(DCacheLayouts), dcache_params, self.bus)
+
+        stores_drained = Signal(init=1)
+        if self.gen_params.store_buffer_depth:
+            m.submodules.store_buffer = store_buffer = StoreBuffer(
+                self.gen_params, dcache, self.gen_params.store_buffer_depth
+            )
+            m.d.comb += stores_drained.eq(store_buffer.empty)
+
+            @def_method(m, self.stores_drained, ready=stores_drained)
+            def _():
+                pass
+
+            dcache = store_buffer
+
+        m.submodules.requester = requester = LSURequester(self.gen_params, dcache)
+
+        entry_layout = StructLayout(
+            {
+                "valid": 1,
+                "store": 1,
+                "mmio": 1,
+                "issued": 1,  # the request was sent to memory
+                "responded": 1,  # the result was pushed
+                "violated": 1,  # an older store wrote to the loaded bytes after they were read
+                "replayed": 1,  # the load was marked for replay
+                "rob_id": self.gen_params.rob_entries_bits,
+                "rp_dst": self.gen_params.phys_regs_bits,
+                "tag": self.gen_params.tag_bits,
+                "pc": xlen,
+                "addr": xlen,
+                "funct3": Funct3,
+                "data": xlen,
+                "byte_mask": word_bytes,
+                "word_data": dcache_params.word_width,
+            }
+        )
+        entries = Signal(ArrayLayout(entry_layout, self.entries))
+
+        # Age of an instruction - the distance from the head of the ROB.
+        def age(rob_id: Value) -> Value:
+            return (rob_id - rob_head)[: len(rob_head)]
+
+        ages = [Signal(len(rob_head), name=f"age{i}") for i in range(self.entries)]
+        for i in range(self.entries):
+            m.d.comb += ages[i].eq(age(entries[i].rob_id))
+
+        def word_match(i: int, addr: Value) -> Value:
+            return entries[i].addr[word_bytes_log:] == addr[word_bytes_log:]
+
+        m.submodules.free_prio_encoder = free_prio_encoder = PriorityEncoder(self.entries)
+        m.d.comb += free_prio_encoder.i.eq(~Cat(entries[i].valid for i in range(self.entries)))
+        free_idx = free_prio_encoder.o
+
+        m.submodules.requests = requests = FIFO(self.fu_layouts.issue, 2)
+        m.submodules.results_noop = results_noop = FIFO(
+            [
+                ("rob_id", self.gen_params.rob_entries_bits),
+                ("rp_dst", self.gen_params.phys_regs_bits),
+                ("exception", 1),
+                ("cause", ExceptionCause),
+                ("pc", xlen),
+                ("mtval", xlen),
+                ("tag", self.gen_params.tag_bits),
+            ],
+            2,
+        )
+        # Requests are sent to memory by a single transaction, because the readiness of the data cache
+        # can depend on the request.
+        issued_layout = [
+            ("idx", range(self.entries)),
+            ("raw", 1),
+            ("fwd_mask", word_bytes),
+            ("fwd_data", dcache_params.word_width),
+        ]
+        m.submodules.to_send = to_send = Forwarder(
+            [("addr", xlen), ("data", xlen), ("funct3", Funct3), ("store", 1)] + issued_layout
+        )
+        # Entries which wait for a result from the requester, in the order of issue.
+        # Loads to main memory read the whole word, so that the bytes of older stores can be merged in.
+        m.submodules.issued = issued = BasicFifo(issued_layout, requester.depth)
+
+        # Entries are reserved when instructions are put to the RS, and released when they are no longer needed.
+        used = Signal(range(self.entries + 1))
+        reserved = Signal()
+        released_noop = Signal()
+        released_entries = Signal(self.entries)
+        m.d.sync += used.eq(used + reserved - released_noop - popcount(released_entries))
+
+        @def_method(m, self.reserve, ready=used != self.entries)
+        def _():
+            m.d.comb += reserved.eq(1)
+
+        @def_method(m, self.issue)
+        def _(arg):
+            self.log.debug(
+                m, 1, "issue rob_id={} funct3={} op_type={}", arg.rob_id, arg.exec_fn.funct3, arg.exec_fn.op_type
+            )
+            requests.write(m, arg)
+
+        with Transaction(name="Execute").body(m):
+            arg = requests.read(m)
+
+            addr = Signal(xlen)
+            m.d.av_comb += addr.eq(arg.s1_val + arg.imm)
+            m.d.av_comb += pma_checker.addr.eq(addr)
+            mmio = pma_checker.result["mmio"]
+
+            is_load = arg.exec_fn.op_type == OpType.LOAD
+            is_store = arg.exec_fn.op_type == OpType.STORE
+            # FENCE is a no-op, because memory accesses are not visible to other harts or devices out of order.
+            noop = flush | ~(is_load | is_store)
+
+            aligned = requester.check_align(m, arg.exec_fn.funct3, addr)
+            byte_mask = requester.prepare_bytes_mask(m, arg.exec_fn.funct3, addr)
+            word_data = requester.prepare_data_to_save(m, arg.exec_fn.funct3, arg.s2_val, addr)
+
+            arg_age = Signal.like(rob_head)
+            m.d.av_comb += arg_age.eq(age(arg.rob_id))
+
+            # For each entry, the bytes it can forward to the load.
+            fwd_candidates = [Signal(word_bytes, name=f"fwd_candidate{i}") for i in range(self.entries)]
+            for i in range(self.entries):
+                entry = entries[i]
+                older_store = entry.valid & entry.store & active_tags[entry.tag] & (ages[i] < arg_age)
+                m.d.av_comb += fwd_candidates[i].eq(Mux(older_store & word_match(i, addr), entry.byte_mask, 0))
+
+            # The youngest older store which writes a given byte provides it.
+            fwd_mask = Signal(word_bytes)
+            fwd_data = Signal(dcache_params.word_width)
+            for b in range(word_bytes):
+                for i in range(self.entries):
+                    younger_exists = Cat(
+                        fwd_candidates[j][b] & (ages[j] > ages[i]) for j in range(self.entries) if j != i
+                    ).any()
+                    with m.If(fwd_candidates[i][b] & ~younger_exists):
+                        m.d.av_comb += fwd_mask[b].eq(1)
+                        m.d.av_comb += fwd_data.word_select(b, 8).eq(entries[i].word_data.word_select(b, 8))
+
+            def allocate(issued: ValueLike):
+                entry = entries[free_idx]
+                m.d.sync += [
+                    entry.valid.eq(1),
+                    entry.store.eq(is_store),
+                    entry.mmio.eq(mmio),
+                    entry.issued.eq(issued),
+                    entry.responded.eq(0),
+                    entry.violated.eq(0),
+                    entry.replayed.eq(0),
+                    entry.rob_id.eq(arg.rob_id),
+                    entry.rp_dst.eq(arg.rp_dst),
+                    entry.tag.eq(arg.tag),
+                    entry.pc.eq(arg.pc),
+                    entry.addr.eq(addr),
+                    entry.funct3.eq(arg.exec_fn.funct3),
+                    entry.data.eq(arg.s2_val),
+                    entry.byte_mask.eq(byte_mask),
+                    entry.word_data.eq(word_data),
+                ]
+
+            accepted = ~noop & aligned
+
+            with condition(m) as branch:
+                with branch(~accepted):
+                    m.d.comb += released_noop.eq(1)
+                    results_noop.write(
+                        m,
+                        rob_id=arg.rob_id,
+                        rp_dst=arg.rp_dst,
+                        exception=~noop,
+                        cause=Mux(
+                            is_store, ExceptionCause.STORE_ADDRESS_MISALIGNED, ExceptionCause.LOAD_ADDRESS_MISALIGNED
+                        ),
+                        pc=arg.pc,
+                        mtval=addr,
+                        tag=arg.tag,
+                    )
+                with branch(accepted & is_load & ~mmio):
+                    allocate(1)
+                    word_addr = Cat(C(0, word_bytes_log), addr[word_bytes_log:])
+                    to_send.write(
+                        m,
+                        addr=word_addr,
+                        data=0,
+                        funct3=Funct3.W,
+                        store=0,
+                        idx=free_idx,
+                        raw=1,
+                        fwd_mask=fwd_mask,
+                        fwd_data=fwd_data,
+                    )
+                    self.perf_forwarded.incr(m, enable_call=fwd_mask.any())
+                with branch(accepted & is_load & mmio):
+                    allocate(0)
+                with branch(accepted & is_store):
+                    allocate(0)
+                    # Younger loads which already read the written bytes got stale data.
+                    with m.If(active_tags[arg.tag]):
+                        for i in range(self.entries):
+                            entry = entries[i]
+                            with m.If(
+                                entry.valid
+                                & ~entry.store
+                                & entry.issued
+                                & (ages[i] > arg_age)
+                                & word_match(i, addr)
+                                & (entry.byte_mask & byte_mask).any()
+                            ):
+                                m.d.sync += entry.violated.eq(1)
+
+        # Replays a load which was violated after its result was pushed. Results of the older stores
+        # are pushed only after that, so the load can't retire before it is marked for replay.
+        replay_requests = Cat(
+            entries[i].valid & entries[i].violated & entries[i].responded & ~entries[i].replayed
+            for i in range(self.entries)
+        )
+        m.submodules.replay_prio_encoder = replay_prio_encoder = PriorityEncoder(self.entries)
+        m.d.comb += replay_prio_encoder.i.eq(replay_requests)
+
+        with Transaction(name="Replay").body(m, ready=replay_requests.any()):
+            entry = entries[replay_prio_encoder.o]
+            self.perf_replays.incr(m)
+            self.log.debug(m, 1, "replay rob_id={} pc=0x{:08x}", entry.rob_id, entry.pc)
+            self.report(
+                m,
+                rob_id=entry.rob_id,
+                cause=ExceptionCause._COREBLOCKS_LOAD_REPLAY,
+                pc=entry.pc,
+                mtval=0,
+                tag=entry.tag,
+            )
+            self.push_result(m, rob_id=entry.rob_id, rp_dst=0, result=0, exception=1)
+            m.d.sync += entry.replayed.eq(1)
+
+        # Sends stores and MMIO loads when they reach the head of the ROB.
+        at_head = Cat(entries[i].valid & (entries[i].rob_id == rob_head) for i in range(self.entries))
+        m.submodules.commit_prio_encoder = commit_prio_encoder = PriorityEncoder(self.entries)
+        m.d.comb += commit_prio_encoder.i.eq(at_head & ~Cat(entries[i].issued for i in range(self.entries)))
+        commit_entry = entries[commit_prio_encoder.o]
+
+        with Transaction(name="Commit").body(
+            m,
+            ready=~commit_prio_encoder.n & ~replay_requests.any() & (~commit_entry.mmio | stores_drained),
+        ):
+            info = self.dependency_manager.get_dependency(InstructionPrecommitKey())(m, rob_head)
+            m.d.sync += commit_entry.issued.eq(1)
+
+            with condition(m) as branch:
+                with branch(info.side_fx):
+                    to_send.write(
+                        m,
+                        addr=commit_entry.addr,
+                        data=commit_entry.data,
+                        funct3=commit_entry.funct3,
+                        store=commit_entry.store,
+                        idx=commit_prio_encoder.o,
+                        raw=0,
+                        fwd_mask=0,
+                        fwd_data=0,
+                    )
+                with branch():
+                    m.d.sync += commit_entry.responded.eq(1)
+                    results_noop.write(
+                        m,
+                        rob_id=commit_entry.rob_id,
+                        rp_dst=commit_entry.rp_dst,
+                        exception=0,
+                        cause=0,
+                        pc=commit_entry.pc,
+                        mtval=0,
+                        tag=commit_entry.tag,
+                    )
+
+        with Transaction(name="Send").body(m):
+            req = to_send.read(m)
+            requester.issue(m, addr=req.addr, data=req.data, funct3=req.funct3, store=req.store)
+            issued.write(m, idx=req.idx, raw=req.raw, fwd_mask=req.fwd_mask, fwd_data=req.fwd_data)
+
+        with Transaction(name="Accept").body(m):
+            req = issued.read(m)
+            res = requester.accept(m)
+            entry = entries[req.idx]
+
+            merged = Signal(dcache_params.word_width)
+            for b in range(word_bytes):
+                m.d.av_comb += merged.word_select(b, 8).eq(
+                    Mux(req.fwd_mask[b], req.fwd_data.word_select(b, 8), res.data.word_select(b, 8))
+                )
+            data = Mux(req.raw, requester.postprocess_load_data(m, entry.funct3, merged, entry.addr), res.data)
+
+            # A load violated while waiting for memory is replayed right away.
+            replay = ~entry.store & entry.violated
+            exception = res.exception | replay
+
+            with m.If(exception):
+                self.report(
+                    m,
+                    rob_id=entry.rob_id,
+                    cause=Mux(res.exception, res.cause, ExceptionCause._COREBLOCKS_LOAD_REPLAY),
+                    pc=entry.pc,
+                    mtval=Mux(res.exception, entry.addr, 0),
+                    tag=entry.tag,
+                )
+            self.perf_replays.incr(m, enable_call=replay)
+
+            self.log.debug(m, 1, "accept rob_id={} result=0x{:08x} exception={}", entry.rob_id, data, exception)
+
+            self.push_result(m, rob_id=entry.rob_id, rp_dst=entry.rp_dst, result=data, exception=exception)
+            m.d.sync += entry.responded.eq(1)
+            m.d.sync += entry.replayed.eq(replay)
+
+        with Transaction(name="AcceptNoop").body(m):
+            res = results_noop.read(m)
+
+            with m.If(res.exception):
+                self.report(m, rob_id=res.rob_id, cause=res.cause, pc=res.pc, mtval=res.mtval, tag=res.tag)
+
+            self.push_result(m, rob_id=res.rob_id, rp_dst=res.rp_dst, result=0, exception=res.exception)
+
+        # An entry is freed when its instruction left the ROB - no older store can violate it anymore.
+        # The instruction is retired only after its result was pushed.
+        for i in range(self.entries):
+            entry = entries[i]
+            with m.If(entry.valid & entry.responded & (ages[i] >= rob_size)):
+                m.d.sync += entry.valid.eq(0)
+                m.d.comb += released_entries[i].eq(1)
+
+        return m
+
+
+@dataclass(frozen=True)
+class LSQComponent(FunctionalComponentParams):
+    entries: int = 8
+
+    def get_module(self, gen_params: GenParams) -> ReservingFuncUnit:
+        connections = DependencyContext.get()
+        bus_master = connections.get_dependency(CommonBusDataKey())
+        unit = LoadStoreQueue(gen_params, bus_master, self.entries)
+        return unit
+
+    def get_decoder_manager(self):  # type: ignore
+        pass  # LSU component currently doesn't have a decoder manager
+
+    def get_optypes(self) -> set[OpType]:
+        return {OpType.LOAD, OpType.STORE, OpType.FENCE}
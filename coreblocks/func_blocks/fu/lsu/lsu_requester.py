@@ -7,37 +7,37 @@ from transactron.lib import BasicFifo
 
 from coreblocks.params import *
 from coreblocks.arch import Funct3, ExceptionCause
-from coreblocks.peripherals.bus_adapter import BusMasterInterface
+from coreblocks.cache.iface import CacheInterface
 from coreblocks.interface.layouts import LSULayouts
 
 
 class LSURequester(Elaboratable):
     """
     Bus request logic for the load/store unit. Its job is to interface
-    between the LSU and the bus.
+    between the LSU and the data cache (or the bus, if the cache is bypassed).
 
     Attributes
     ----------
     issue : Method
-        Issues a new request to the bus.
+        Issues a new request to the data cache.
     accept : Method
-        Retrieves a result from the bus.
+        Retrieves a result from the data cache.
     """
 
-    def __init__(self, gen_params: GenParams, bus: BusMasterInterface, depth: int = 4) -> None:
+    def __init__(self, gen_params: GenParams, dcache: CacheInterface, depth: int = 4) -> None:
         """
         Parameters
         ----------
         gen_params : GenParams
             Parameters to be used during processor generation.
-        bus : BusMasterInterface
-            An instance of the bus master for interfacing with the data bus.
+        dcache : CacheInterface
+            The data cache, or a bypass which sends requests directly to the data bus.
         depth : int
             Number of requests which can be send to memory, before it provides first response. Describe
             the resiliency of `LSURequester` to latency of memory in case when memory is fully pipelined.
         """
         self.gen_params = gen_params
-        self.bus = bus
+        self.dcache = dcache
         self.depth = depth
 
         lsu_layouts = gen_params.get(LSULayouts)
@@ -48,7 +48,7 @@ class LSURequester(Elaboratable):
         self.log = HardwareLogger("backend.lsu.requester")
 
     def prepare_bytes_mask(self, m: ModuleLike, funct3: Value, addr: Value) -> Signal:
-        mask_len = self.gen_params.isa.xlen // self.bus.params.granularity
+        mask_len = self.gen_params.isa.xlen // 8
         mask = Signal(mask_len)
         with m.Switch(funct3):
             with m.Case(Funct3.B, Funct3.BU):
@@ -130,10 +130,8 @@ class LSURequester(Elaboratable):
             )
 
             with condition(m, nonblocking=True) as branch:
-                with branch(aligned & store):
-                    self.bus.request_write(m, addr=addr >> 2, data=bus_data, sel=bytes_mask)
-                with branch(aligned & ~store):
-                    self.bus.request_read(m, addr=addr >> 2, sel=bytes_mask)
+                with branch(aligned):
+                    self.dcache.issue_req(m, addr=addr, data=bus_data, byte_mask=bytes_mask, store=store)
 
             with m.If(aligned):
                 args_fifo.write(m, addr=addr, funct3=funct3, store=store)
@@ -155,16 +153,12 @@ class LSURequester(Elaboratable):
             request_args = args_fifo.read(m)
             self.log.debug(m, 1, "accept data=0x{:08x} exception={} cause={}", data, exception, cause)
 
-            with condition(m) as branch:
-                with branch(request_args.store):
-                    fetched = self.bus.get_write_response(m)
-                    m.d.comb += err.eq(fetched.err)
-                with branch():
-                    fetched = self.bus.get_read_response(m)
-                    m.d.comb += err.eq(fetched.err)
-                    m.d.top_comb += data.eq(
-                        self.postprocess_load_data(m, request_args.funct3, fetched.data, request_args.addr)
-                    )
+            fetched = self.dcache.accept_res(m)
+            m.d.comb += err.eq(fetched.error)
+            with m.If(~request_args.store):
+                m.d.top_comb += data.eq(
+                    self.postprocess_load_data(m, request_args.funct3, fetched.data, request_args.addr)
+                )
 
             with m.If(err):
                 m.d.av_comb += exception.eq(1)
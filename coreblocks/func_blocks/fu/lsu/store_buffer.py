@@ -0,0 +1,224 @@
+from amaranth import *
+
+from transactron import Method, Transaction, def_method, TModule
+from transactron.lib import BasicFifo, Forwarder
+from transactron.lib.logging import HardwareLogger
+from transactron.lib.metrics import HwCounter
+from transactron.lib.simultaneous import condition
+from transactron.utils import extend_layout
+
+from coreblocks.params import GenParams
+from coreblocks.cache.iface import CacheInterface
+from coreblocks.interface.layouts import DCacheLayouts
+from coreblocks.func_blocks.fu.lsu.pma import PMAChecker
+
+__all__ = ["StoreBuffer"]
+
+
+class StoreBuffer(Elaboratable, CacheInterface):
+    """
+    Post-commit store buffer, placed in front of the data cache.
+
+    Stores to main memory are acknowledged as soon as they are accepted,
+    and are written to the data cache in the background, in program order.
+    Stores to the same word are coalesced while they wait in the buffer.
+    Loads merge the bytes of buffered stores to the same word into the data
+    returned by the cache. MMIO requests are not buffered - they are passed
+    to the data cache unchanged.
+
+    The buffer accepts only stores which are going to be committed. Errors
+    reported when a buffered store is written to memory can't be attributed
+    to an instruction anymore, so they are only logged.
+
+    Attributes
+    ----------
+    issue_req : Method
+        Issues a load or store request.
+    accept_res : Method
+        Accepts the result of a request, in the order of issue.
+    flush : Method
+        Flushes the data cache.
+    empty : Signal, out
+        Set when all accepted stores were written to the data cache.
+    """
+
+    def __init__(self, gen_params: GenParams, dcache: CacheInterface, depth: int = 4) -> None:
+        """
+        Parameters
+        ----------
+        gen_params : GenParams
+            Parameters to be used during processor generation.
+        dcache : CacheInterface
+            The data cache, or a bypass which sends requests directly to the data bus.
+        depth : int
+            Number of stores which can wait in the buffer.
+        """
+        self.gen_params = gen_params
+        self.params = gen_params.dcache_params
+        self.dcache = dcache
+        self.depth = depth
+
+        layouts = gen_params.get(DCacheLayouts)
+
+        self.issue_req = Method(i=layouts.issue_req)
+        self.accept_res = Method(o=layouts.accept_res)
+        self.flush = Method()
+
+        self.empty = Signal()
+
+        self.log = HardwareLogger("backend.lsu.store_buffer")
+
+        self.perf_stores = HwCounter("backend.lsu.store_buffer.stores", "Number of stores accepted to the buffer")
+        self.perf_coalesced = HwCounter(
+            "backend.lsu.store_buffer.coalesced", "Number of stores merged with a store waiting in the buffer"
+        )
+        self.perf_forwarded = HwCounter(
+            "backend.lsu.store_buffer.forwarded", "Number of loads which got data from the buffer"
+        )
+        self.perf_errors = HwCounter(
+            "backend.lsu.store_buffer.errors", "Number of buffered stores which failed to be written to memory"
+        )
+
+    def elaborate(self, platform):
+        m = TModule()
+
+        m.submodules += [self.perf_stores, self.perf_coalesced, self.perf_forwarded, self.perf_errors]
+
+        word_width = self.params.word_width
+        word_bytes = self.params.word_width_bytes
+        word_bytes_log = self.params.word_width_bytes_log
+
+        m.submodules.pma_checker = pma_checker = PMAChecker(self.gen_params)
+
+        # Requests for which the LSU waits for a result, in the order of issue.
+        # Buffered stores are answered locally, other requests are merged with the forwarded bytes.
+        m.submodules.lsu_requests = lsu_requests = BasicFifo(
+            [("local", 1), ("fwd_mask", word_bytes), ("fwd_data", word_width)], self.depth
+        )
+        # Requests are sent to the data cache by a single transaction, because its readiness
+        # can depend on the request.
+        layouts = self.gen_params.get(DCacheLayouts)
+        m.submodules.cache_issue = cache_issue = Forwarder(extend_layout(layouts.issue_req, ("drain", 1)))
+        # Owners of the requests sent to the data cache.
+        m.submodules.cache_requests = cache_requests = BasicFifo([("drain", 1)], self.depth)
+        m.submodules.cache_results = cache_results = Forwarder(layouts.accept_res)
+
+        def incr(ptr: Value):
+            return Mux(ptr == self.depth - 1, 0, ptr + 1)
+
+        addrs = Array(Signal(self.gen_params.isa.xlen - word_bytes_log, name=f"addr{i}") for i in range(self.depth))
+        datas = Array(Signal(word_width, name=f"data{i}") for i in range(self.depth))
+        masks = Array(Signal(word_bytes, name=f"mask{i}") for i in range(self.depth))
+        valid = Array(Signal(name=f"valid{i}") for i in range(self.depth))
+        # The entry was sent to the data cache - it can't be coalesced with anymore.
+        sent = Array(Signal(name=f"sent{i}") for i in range(self.depth))
+
+        head = Signal(range(self.depth))  # oldest entry
+        send = Signal(range(self.depth))  # oldest entry which wasn't sent yet
+        tail = Signal(range(self.depth))  # first free entry
+
+        full = Signal()
+        m.d.comb += full.eq(Cat(*valid).all())
+        m.d.comb += self.empty.eq(~Cat(*valid).any())
+
+        with Transaction(name="Drain").body(m, ready=valid[send] & ~sent[send]) as drain:
+            cache_issue.write(
+                m, addr=addrs[send] << word_bytes_log, data=datas[send], byte_mask=masks[send], store=1, drain=1
+            )
+            m.d.sync += sent[send].eq(1)
+            m.d.sync += send.eq(incr(send))
+
+        with Transaction(name="Send").body(m):
+            req = cache_issue.read(m)
+            self.dcache.issue_req(m, addr=req.addr, data=req.data, byte_mask=req.byte_mask, store=req.store)
+            cache_requests.write(m, drain=req.drain)
+
+        with Transaction(name="DrainResult").body(m):
+            owner = cache_requests.read(m)
+            res = self.dcache.accept_res(m)
+
+            with condition(m) as branch:
+                with branch(owner.drain):
+                    m.d.sync += valid[head].eq(0)
+                    m.d.sync += sent[head].eq(0)
+                    m.d.sync += head.eq(incr(head))
+
+                    self.perf_errors.incr(m, enable_call=res.error)
+                    self.log.warning(m, res.error, "store to 0x{:08x} failed", addrs[head] << word_bytes_log)
+                with branch():
+                    cache_results.write(m, res)
+
+        @def_method(m, self.issue_req, ready=~full)
+        def _(addr: Value, data: Value, byte_mask: Value, store: Value):
+            m.d.av_comb += pma_checker.addr.eq(addr)
+            buffered = store & ~pma_checker.result.mmio
+
+            word_addr = addr >> word_bytes_log
+            match = Signal(self.depth)
+            for i in range(self.depth):
+                m.d.av_comb += match[i].eq(valid[i] & (addrs[i] == word_addr))
+
+            # The younger bytes win. Entries on positions not smaller than the head are the older ones.
+            fwd_mask = Signal(word_bytes)
+            fwd_data = Signal(word_width)
+            for older in [True, False]:
+                for i in range(self.depth):
+                    in_range = (i >= head) if older else (i < head)
+                    for b in range(word_bytes):
+                        with m.If(in_range & match[i] & masks[i][b]):
+                            m.d.av_comb += fwd_mask[b].eq(1)
+                            m.d.av_comb += fwd_data.word_select(b, 8).eq(datas[i].word_select(b, 8))
+
+            # At most one entry of a given word is waiting to be sent.
+            # An entry can't be coalesced with if it is being sent in this cycle.
+            coalesce = Signal(self.depth)
+            for i in range(self.depth):
+                m.d.av_comb += coalesce[i].eq(match[i] & ~sent[i] & ~(drain.run & (send == i)))
+
+            with m.If(buffered):
+                self.perf_stores.incr(m)
+                self.perf_coalesced.incr(m, enable_call=coalesce.any())
+                with m.If(coalesce.any()):
+                    for i in range(self.depth):
+                        with m.If(coalesce[i]):
+                            for b in range(word_bytes):
+                                with m.If(byte_mask[b]):
+                                    m.d.sync += datas[i].word_select(b, 8).eq(data.word_select(b, 8))
+                            m.d.sync += masks[i].eq(masks[i] | byte_mask)
+                with m.Else():
+                    m.d.sync += addrs[tail].eq(word_addr)
+                    m.d.sync += datas[tail].eq(data)
+                    m.d.sync += masks[tail].eq(byte_mask)
+                    m.d.sync += valid[tail].eq(1)
+                    m.d.sync += tail.eq(incr(tail))
+
+            self.perf_forwarded.incr(m, enable_call=~store & fwd_mask.any())
+
+            with condition(m, nonblocking=True) as branch:
+                with branch(~buffered):
+                    cache_issue.write(m, addr=addr, data=data, byte_mask=byte_mask, store=store, drain=0)
+
+            lsu_requests.write(m, local=buffered, fwd_mask=Mux(store, 0, fwd_mask), fwd_data=fwd_data)
+
+        @def_method(m, self.accept_res)
+        def _():
+            data = Signal(word_width)
+            error = Signal()
+
+            req = lsu_requests.read(m)
+            with condition(m, nonblocking=True) as branch:
+                with branch(~req.local):
+                    res = cache_results.read(m)
+                    m.d.comb += error.eq(res.error)
+                    for b in range(word_bytes):
+                        m.d.comb += data.word_select(b, 8).eq(
+                            Mux(req.fwd_mask[b], req.fwd_data.word_select(b, 8), res.data.word_select(b, 8))
+                        )
+
+            return {"data": data, "error": error}
+
+        @def_method(m, self.flush)
+        def _():
+            self.dcache.flush(m)
+
+        return m
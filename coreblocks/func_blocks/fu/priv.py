@@ -24,6 +24,7 @@ from coreblocks.interface.keys import (
     InstructionPrecommitKey,
     UnsafeInstructionResolvedKey,
     FlushICacheKey,
+    StoresDrainedKey,
     WaitForInterruptResumeKey,
 )
 from coreblocks.func_blocks.interface.func_protocols import FuncUnit
@@ -77,6 +78,8 @@ class PrivilegedFuncUnit(FuncUnit, Elaboratable):
 
         instr_rob = Signal(self.gen_params.rob_entries_bits)
         instr_pc = Signal(self.gen_params.isa.xlen)
+        instr_tag = Signal(self.gen_params.tag_bits)
+        instr_side_fx = Signal()
         instr_fn = self.priv_fn.get_function()
 
         mret = self.dm.get_dependency(MretKey())
@@ -85,6 +88,7 @@ class PrivilegedFuncUnit(FuncUnit, Elaboratable):
         csr = self.dm.get_dependency(CSRInstancesKey())
         priv_mode = csr.m_mode.priv_mode
         flush_icache = self.dm.get_dependency(FlushICacheKey())
+        stores_drained = self.dm.get_optional_dependency(StoresDrainedKey())
         resume_core = self.dm.get_dependency(UnsafeInstructionResolvedKey())
 
         @def_method(m, self.issue, ready=~instr_valid)
@@ -94,6 +98,7 @@ class PrivilegedFuncUnit(FuncUnit, Elaboratable):
                 instr_valid.eq(1),
                 instr_rob.eq(arg.rob_id),
                 instr_pc.eq(arg.pc),
+                instr_tag.eq(arg.tag),
                 instr_fn.eq(decoder.decode_fn),
             ]
 
@@ -101,6 +106,7 @@ class PrivilegedFuncUnit(FuncUnit, Elaboratable):
             precommit = self.dm.get_dependency(InstructionPrecommitKey())
             info = precommit(m, instr_rob)
             m.d.sync += finished.eq(1)
+            m.d.sync += instr_side_fx.eq(info.side_fx)
             self.perf_instr.incr(m, instr_fn, enable_call=info.side_fx)
 
             priv_data = priv_mode.read(m).data
@@ -117,6 +123,9 @@ class PrivilegedFuncUnit(FuncUnit, Elaboratable):
                 with branch(info.side_fx & (instr_fn == PrivilegedFn.Fn.MRET) & ~illegal_mret):
                     mret(m)
                 with branch(info.side_fx & (instr_fn == PrivilegedFn.Fn.FENCEI)):
+                    # Instructions fetched after FENCE.I must observe the buffered stores
+                    if stores_drained is not None:
+                        stores_drained(m)
                     flush_icache(m)
                 with branch(info.side_fx & (instr_fn == PrivilegedFn.Fn.WFI) & ~illegal_wfi):
                     # async_interrupt_active implies wfi_resume. WFI should continue normal execution
@@ -160,7 +169,7 @@ class PrivilegedFuncUnit(FuncUnit, Elaboratable):
                 )
 
                 self.exception_report(
-                    m, cause=ExceptionCause.ILLEGAL_INSTRUCTION, pc=ret_pc, rob_id=instr_rob, mtval=instr
+                    m, cause=ExceptionCause.ILLEGAL_INSTRUCTION, pc=ret_pc, rob_id=instr_rob, mtval=instr, tag=instr_tag
                 )
             with m.Elif(async_interrupt_active):
                 # SPEC: "These conditions for an interrupt trap to occur [..] must also be evaluated immediately
@@ -172,11 +181,17 @@ class PrivilegedFuncUnit(FuncUnit, Elaboratable):
                 # would normally return to (mepc value is preserved)
                 m.d.av_comb += exception.eq(1)
                 self.exception_report(
-                    m, cause=ExceptionCause._COREBLOCKS_ASYNC_INTERRUPT, pc=ret_pc, rob_id=instr_rob, mtval=0
+                    m,
+                    cause=ExceptionCause._COREBLOCKS_ASYNC_INTERRUPT,
+                    pc=ret_pc,
+                    rob_id=instr_rob,
+                    mtval=0,
+                    tag=instr_tag,
                 )
-            with m.Else():
+            with m.Elif(instr_side_fx):
                 log.info(m, True, "Unstalling fetch from the priv unit new_pc=0x{:x}", ret_pc)
-                # Unstall the fetch
+                # Unstall the fetch. Squashed or flushed instructions don't resume the frontend -
+                # it was already redirected to the correct path.
                 resume_core(m, pc=ret_pc)
 
             self.push_result(
@@ -1,9 +1,9 @@
-from typing import Protocol
+from typing import Protocol, runtime_checkable
 from transactron import Method, Provided, Required
 from amaranth_types import HasElaborate
 
 
-__all__ = ["FuncUnit", "FuncBlock"]
+__all__ = ["FuncUnit", "ReservingFuncUnit", "FuncBlock"]
 
 
 class FuncUnit(HasElaborate, Protocol):
@@ -11,6 +11,16 @@ class FuncUnit(HasElaborate, Protocol):
     push_result: Required[Method]
 
 
+@runtime_checkable
+class ReservingFuncUnit(FuncUnit, Protocol):
+    """
+    Functional unit with a limited number of places for instructions, which must be
+    reserved in program order - when the instruction is put to the reservation station.
+    """
+
+    reserve: Provided[Method]
+
+
 class FuncBlock(HasElaborate, Protocol):
     insert: Method
     select: Method
@@ -17,6 +17,7 @@ __all__ = [
     "InstructionPrecommitKey",
     "BranchVerifyKey",
     "PredictedJumpTargetKey",
+    "BranchRollbackKey",
     "UnsafeInstructionResolvedKey",
     "ExceptionReportKey",
     "CSRInstancesKey",
@@ -25,7 +26,10 @@ __all__ = [
     "CoreStateKey",
     "CSRListKey",
     "FlushICacheKey",
+    "StoresDrainedKey",
+    "ROBIndicesKey",
     "RollbackKey",
+    "ActiveTagsKey",
 ]
 
 
@@ -45,7 +49,23 @@ class BranchVerifyKey(SimpleKey[Method]):
 
 
 @dataclass(frozen=True)
-class PredictedJumpTargetKey(SimpleKey[tuple[Method, Method]]):
+class PredictedJumpTargetKey(SimpleKey[Method]):
+    """
+    Represents a method which returns the target the frontend followed for
+    a predicted JALR instruction. It is called once the jump is resolved.
+    """
+
+    pass
+
+
+@dataclass(frozen=True)
+class BranchRollbackKey(SimpleKey[Method]):
+    """
+    Represents a method which squashes the instructions fetched after a mispredicted
+    branch and redirects the frontend to the correct path. It is called by the
+    jump-branch unit when the misprediction is detected.
+    """
+
     pass
 
 
@@ -109,10 +129,41 @@ class FlushICacheKey(SimpleKey[Method]):
 
 
 @dataclass(frozen=True)
-class RollbackKey(UnifierKey, unifier=MethodProduct.create):
+class StoresDrainedKey(SimpleKey[Method]):
+    """
+    Represents a method which is ready only when all committed stores were written to memory.
+    It isn't provided if stores are written to memory before they are committed.
+    """
+
+    pass
+
+
+@dataclass(frozen=True)
+class ROBIndicesKey(SimpleKey[Method]):
+    """
+    Represents a method which returns the index of the oldest instruction in the ROB
+    and the index of the first free entry. Expected layout is `ROBLayouts.get_indices`.
+    """
+
+    pass
+
+
+@dataclass(frozen=True)
+class RollbackKey(UnifierKey, unifier=staticmethod(MethodProduct.create)):
     """
     Collects method that want to be notifed about tag rollback event.
     Expected layout is `RATLayouts.rollback_in`.
     """
 
     pass
+
+
+@dataclass(frozen=True)
+class ActiveTagsKey(SimpleKey[Method]):
+    """
+    Represents a method which returns the bitmasks of speculation tags that are active
+    (on the current execution path) and that have a checkpoint to roll back to.
+    Expected layout is `RATLayouts.get_active_tags_out`.
+    """
+
+    pass
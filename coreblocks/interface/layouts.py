@@ -24,6 +24,7 @@ __all__ = [
     "CSRRegisterLayouts",
     "CSRUnitLayouts",
     "ICacheLayouts",
+    "DCacheLayouts",
     "JumpBranchLayouts",
 ]
 
@@ -128,6 +129,12 @@ class CommonLayoutFields:
         self.predicted_taken: LayoutListField = ("predicted_taken", 1)
         """If the branch was predicted taken."""
 
+        self.ras_tos: LayoutListField = ("ras_tos", gen_params.bpu_params.ras_depth_bits)
+        """Pointer of the return address stack after the instruction was fetched."""
+
+        self.jump_target_idx: LayoutListField = ("jump_target_idx", gen_params.bpu_params.jump_targets_depth_bits)
+        """Index of the target predicted for a JALR instruction in `PendingJumpTargets`."""
+
         self.cfi_idx: LayoutListField = ("cfi_idx", gen_params.fetch_width_log)
         """An index of a CFI instruction in a fetch block."""
 
@@ -288,6 +295,9 @@ class RATLayouts:
         """Bitmask, when bit is set when corresponding tag is on the current speculation/execution
         path and reset when instruction was already rolled back (is not included in current FRAT)"""
 
+        self.checkpointed_tags_bitmask: LayoutListField = ("checkpointed_tags", ArrayLayout(1, 2**gen_params.tag_bits))
+        """Bitmask, where bit is set when corresponding tag has a checkpoint that the FRAT can be rolled back to."""
+
         self.frat_rename_in = make_layout(
             fields.rl_s1,
             fields.rl_s2,
@@ -303,7 +313,7 @@ class RATLayouts:
         self.rrat_peek_out = self.rrat_commit_out
 
         self.rollback_in = make_layout(fields.tag)
-        self.get_active_tags_out = make_layout(self.active_tags_bitmask)
+        self.get_active_tags_out = make_layout(self.active_tags_bitmask, self.checkpointed_tags_bitmask)
 
         self.crat_rename_in = extend_layout(self.frat_rename_in, fields.tag, fields.commit_checkpoint)
         self.crat_rename_out = self.frat_rename_out
@@ -497,6 +507,44 @@ class ICacheLayouts:
         )
 
 
+class DCacheLayouts:
+    """Layouts used in the data cache."""
+
+    def __init__(self, gen_params: GenParams):
+        fields = gen_params.get(CommonLayoutFields)
+
+        self.last: LayoutListField = ("last", 1)
+        """This is the last cache refill result."""
+
+        self.byte_mask: LayoutListField = ("byte_mask", gen_params.isa.xlen // 8)
+        """Bytes of the machine word which are accessed."""
+
+        self.store: LayoutListField = ("store", 1)
+
+        self.issue_req = make_layout(
+            fields.addr,
+            fields.data,
+            self.byte_mask,
+            self.store,
+        )
+
+        self.accept_res = make_layout(
+            fields.data,
+            fields.error,
+        )
+
+        self.start_refill = make_layout(
+            fields.addr,
+        )
+
+        self.accept_refill = make_layout(
+            fields.addr,
+            fields.data,
+            fields.error,
+            self.last,
+        )
+
+
 class FetchLayouts:
     """Layouts used in the fetcher."""
 
@@ -521,12 +569,14 @@ class FetchLayouts:
             self.access_fault,
             fields.rvc,
             fields.predicted_taken,
+            fields.ras_tos,
+            fields.jump_target_idx,
         )
 
         self.redirect = make_layout(fields.pc)
         self.resume = make_layout(fields.pc)
 
-        self.predecoded_instr = make_layout(fields.cfi_type, ("cfi_offset", signed(21)), ("unsafe", 1))
+        self.predecoded_instr = make_layout(fields.cfi_type, ("cfi_offset", signed(21)), ("cfi_link", 1), ("unsafe", 1))
 
         self.bpu_prediction = make_layout(
             fields.branch_mask, fields.cfi_idx, fields.cfi_type, fields.cfi_target, ("cfi_target_valid", 1)
@@ -538,6 +588,8 @@ class FetchLayouts:
             ("instr_valid", gen_params.fetch_width),
             ("predecoded", ArrayLayout(self.predecoded_instr, gen_params.fetch_width)),
             ("prediction", self.bpu_prediction),
+            ("ret_target", gen_params.isa.xlen),
+            ("ret_target_valid", 1),
         )
 
         self.pred_checker_o = make_layout(
@@ -620,20 +672,31 @@ class JumpBranchLayouts:
     def __init__(self, gen_params: GenParams):
         fields = gen_params.get(CommonLayoutFields)
 
-        self.predicted_jump_target_req = make_layout()
+        self.predicted_jump_target_req = make_layout(fields.pc, fields.jump_target_idx)
         self.predicted_jump_target_resp = make_layout(fields.cfi_target, ("valid", 1))
 
         self.verify_branch = make_layout(
-            ("from_pc", gen_params.isa.xlen), ("next_pc", gen_params.isa.xlen), ("misprediction", 1)
+            ("from_pc", gen_params.isa.xlen),
+            ("next_pc", gen_params.isa.xlen),
+            fields.cfi_type,
+            fields.rvc,
+            ("taken", 1),
+            ("misprediction", 1),
         )
         """ Hint for Branch Predictor about branch result """
 
         self.funct7_info = make_layout(
             fields.rvc,
             fields.predicted_taken,
+            fields.ras_tos,
+            fields.jump_target_idx,
         )
         """Information passed from the frontend to the jumpbranch unit. Encoded in the funct7 field."""
 
+        self.rollback = make_layout(fields.tag, fields.pc, fields.ras_tos)
+        """Squashes instructions younger than the mispredicted branch with the given tag
+        and redirects the frontend to `pc`."""
+
 
 class LSULayouts:
     """Layouts used in the load-store unit."""
@@ -710,6 +773,7 @@ class ExceptionRegisterLayouts:
             fields.rob_id,
             fields.pc,
             self.mtval,
+            fields.tag,
         )
 
         self.get = extend_layout(self.report, self.valid)
@@ -1,4 +1,6 @@
 from .genparams import *  # noqa: F401
 from .fu_params import *  # noqa: F401
 from .icache_params import *  # noqa: F401
+from .dcache_params import *  # noqa: F401
+from .bpu_params import *  # noqa: F401
 from .instr import *  # noqa: F401
@@ -0,0 +1,81 @@
+from enum import IntEnum
+
+__all__ = ["DirectionPredictorType", "BranchPredictorParameters"]
+
+
+class DirectionPredictorType(IntEnum):
+    """
+    Enum of different conditional branch direction predictor types
+    """
+
+    #: No predictor. Backward branches are predicted taken and forward branches not taken.
+    STATIC = 0
+    #: A table of 2-bit saturating counters indexed by the fetch block address.
+    BIMODAL = 1
+    #: A table of 2-bit saturating counters indexed by the fetch block address hashed with the global history.
+    GSHARE = 2
+
+
+class BranchPredictorParameters:
+    """Parameters of the Branch Prediction Unit.
+
+    Parameters
+    ----------
+    direction : DirectionPredictorType
+        Type of the conditional branch direction predictor.
+    table_bits : int
+        Log of the number of rows in the direction predictor table. A single row holds
+        a counter for every instruction in a fetch block.
+    history_bits : int
+        Length of the global history register (in bits). Used only by the gshare predictor.
+    btb_enable : bool
+        Enable the branch target buffer. If disabled, taken control flow instructions are
+        detected only after predecoding them.
+    btb_ways : int
+        Associativity of the branch target buffer.
+    btb_sets_bits : int
+        Log of the number of sets of the branch target buffer.
+    ras_enable : bool
+        Enable the return address stack. If disabled, the frontend is stalled on every return
+        until its target is resolved.
+    ras_depth_bits : int
+        Log of the number of entries of the return address stack.
+    """
+
+    def __init__(
+        self,
+        *,
+        direction,
+        table_bits,
+        history_bits,
+        btb_enable=True,
+        btb_ways=2,
+        btb_sets_bits=4,
+        ras_enable=True,
+        ras_depth_bits=3,
+    ):
+        self.direction = direction
+        self.table_bits = table_bits
+        self.history_bits = history_bits if direction == DirectionPredictorType.GSHARE else 0
+
+        self.table_size = 2**table_bits
+
+        self.btb_enable = btb_enable
+        self.btb_ways = btb_ways
+        self.btb_sets_bits = btb_sets_bits
+        self.btb_sets = 2**btb_sets_bits
+
+        self.ras_enable = ras_enable
+        self.ras_depth_bits = ras_depth_bits
+        self.ras_depth = 2**ras_depth_bits
+
+        self.jump_targets_depth_bits = 2
+        self.jump_targets_depth = 2**self.jump_targets_depth_bits
+
+        if self.history_bits > table_bits:
+            raise ValueError("The global history must not be longer than the predictor table index.")
+
+        # The stack pointer is passed to the jump-branch unit in the funct7 field, together with
+        # the index of the predicted jump target and two other bits.
+        if self.ras_depth_bits + self.jump_targets_depth_bits > 5:
+            raise ValueError("The return address stack must not have more than 8 entries.")
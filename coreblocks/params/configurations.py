@@ -10,6 +10,8 @@ from amaranth.lib.memory import Memory
 
 from coreblocks.arch.isa import Extension
 from coreblocks.params.fu_params import BlockComponentParams
+from coreblocks.params.bpu_params import DirectionPredictorType
+from coreblocks.params.icache_params import ICacheReplacementPolicy
 
 from coreblocks.func_blocks.fu.common.rs_func_block import RSBlockComponent
 from coreblocks.func_blocks.fu.common.fifo_rs import FifoRS
@@ -23,6 +25,7 @@ from coreblocks.func_blocks.fu.zbs import ZbsComponent
 from coreblocks.func_blocks.fu.exception import ExceptionUnitComponent
 from coreblocks.func_blocks.fu.priv import PrivilegedUnitComponent
 from coreblocks.func_blocks.fu.lsu.dummyLsu import LSUComponent
+from coreblocks.func_blocks.fu.lsu.lsq import LSQComponent
 from coreblocks.func_blocks.fu.lsu.pma import PMARegion
 from coreblocks.func_blocks.fu.lsu.lsu_atomic_wrapper import LSUAtomicWrapperComponent
 from coreblocks.func_blocks.csr.csr import CSRBlockComponent
@@ -49,7 +52,7 @@ basic_configuration: tuple[BlockComponentParams, ...] = (
         ],
         rs_entries=2,
     ),
-    RSBlockComponent([LSUComponent()], rs_entries=2, rs_type=FifoRS),
+    RSBlockComponent([LSQComponent()], rs_entries=4),
     CSRBlockComponent(),
 )
 
@@ -82,6 +85,13 @@ class _CoreConfigurationDataClass:
         Size of the Reorder Buffer is 2**rob_entries_bits.
     start_pc: int
         Initial Program Counter value.
+    wb_instr_pipelined: bool
+        Use the pipelined Wishbone protocol on the instruction bus, which allows multiple requests to be
+        in flight at the same time. The connected slaves must support the pipelined protocol.
+    wb_data_pipelined: bool
+        Use the pipelined Wishbone protocol on the data bus.
+    wb_max_requests: int
+        Maximum number of requests in flight on a pipelined Wishbone bus.
     checkpoint_count: int
         Size of active checkpoints storage. This is a maximum speculation depth. It doesn't include current state.
     tag_bits: int
@@ -96,8 +106,45 @@ class _CoreConfigurationDataClass:
         Log of the number of sets of the instruction cache.
     icache_line_bytes_log: int
         Log of the cache line size (in bytes).
+    icache_prefetch_lines: int
+        Number of cache lines the instruction prefetcher fetches ahead of a sequential stream of misses.
+        If zero, the prefetcher is disabled.
+    icache_replacement: ICacheReplacementPolicy
+        Replacement policy of the instruction cache.
+    icache_bypass_stream_blocks: int
+        Number of fetch blocks in the stream buffer, which fetches sequential fetch blocks ahead
+        when the instruction cache is disabled. If zero, the stream buffer is disabled.
+    dcache_enable: bool
+        Enable data cache. If disabled, loads and stores are sent directly to the bus.
+    dcache_ways: int
+        Associativity of the data cache.
+    dcache_sets_bits: int
+        Log of the number of sets of the data cache.
+    dcache_line_bytes_log: int
+        Log of the data cache line size (in bytes).
+    store_buffer_depth: int
+        Number of entries in the store buffer, which holds committed stores until they are written to the
+        data cache. If zero, stores wait for the memory response before they are committed.
     fetch_block_bytes_log: int
         Log of the size of the fetch block (in bytes).
+    bpu_direction: DirectionPredictorType
+        Type of the conditional branch direction predictor.
+    bpu_table_bits: int
+        Log of the number of rows (one per fetch block) in the direction predictor table.
+    bpu_history_bits: int
+        Length of the global history used by the gshare direction predictor. Must not exceed `bpu_table_bits`.
+    bpu_btb_enable: bool
+        Enable the branch target buffer, which lets the fetch unit follow taken jumps and branches
+        without waiting for them to be predecoded.
+    bpu_btb_ways: int
+        Associativity of the branch target buffer.
+    bpu_btb_sets_bits: int
+        Log of the number of sets of the branch target buffer.
+    bpu_ras_enable: bool
+        Enable the return address stack, which predicts targets of function returns, so that they don't
+        stall the frontend.
+    bpu_ras_depth_bits: int
+        Log of the number of entries of the return address stack. At most 3.
     instr_buffer_size: int
         Size of the instruction buffer.
     interrupt_custom_count: int
@@ -145,6 +192,10 @@ class _CoreConfigurationDataClass:
     rob_entries_bits: int = 7
     start_pc: int = 0
 
+    wb_instr_pipelined: bool = False
+    wb_data_pipelined: bool = False
+    wb_max_requests: int = 8
+
     checkpoint_count: int = 16
     tag_bits: int = 5
 
@@ -152,9 +203,28 @@ class _CoreConfigurationDataClass:
     icache_ways: int = 2
     icache_sets_bits: int = 7
     icache_line_bytes_log: int = 5
+    icache_prefetch_lines: int = 0
+    icache_replacement: ICacheReplacementPolicy = ICacheReplacementPolicy.PLRU
+    icache_bypass_stream_blocks: int = 0
+
+    dcache_enable: bool = True
+    dcache_ways: int = 2
+    dcache_sets_bits: int = 6
+    dcache_line_bytes_log: int = 5
+
+    store_buffer_depth: int = 4
 
     fetch_block_bytes_log: int = 2
 
+    bpu_direction: DirectionPredictorType = DirectionPredictorType.BIMODAL
+    bpu_table_bits: int = 7
+    bpu_history_bits: int = 6
+    bpu_btb_enable: bool = True
+    bpu_btb_ways: int = 2
+    bpu_btb_sets_bits: int = 4
+    bpu_ras_enable: bool = True
+    bpu_ras_depth_bits: int = 3
+
     instr_buffer_size: int = 4
 
     interrupt_custom_count: int = 16
@@ -199,6 +269,12 @@ tiny_core_config = CoreConfiguration(
     phys_regs_bits=basic_core_config.phys_regs_bits - 1,
     rob_entries_bits=basic_core_config.rob_entries_bits - 1,
     icache_enable=False,
+    icache_bypass_stream_blocks=4,
+    dcache_enable=False,
+    store_buffer_depth=0,
+    bpu_direction=DirectionPredictorType.STATIC,
+    bpu_btb_enable=False,
+    bpu_ras_enable=False,
     user_mode=False,
 )
 
@@ -254,7 +330,13 @@ full_core_config = CoreConfiguration(
     ),
     compressed=True,
     fetch_block_bytes_log=4,
+    icache_prefetch_lines=2,
     instr_buffer_size=16,
+    bpu_direction=DirectionPredictorType.GSHARE,
+    bpu_table_bits=8,
+    bpu_history_bits=8,
+    bpu_btb_ways=4,
+    bpu_btb_sets_bits=5,
     pmp_register_count=16,
 )
 
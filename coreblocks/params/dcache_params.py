@@ -0,0 +1,52 @@
+from amaranth.utils import exact_log2
+
+__all__ = ["DCacheParameters"]
+
+
+class DCacheParameters:
+    """Parameters of the Data Cache.
+
+    Parameters
+    ----------
+    addr_width : int
+        Length of addresses used in the cache (in bits).
+    word_width : int
+        Length of the machine word (in bits).
+    num_of_ways : int
+        Associativity of the cache.
+    num_of_sets_bits : int
+        Log of the number of cache sets.
+    line_bytes_log : int
+        Log of the size of a single cache line in bytes.
+    enable : bool
+        Enable the data cache. If disabled, requests are bypassed to the bus.
+    """
+
+    def __init__(self, *, addr_width, word_width, num_of_ways, num_of_sets_bits, line_bytes_log, enable=True):
+        self.addr_width = addr_width
+        self.word_width = word_width
+        self.num_of_ways = num_of_ways
+        self.num_of_sets_bits = num_of_sets_bits
+        self.line_bytes_log = line_bytes_log
+        self.enable = enable
+        self.num_of_sets = 2**num_of_sets_bits
+        self.line_size_bytes = 2**line_bytes_log
+
+        self.word_width_bytes = word_width // 8
+        self.word_width_bytes_log = exact_log2(self.word_width_bytes)
+
+        self.offset_bits = line_bytes_log
+        self.index_bits = num_of_sets_bits
+        self.tag_bits = self.addr_width - self.offset_bits - self.index_bits
+
+        self.index_start_bit = self.offset_bits
+        self.index_end_bit = self.offset_bits + self.index_bits - 1
+
+        self.words_in_line = self.line_size_bytes // self.word_width_bytes
+        self.word_in_line_bits = self.offset_bits - self.word_width_bytes_log
+
+        if not enable:
+            return
+
+        if line_bytes_log < self.word_width_bytes_log:
+            raise ValueError("The data cache line size must be not smaller than the machine word size.")
@@ -4,6 +4,8 @@ from amaranth.utils import ceil_log2, exact_log2
 
 from coreblocks.arch.isa import ISA, gen_isa_string
 from .icache_params import ICacheParameters
+from .dcache_params import DCacheParameters
+from .bpu_params import BranchPredictorParameters
 from .fu_params import extensions_supported
 from ..peripherals.wishbone import WishboneParameters
 from transactron.utils import DependentCache
@@ -37,6 +39,9 @@ class GenParams(DependentCache):
         bytes_in_word = self.isa.xlen // 8
         bytes_in_word_log = exact_log2(bytes_in_word)
         self.wb_params = WishboneParameters(data_width=self.isa.xlen, addr_width=self.isa.xlen - bytes_in_word_log)
+        self.wb_instr_pipelined = cfg.wb_instr_pipelined
+        self.wb_data_pipelined = cfg.wb_data_pipelined
+        self.wb_max_requests = cfg.wb_max_requests
 
         self.icache_params = ICacheParameters(
             addr_width=self.isa.xlen,
@@ -46,6 +51,31 @@ class GenParams(DependentCache):
             num_of_sets_bits=cfg.icache_sets_bits,
             line_bytes_log=cfg.icache_line_bytes_log,
             enable=cfg.icache_enable,
+            prefetch_lines=cfg.icache_prefetch_lines,
+            replacement=cfg.icache_replacement,
+            stream_blocks=cfg.icache_bypass_stream_blocks,
+        )
+
+        self.dcache_params = DCacheParameters(
+            addr_width=self.isa.xlen,
+            word_width=self.isa.xlen,
+            num_of_ways=cfg.dcache_ways,
+            num_of_sets_bits=cfg.dcache_sets_bits,
+            line_bytes_log=cfg.dcache_line_bytes_log,
+            enable=cfg.dcache_enable,
+        )
+
+        self.store_buffer_depth = cfg.store_buffer_depth
+
+        self.bpu_params = BranchPredictorParameters(
+            direction=cfg.bpu_direction,
+            table_bits=cfg.bpu_table_bits,
+            history_bits=cfg.bpu_history_bits,
+            btb_enable=cfg.bpu_btb_enable,
+            btb_ways=cfg.bpu_btb_ways,
+            btb_sets_bits=cfg.bpu_btb_sets_bits,
+            ras_enable=cfg.bpu_ras_enable,
+            ras_depth_bits=cfg.bpu_ras_depth_bits,
         )
 
         self.debug_signals_enabled = cfg.debug_signals
@@ -1,3 +1,21 @@
+from enum import IntEnum
+
+__all__ = ["ICacheReplacementPolicy", "ICacheParameters"]
+
+
+class ICacheReplacementPolicy(IntEnum):
+    """
+    Enum of cache line replacement policies.
+    """
+
+    #: One global counter, which selects the next way to be replaced after every refill.
+    ROUND_ROBIN = 0
+    #: Tree pseudo-LRU, kept separately for every set. The number of ways must be a power of two.
+    PLRU = 1
+    #: True LRU, kept separately for every set. Supports at most 4 ways.
+    LRU = 2
+
+
 class ICacheParameters:
     """Parameters of the Instruction Cache.
 
@@ -15,6 +33,13 @@ class ICacheParameters:
         Log of the size of a single cache line in bytes.
     enable : bool
         Enable the instruction cache. If disabled, requests are bypassed to the bus.
+    prefetch_lines : int
+        Number of cache lines prefetched after a sequential miss. If zero, the prefetcher is disabled.
+    replacement : ICacheReplacementPolicy
+        Policy used to select the way to be replaced on a refill.
+    stream_blocks : int
+        Size (in fetch blocks) of the stream buffer used when the cache is disabled.
+        If zero, the stream buffer is disabled.
     """
 
     def __init__(
@@ -26,7 +51,10 @@ class ICacheParameters:
         num_of_ways,
         num_of_sets_bits,
         line_bytes_log,
-        enable=True
+        enable=True,
+        prefetch_lines=0,
+        replacement=ICacheReplacementPolicy.PLRU,
+        stream_blocks=0,
     ):
         self.addr_width = addr_width
         self.word_width = word_width
@@ -35,6 +63,9 @@ class ICacheParameters:
         self.num_of_sets_bits = num_of_sets_bits
         self.line_bytes_log = line_bytes_log
         self.enable = enable
+        self.prefetch_lines = prefetch_lines
+        self.replacement = replacement
+        self.stream_blocks = stream_blocks
         self.fetch_block_bytes = 2**fetch_block_bytes_log
         self.num_of_sets = 2**num_of_sets_bits
         self.line_size_bytes = 2**line_bytes_log
@@ -57,3 +88,9 @@ class ICacheParameters:
 
         if line_bytes_log < self.fetch_block_bytes_log:
             raise ValueError("The instruction cache line size must be not smaller than the fetch block size.")
+
+        if replacement == ICacheReplacementPolicy.PLRU and num_of_ways & (num_of_ways - 1):
+            raise ValueError("Pseudo-LRU replacement requires the number of ways to be a power of two.")
+
+        if replacement == ICacheReplacementPolicy.LRU and num_of_ways > 4:
+            raise ValueError("LRU replacement supports at most 4 ways.")
@@ -3,7 +3,13 @@ from typing import Protocol
 from amaranth import *
 from amaranth_types import HasElaborate
 
-from coreblocks.peripherals.wishbone import WishboneMaster
+from coreblocks.peripherals.wishbone import (
+    WishboneMaster,
+    PipelinedWishboneMaster,
+    CycleType,
+    BurstType,
+    burst_next_address,
+)
 from coreblocks.peripherals.axi_lite import AXILiteMaster
 
 from transactron import Method, def_method, TModule
@@ -73,6 +79,9 @@ class CommonBusMasterMethodLayout:
     ----------
     request_read_layout: Layout
         A layout for the `request_read` method of a common bus master.
+        If `burst` is set, the next read request is going to be a read of the following address,
+        which lets the bus transfer the words in a burst. The addresses of a burst wrap
+        within aligned blocks of `2 ** wrap_log` words, or don't wrap if `wrap_log` is zero.
 
     request_write_layout: Layout
         A layout for the `request_write` method of a common bus master.
@@ -90,6 +99,8 @@ class CommonBusMasterMethodLayout:
         self.request_read_layout = make_layout(
             ("addr", self.bus_params.addr_width),
             ("sel", self.bus_params.data_width // self.bus_params.granularity),
+            ("burst", 1),
+            ("wrap_log", 3),
         )
 
         self.request_write_layout = make_layout(
@@ -108,10 +119,17 @@ class WishboneMasterAdapter(Elaboratable, BusMasterInterface):
     An adapter for Wishbone master.
 
     The adapter module is for use in places where BusMasterInterface is expected.
+    Both the classic and the pipelined Wishbone masters can be adapted. With the
+    pipelined master, multiple requests can be in flight at the same time.
+
+    Read bursts are sent as incrementing bursts, using the registered feedback
+    cycle tags. Wrapping bursts are supported for blocks of 4, 8 and 16 words,
+    other bursts are sent as classic cycles. Once a burst is started, only
+    its next beat can be requested.
 
     Parameters
     ----------
-    bus: WishboneMaster
+    bus: WishboneMaster | PipelinedWishboneMaster
         Specific Wishbone master module which is to be adapted.
 
     Attributes
@@ -129,7 +147,8 @@ class WishboneMasterAdapter(Elaboratable, BusMasterInterface):
 
     request_write: Method
         Transactional method for initiating a write request.
-        It is ready if the `request` method of the underlying Wishbone master is ready.
+        It is ready if the `request` method of the underlying Wishbone master is ready
+        and no burst is in progress.
         Input layout is `request_write_layout`.
 
     get_read_response: Method
@@ -143,7 +162,7 @@ class WishboneMasterAdapter(Elaboratable, BusMasterInterface):
         Output layout is `write_response_layout`.
     """
 
-    def __init__(self, bus: WishboneMaster):
+    def __init__(self, bus: WishboneMaster | PipelinedWishboneMaster):
         self.bus = bus
         self.params = self.bus.wb_params
 
@@ -157,21 +176,54 @@ class WishboneMasterAdapter(Elaboratable, BusMasterInterface):
     def elaborate(self, platform):
         m = TModule()
 
+        # The serializer mustn't limit the number of requests in flight on a pipelined bus
+        depth = self.bus.max_req if isinstance(self.bus, PipelinedWishboneMaster) else 4
         bus_serializer = Serializer(
-            port_count=2, serialized_req_method=self.bus.request, serialized_resp_method=self.bus.result
+            port_count=2, serialized_req_method=self.bus.request, serialized_resp_method=self.bus.result, depth=depth
         )
         m.submodules.bus_serializer = bus_serializer
 
-        @def_method(m, self.request_read)
+        # A burst is in progress - the next request has to be a read of `burst_addr`.
+        in_burst = Signal()
+        burst_addr = Signal(self.params.addr_width)
+        burst_bte = Signal(BurstType)
+
+        @def_method(
+            m, self.request_read, validate_arguments=lambda addr, sel, burst, wrap_log: ~in_burst | (addr == burst_addr)
+        )
         def _(arg):
             we = C(0, unsigned(1))
             data = C(0, unsigned(self.params.data_width))
-            bus_serializer.serialize_in[0](m, addr=arg.addr, data=data, we=we, sel=arg.sel)
 
-        @def_method(m, self.request_write)
+            bte = Signal(BurstType)
+            can_burst = Signal()
+            with m.Switch(arg.wrap_log):
+                for wrap_log, burst_type in [
+                    (0, BurstType.LINEAR),
+                    (2, BurstType.WRAP_4),
+                    (3, BurstType.WRAP_8),
+                    (4, BurstType.WRAP_16),
+                ]:
+                    with m.Case(wrap_log):
+                        m.d.av_comb += bte.eq(burst_type)
+                        m.d.av_comb += can_burst.eq(1)
+            bte = Mux(in_burst, burst_bte, bte)
+
+            continue_burst = arg.burst & (in_burst | can_burst)
+            cti = Mux(continue_burst, CycleType.INCR_BURST, Mux(in_burst, CycleType.END_OF_BURST, CycleType.CLASSIC))
+
+            m.d.sync += in_burst.eq(continue_burst)
+            m.d.sync += burst_addr.eq(burst_next_address(arg.addr, bte))
+            m.d.sync += burst_bte.eq(bte)
+
+            bus_serializer.serialize_in[0](m, addr=arg.addr, data=data, we=we, sel=arg.sel, cti=cti, bte=bte)
+
+        @def_method(m, self.request_write, ready=~in_burst)
         def _(arg):
             we = C(1, unsigned(1))
-            bus_serializer.serialize_in[1](m, addr=arg.addr, data=arg.data, we=we, sel=arg.sel)
+            bus_serializer.serialize_in[1](
+                m, addr=arg.addr, data=arg.data, we=we, sel=arg.sel, cti=CycleType.CLASSIC, bte=BurstType.LINEAR
+            )
 
         @def_method(m, self.get_read_response)
         def _():
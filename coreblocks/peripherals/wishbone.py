@@ -1,5 +1,6 @@
 from amaranth import *
 import amaranth.lib.memory as memory
+from amaranth.lib.enum import IntEnum
 from amaranth.lib.wiring import In, Out, Component
 from functools import reduce
 import operator
@@ -33,6 +34,38 @@ class WishboneParameters:
         self.granularity = granularity
 
 
+class CycleType(IntEnum, shape=3):
+    """Cycle type identifiers (CTI) of the registered feedback bus cycles."""
+
+    CLASSIC = 0b000
+    CONST_ADDR_BURST = 0b001
+    INCR_BURST = 0b010
+    END_OF_BURST = 0b111
+
+
+class BurstType(IntEnum, shape=2):
+    """Burst type extensions (BTE) of the incrementing bursts."""
+
+    LINEAR = 0b00
+    WRAP_4 = 0b01
+    WRAP_8 = 0b10
+    WRAP_16 = 0b11
+
+
+def burst_next_address(addr: Value, bte: Value) -> Value:
+    """Address of the beat following `addr` in an incrementing burst of type `bte`."""
+    incr = (addr + 1)[: len(addr)]
+    return Mux(
+        bte == BurstType.LINEAR,
+        incr,
+        Mux(
+            bte == BurstType.WRAP_4,
+            Cat(incr[:2], addr[2:]),
+            Mux(bte == BurstType.WRAP_8, Cat(incr[:3], addr[3:]), Cat(incr[:4], addr[4:])),
+        ),
+    )
+
+
 class WishboneInterface(ComponentInterface):
     def __init__(self, wb_params: WishboneParameters):
         self.dat_r = CIn(wb_params.data_width)
@@ -48,6 +81,8 @@ class WishboneInterface(ComponentInterface):
         self.sel = COut(wb_params.data_width // wb_params.granularity)
         self.stb = COut()
         self.we = COut()
+        self.cti = COut(3)
+        self.bte = COut(2)
 
 
 class WishboneMasterMethodLayout:
@@ -61,7 +96,8 @@ class WishboneMasterMethodLayout:
     Attributes
     ----------
     request_layout: Layout
-        Layout for request method of WishboneMaster.
+        Layout for request method of WishboneMaster. The `cti` and `bte` fields are
+        the cycle tags of the request, see `CycleType` and `BurstType`.
 
     result_layout: Layout
         Layout for result method of WishboneMaster.
@@ -73,6 +109,8 @@ class WishboneMasterMethodLayout:
             ("data", wb_params.data_width),
             ("we", 1),
             ("sel", wb_params.data_width // wb_params.granularity),
+            ("cti", 3),
+            ("bte", 2),
         )
 
         self.result_layout = make_layout(("data", wb_params.data_width), ("err", 1))
@@ -137,6 +175,8 @@ class WishboneMaster(Component):
             m.d.sync += self.wb_master.dat_w.eq(Mux(request.we, request.data, 0))
             m.d.sync += self.wb_master.we.eq(request.we)
             m.d.sync += self.wb_master.sel.eq(request.sel)
+            m.d.sync += self.wb_master.cti.eq(request.cti)
+            m.d.sync += self.wb_master.bte.eq(request.bte)
 
         with m.FSM("Reset"):
             with m.State("Reset"):
@@ -195,11 +235,12 @@ class WishboneMaster(Component):
             self.log.debug(
                 m,
                 True,
-                "request addr=0x{:x} data=0x{:x} sel=0x{:x} write={}",
+                "request addr=0x{:x} data=0x{:x} sel=0x{:x} write={} cti={}",
                 arg.addr,
                 arg.data,
                 arg.sel,
                 arg.we,
+                arg.cti,
             )
 
         result.write.schedule_before(self.request)
@@ -254,6 +295,8 @@ class PipelinedWishboneMaster(Component):
             ("data", wb_params.data_width),
             ("we", 1),
             ("sel", wb_params.data_width // wb_params.granularity),
+            ("cti", 3),
+            ("bte", 2),
         ]
 
         self.result_out_layout = [("data", wb_params.data_width), ("err", 1)]
@@ -295,6 +338,8 @@ class PipelinedWishboneMaster(Component):
                 self.wb.dat_w.eq(arg.data),
                 self.wb.we.eq(arg.we),
                 self.wb.sel.eq(arg.sel),
+                self.wb.cti.eq(arg.cti),
+                self.wb.bte.eq(arg.bte),
             ]
 
             m.d.comb += req_start.eq(1)
@@ -369,7 +414,7 @@ class WishboneMuxer(Component):
         for i in range(len(self.slaves)):
             # connect all M->S signals except stb
             # workaround for the lack of selective connecting in wiring
-            for n in ["dat_w", "cyc", "lock", "adr", "we", "sel", "stb"]:
+            for n in ["dat_w", "cyc", "lock", "adr", "we", "sel", "stb", "cti", "bte"]:
                 m.d.comb += getattr(self.slaves[i], n).eq(getattr(self.master_wb, n))
             # use stb as select
             m.d.comb += self.slaves[i].stb.eq(self.txn_sel[i] & self.master_wb.stb)
@@ -458,7 +503,7 @@ class WishboneArbiter(Component):
             for i in range(len(self.masters)):
                 with m.Case(i):
                     # workaround for the lack of selective connecting in wiring
-                    for n in ["dat_w", "cyc", "lock", "adr", "we", "sel", "stb"]:
+                    for n in ["dat_w", "cyc", "lock", "adr", "we", "sel", "stb", "cti", "bte"]:
                         m.d.comb += getattr(self.slave_wb, n).eq(getattr(self.masters[i], n))
 
         # Disable slave when round robin is not valid at start of new request
@@ -477,6 +522,11 @@ class WishboneMemorySlave(Component):
     ----------
     wb_params: WishboneParameters
         Parameters for bus generation.
+    pipelined: bool
+        Use the pipelined Wishbone protocol. Requests are acknowledged without waiting for `stb`,
+        and `stall` is asserted while a read is being answered. Defaults to False.
+        In the classic mode, incrementing bursts (see `CycleType`) are supported - the beats
+        of a burst are acknowledged in consecutive cycles.
     **kwargs: dict
         Keyword arguments for the underlying Amaranth's `Memory`. If `width` and `depth`
         are not specified, then they're inferred from `wb_params`: `data_width` becomes
@@ -490,8 +540,9 @@ class WishboneMemorySlave(Component):
 
     bus: WishboneInterface
 
-    def __init__(self, wb_params: WishboneParameters, **kwargs):
+    def __init__(self, wb_params: WishboneParameters, *, pipelined: bool = False, **kwargs):
         super().__init__({"bus": In(WishboneInterface(wb_params).signature)})
+        self.pipelined = pipelined
         if "shape" not in kwargs:
             kwargs["shape"] = wb_params.data_width
         if kwargs["shape"] not in (8, 16, 32, 64):
@@ -511,12 +562,15 @@ class WishboneMemorySlave(Component):
         wrport = self.mem.write_port(granularity=self.granularity)
         rdport = self.mem.read_port()
 
+        read_addr = Signal.like(self.bus.adr)
+
         with m.FSM():
             with m.State("Start"):
                 with m.If(self.bus.stb & self.bus.cyc):
                     with m.If(~self.bus.we):
                         with m.If(self.bus.adr < self.mem.depth):
                             m.d.comb += rdport.addr.eq(self.bus.adr)
+                            m.d.sync += read_addr.eq(self.bus.adr)
                             # asserting rdport.en not required in case of a transparent port
                             m.next = "Read"
                         with m.Else():  # access outside bounds
@@ -530,8 +584,24 @@ class WishboneMemorySlave(Component):
 
             with m.State("Read"):
                 m.d.comb += self.bus.dat_r.eq(rdport.data)
-                # ack can only be asserted when stb is asserted
-                m.d.comb += self.bus.ack.eq(self.bus.stb)
                 m.next = "Start"
+                if self.pipelined:
+                    # the request was already accepted, the next one has to wait
+                    m.d.comb += self.bus.ack.eq(1)
+                    m.d.comb += self.bus.stall.eq(1)
+                else:
+                    # The read data belongs to `read_addr` - the current request can be different
+                    # if the master didn't follow an announced burst.
+                    with m.If(self.bus.stb & self.bus.cyc & ~self.bus.we & (self.bus.adr == read_addr)):
+                        # ack can only be asserted when stb is asserted
+                        m.d.comb += self.bus.ack.eq(1)
+
+                        # In an incrementing burst, the next word is read in advance, so that
+                        # the next beat can be acknowledged in the following cycle.
+                        next_addr = burst_next_address(read_addr, self.bus.bte)
+                        with m.If((self.bus.cti == CycleType.INCR_BURST) & (next_addr < self.mem.depth)):
+                            m.d.comb += rdport.addr.eq(next_addr)
+                            m.d.sync += read_addr.eq(next_addr)
+                            m.next = "Read"
 
         return m
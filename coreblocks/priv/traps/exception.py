@@ -3,9 +3,9 @@ from transactron.utils.dependencies import DependencyContext
 from coreblocks.params.genparams import GenParams
 
 from coreblocks.arch import ExceptionCause
-from coreblocks.interface.layouts import ExceptionRegisterLayouts
-from coreblocks.interface.keys import ExceptionReportKey
-from transactron.core import TModule, def_method, Method
+from coreblocks.interface.layouts import ExceptionRegisterLayouts, RATLayouts
+from coreblocks.interface.keys import ExceptionReportKey, RollbackKey
+from transactron.core import TModule, Transaction, def_method, Method
 from transactron.lib.connectors import ConnectTrans
 from transactron.lib.fifo import BasicFifo
 
@@ -48,15 +48,26 @@ class ExceptionInformationRegister(Elaboratable):
     result data. Exception order is computed in this module. Only one exception can be reported for single instruction,
     exception priorities should be computed locally before calling report.
     If `exception` bit is set in the ROB, `Retirement` stage fetches exception details from this module.
+
+    Exceptions of instructions squashed by a rollback are ignored. When a rollback squashes the stored exception,
+    it is dropped and the frontend is no longer stalled because of it.
     """
 
-    def __init__(self, gen_params: GenParams, rob_get_indices: Method, fetch_stall_exception: Method):
+    def __init__(
+        self,
+        gen_params: GenParams,
+        rob_get_indices: Method,
+        fetch_stall_exception: Method,
+        fetch_cancel_stall_exception: Method,
+        get_active_tags: Method,
+    ):
         self.gen_params = gen_params
 
         self.cause = Signal(ExceptionCause)
         self.rob_id = Signal(gen_params.rob_entries_bits)
         self.pc = Signal(gen_params.isa.xlen)
         self.mtval = Signal(gen_params.isa.xlen)
+        self.tag = Signal(gen_params.tag_bits)
         self.valid = Signal()
 
         self.layouts = gen_params.get(ExceptionRegisterLayouts)
@@ -88,42 +99,73 @@ class ExceptionInformationRegister(Elaboratable):
 
         self.clear = Method()
 
+        self.rollback = Method(i=gen_params.get(RATLayouts).rollback_in)
+        dm.add_dependency(RollbackKey(), self.rollback)
+
         self.rob_get_indices = rob_get_indices
         self.fetch_stall_exception = fetch_stall_exception
+        self.fetch_cancel_stall_exception = fetch_cancel_stall_exception
+        self.get_active_tags = get_active_tags
 
     def elaborate(self, platform):
         m = TModule()
 
+        # Tags are invalidated in the cycle after a rollback, so the stored exception is checked then.
+        rollback_check = Signal()
+
+        with Transaction().body(m, ready=rollback_check):
+            m.d.sync += rollback_check.eq(0)
+            with m.If(self.valid & ~self.get_active_tags(m).active_tags[self.tag]):
+                m.d.sync += self.valid.eq(0)
+                self.fetch_cancel_stall_exception(m)
+
+        @def_method(m, self.rollback)
+        def _(tag):
+            m.d.sync += rollback_check.eq(1)
+
         @def_method(m, self.report)
-        def _(cause, rob_id, pc, mtval):
+        def _(cause, rob_id, pc, mtval, tag):
             should_write = Signal()
+            active_tags = self.get_active_tags(m).active_tags
 
-            with m.If(self.valid & (self.rob_id == rob_id)):
+            with m.If(~active_tags[tag]):
+                # the instruction was squashed
+                m.d.comb += should_write.eq(0)
+            with m.Elif(~self.valid | ~active_tags[self.tag]):
+                m.d.comb += should_write.eq(1)
+            with m.Elif(self.rob_id == rob_id):
                 # entry for the same rob_id cannot be overwritten, because its update couldn't be validated
                 # in Retirement.
                 m.d.comb += should_write.eq(0)
-            with m.Elif(self.valid):
+            with m.Else():
                 rob_start_idx = self.rob_get_indices(m).start
                 m.d.comb += should_write.eq(
                     (rob_id - rob_start_idx).as_unsigned() < (self.rob_id - rob_start_idx).as_unsigned()
                 )
-            with m.Else():
-                m.d.comb += should_write.eq(1)
 
             with m.If(should_write):
                 m.d.sync += self.rob_id.eq(rob_id)
                 m.d.sync += self.cause.eq(cause)
                 m.d.sync += self.pc.eq(pc)
                 m.d.sync += self.mtval.eq(mtval)
+                m.d.sync += self.tag.eq(tag)
 
-            m.d.sync += self.valid.eq(1)
+            with m.If(active_tags[tag]):
+                m.d.sync += self.valid.eq(1)
 
-            # In case of any reported exception, core will need to be flushed. Fetch can be stalled immediately
-            self.fetch_stall_exception(m)
+                # In case of any reported exception, core will need to be flushed. Fetch can be stalled immediately
+                self.fetch_stall_exception(m)
 
         @def_method(m, self.get, nonexclusive=True)
         def _():
-            return {"rob_id": self.rob_id, "cause": self.cause, "pc": self.pc, "mtval": self.mtval, "valid": self.valid}
+            return {
+                "rob_id": self.rob_id,
+                "cause": self.cause,
+                "pc": self.pc,
+                "mtval": self.mtval,
+                "tag": self.tag,
+                "valid": self.valid,
+            }
 
         @def_method(m, self.clear)
         def _():
@@ -174,7 +174,8 @@ class TestRetirement(TestCaseWithSimulator):
 
     @def_method_mock(lambda self: self.retc.mock_checkpoint_get_active_tags)
     def mock_checkpoint_get_active_tags(self):
-        return {"active_tags": -1}
+        tags_count = 2**self.gen_params.tag_bits
+        return {"active_tags": [1] * tags_count, "checkpointed_tags": [0] * tags_count}
 
     @def_method_mock(lambda self: self.retc.mock_checkpoint_tag_free)
     def mock_checkpoint_tag_free(self):
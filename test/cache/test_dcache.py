@@ -0,0 +1,207 @@
+from collections import deque
+from parameterized import parameterized_class
+import random
+
+from amaranth import Elaboratable, Module
+from amaranth.utils import exact_log2
+
+from transactron.lib import AdapterTrans
+from coreblocks.cache.dcache import DCache
+from coreblocks.cache.refiller import CommonBusDCacheRefiller
+from coreblocks.params import GenParams
+from coreblocks.interface.layouts import DCacheLayouts
+from coreblocks.params.configurations import test_core_config
+
+from transactron.testing import TestCaseWithSimulator, TestbenchIO, TestbenchContext
+from ..peripherals.bus_mock import BusMockParameters, MockMasterAdapter
+
+MMIO_BASE = 0xE0000000
+
+
+class DCacheTestCircuit(Elaboratable):
+    def __init__(self, gen_params: GenParams):
+        self.gen_params = gen_params
+        self.cp = self.gen_params.dcache_params
+
+    def elaborate(self, platform):
+        m = Module()
+
+        bus_mock_params = BusMockParameters(
+            data_width=self.gen_params.isa.xlen,
+            addr_width=self.gen_params.isa.xlen,
+        )
+
+        m.submodules.bus_master_adapter = self.bus_master_adapter = MockMasterAdapter(bus_mock_params)
+        m.submodules.refiller = self.refiller = CommonBusDCacheRefiller(
+            self.gen_params.get(DCacheLayouts), self.cp, self.bus_master_adapter
+        )
+        m.submodules.cache = self.cache = DCache(self.gen_params, self.refiller, self.bus_master_adapter)
+        m.submodules.issue_req = self.issue_req = TestbenchIO(AdapterTrans.create(self.cache.issue_req))
+        m.submodules.accept_res = self.accept_res = TestbenchIO(AdapterTrans.create(self.cache.accept_res))
+        m.submodules.flush_cache = self.flush_cache = TestbenchIO(AdapterTrans.create(self.cache.flush))
+
+        return m
+
+
+@parameterized_class(
+    ("name", "isa_xlen", "line_size", "ways", "sets"),
+    [
+        ("line16B_2way_rv32i", 32, 4, 2, 4),
+        ("line32B_1way_rv32i", 32, 5, 1, 2),
+        ("line4B_4way_rv32i", 32, 2, 4, 2),
+        ("line32B_2way_rv64i", 64, 5, 2, 4),
+    ],
+)
+class TestDCache(TestCaseWithSimulator):
+    isa_xlen: int
+    line_size: int
+    ways: int
+    sets: int
+
+    def setup_method(self) -> None:
+        random.seed(42)
+
+        self.gen_params = GenParams(
+            test_core_config.replace(
+                xlen=self.isa_xlen,
+                dcache_ways=self.ways,
+                dcache_sets_bits=exact_log2(self.sets),
+                dcache_line_bytes_log=self.line_size,
+                fetch_block_bytes_log=exact_log2(self.isa_xlen // 8),
+            )
+        )
+        self.cp = self.gen_params.dcache_params
+        self.m = DCacheTestCircuit(self.gen_params)
+
+        # Memory as seen by the bus, and by the requests issued so far
+        self.mem: dict[int, int] = {}
+        self.ref_mem: dict[int, int] = {}
+        self.bad_addrs = set()
+
+        self.expected = deque()
+        self.mmio_reads = deque()
+        self.bus_reads = 0
+        self.bus_latency = 0.5
+
+    def word_addr(self, addr: int) -> int:
+        return addr & ~(self.cp.word_width_bytes - 1)
+
+    def gen_addr(self) -> int:
+        if random.random() < 0.1:
+            return MMIO_BASE + random.randrange(0, 64, self.cp.word_width_bytes)
+        # A few times more data than the cache can hold
+        return random.randrange(0, 4 * self.cp.num_of_ways * self.cp.num_of_sets * self.cp.line_size_bytes)
+
+    def load_or_gen_mem(self, addr: int) -> int:
+        if addr not in self.mem:
+            self.mem[addr] = self.ref_mem[addr] = random.randrange(2**self.cp.word_width)
+        return self.mem[addr]
+
+    def apply_store(self, mem: dict[int, int], addr: int, data: int, byte_mask: int):
+        word = mem[addr]
+        for i in range(self.cp.word_width_bytes):
+            if byte_mask & (1 << i):
+                byte = 0xFF << (8 * i)
+                word = (word & ~byte) | (data & byte)
+        mem[addr] = word
+
+    async def bus_mock(self, sim: TestbenchContext):
+        bus = self.m.bus_master_adapter
+        while True:
+            req = await bus.request_read_mock.call_try(sim)
+            if req is not None:
+                addr = req.addr << self.cp.word_width_bytes_log
+                self.bus_reads += 1
+                await self.random_wait_geom(sim, self.bus_latency)
+
+                if addr >= MMIO_BASE:
+                    # MMIO registers are volatile, so a stale value would be caught
+                    data = random.randrange(2**self.cp.word_width)
+                    self.mmio_reads.append(data)
+                else:
+                    data = self.load_or_gen_mem(addr)
+
+                await bus.get_read_response_mock.call(sim, data=data, err=addr in self.bad_addrs)
+                continue
+
+            req = await bus.request_write_mock.call_try(sim)
+            if req is not None:
+                addr = req.addr << self.cp.word_width_bytes_log
+                await self.random_wait_geom(sim, self.bus_latency)
+
+                err = addr in self.bad_addrs
+                if not err and addr < MMIO_BASE:
+                    self.load_or_gen_mem(addr)
+                    self.apply_store(self.mem, addr, req.data, req.sel)
+
+                await bus.get_write_response_mock.call(sim, err=err)
+
+    async def issue_process(self, sim: TestbenchContext):
+        for _ in range(600):
+            addr = self.word_addr(self.gen_addr())
+            store = random.random() < 0.3
+            data = random.randrange(2**self.cp.word_width)
+            byte_mask = random.choice([1, 3, 2**self.cp.word_width_bytes - 1]) << random.choice([0, 1])
+            byte_mask &= 2**self.cp.word_width_bytes - 1
+
+            if addr < MMIO_BASE:
+                if addr not in self.ref_mem:
+                    self.load_or_gen_mem(addr)
+                err = addr in self.bad_addrs
+                if store:
+                    if not err:
+                        self.apply_store(self.ref_mem, addr, data, byte_mask)
+                    self.expected.append((err, None))
+                else:
+                    self.expected.append((err, self.ref_mem[addr]))
+            else:
+                self.expected.append((addr in self.bad_addrs, "mmio" if not store else None))
+
+            await self.m.issue_req.call(sim, addr=addr, data=data, byte_mask=byte_mask, store=store)
+            await self.random_wait_geom(sim, 0.7)
+
+    async def accept_process(self, sim: TestbenchContext):
+        for _ in range(600):
+            ret = await self.m.accept_res.call(sim)
+            err, data = self.expected.popleft()
+            if data == "mmio":
+                data = self.mmio_reads.popleft()
+
+            assert ret.error == err
+            if not err and data is not None:
+                assert ret.data == data
+
+            await self.random_wait_geom(sim, 0.7)
+
+    def test_random(self):
+        for _ in range(10):
+            self.bad_addrs.add(self.word_addr(self.gen_addr()))
+
+        with self.run_simulation(self.m) as sim:
+            sim.add_testbench(self.bus_mock, background=True)
+            sim.add_testbench(self.issue_process)
+            sim.add_testbench(self.accept_process)
+
+    def test_hit_under_miss(self):
+        line = self.cp.line_size_bytes
+        other_line = line * self.cp.num_of_sets
+        self.bus_latency = 0.2
+
+        async def process(sim: TestbenchContext):
+            # Bring the first line to the cache
+            await self.m.issue_req.call(sim, addr=0, data=0, byte_mask=0, store=0)
+            await self.m.accept_res.call(sim)
+            await self.tick(sim, 100)
+            assert self.bus_reads == self.cp.words_in_line
+
+            # A miss to a different line (in a different way) doesn't block the following hit
+            await self.m.issue_req.call(sim, addr=other_line, data=0, byte_mask=0, store=0)
+            await self.m.issue_req.call(sim, addr=0, data=0, byte_mask=0, store=0)
+            assert (await self.m.accept_res.call(sim)).data == self.mem[other_line]
+            assert (await self.m.accept_res.call(sim)).data == self.mem[0]
+            if self.cp.words_in_line > 1 and self.ways > 1:
+                assert self.bus_reads < 2 * self.cp.words_in_line
+
+        with self.run_simulation(self.m) as sim:
+            sim.add_testbench(self.bus_mock, background=True)
+            sim.add_testbench(process)
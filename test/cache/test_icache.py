@@ -1,5 +1,7 @@
 from collections import deque
+from typing import Optional
 from parameterized import parameterized_class
+import pytest
 import random
 
 from amaranth import Elaboratable, Module
@@ -7,7 +9,8 @@ from amaranth.utils import exact_log2
 
 from transactron.lib import AdapterTrans, Adapter
 from coreblocks.cache.icache import ICache, ICacheBypass, CacheRefillerInterface
-from coreblocks.params import GenParams
+from coreblocks.cache.stream_buffer import ICacheStreamBuffer
+from coreblocks.params import GenParams, ICacheReplacementPolicy
 from coreblocks.interface.layouts import ICacheLayouts
 from coreblocks.params.configurations import test_core_config
 from coreblocks.cache.refiller import SimpleCommonBusCacheRefiller
@@ -80,8 +83,8 @@ class TestSimpleCommonBusCacheRefiller(TestCaseWithSimulator):
 
         self.requests = deque()
         for _ in range(100):
-            # Make the address aligned to the beginning of a cache line
-            addr = random.randrange(2**self.gen_params.isa.xlen) & ~(self.cp.line_size_bytes - 1)
+            # Make the address aligned to the beginning of a fetch block
+            addr = random.randrange(2**self.gen_params.isa.xlen) & ~(self.cp.fetch_block_bytes - 1)
             self.requests.append(addr)
 
             if random.random() < 0.21:
@@ -115,10 +118,12 @@ class TestSimpleCommonBusCacheRefiller(TestCaseWithSimulator):
             req_addr = self.requests.pop()
             await self.test_module.start_refill.call(sim, addr=req_addr)
 
+            line_addr = req_addr & ~(self.cp.line_size_bytes - 1)
             for i in range(self.cp.fetch_blocks_in_line):
                 ret = await self.test_module.accept_refill.call(sim)
 
-                cur_addr = req_addr + i * self.cp.fetch_block_bytes
+                # The refill starts from the requested fetch block and wraps around the line
+                cur_addr = line_addr + (req_addr + i * self.cp.fetch_block_bytes) % self.cp.line_size_bytes
 
                 assert ret["addr"] == cur_addr
 
@@ -160,8 +165,14 @@ class ICacheBypassTestCircuit(Elaboratable):
         m.submodules.bypass = self.bypass = ICacheBypass(
             self.gen_params.get(ICacheLayouts), self.cp, self.bus_master_adapter
         )
-        m.submodules.issue_req = self.issue_req = TestbenchIO(AdapterTrans.create(self.bypass.issue_req))
-        m.submodules.accept_res = self.accept_res = TestbenchIO(AdapterTrans.create(self.bypass.accept_res))
+        self.cache = self.bypass
+        if self.cp.stream_blocks:
+            m.submodules.stream_buffer = self.cache = ICacheStreamBuffer(
+                self.gen_params.get(ICacheLayouts), self.cp, self.bypass
+            )
+        m.submodules.issue_req = self.issue_req = TestbenchIO(AdapterTrans.create(self.cache.issue_req))
+        m.submodules.accept_res = self.accept_res = TestbenchIO(AdapterTrans.create(self.cache.accept_res))
+        m.submodules.flush = self.flush = TestbenchIO(AdapterTrans.create(self.cache.flush))
 
         return m
 
@@ -251,6 +262,144 @@ class TestICacheBypass(TestCaseWithSimulator):
             sim.add_testbench(self.user_process)
 
 
+@parameterized_class(
+    ("name", "isa_xlen", "fetch_block"),
+    [
+        ("rv32i", 32, 2),
+        ("rv64i", 64, 3),
+    ],
+)
+class TestICacheStreamBuffer(TestCaseWithSimulator):
+    isa_xlen: int
+    fetch_block: int
+
+    def setup_method(self) -> None:
+        self.gen_params = GenParams(
+            test_core_config.replace(
+                xlen=self.isa_xlen,
+                fetch_block_bytes_log=self.fetch_block,
+                icache_enable=False,
+                icache_bypass_stream_blocks=4,
+            )
+        )
+        self.cp = self.gen_params.icache_params
+        self.m = ICacheBypassTestCircuit(self.gen_params)
+
+        random.seed(42)
+
+        self.mem = dict()
+        self.bad_addrs = set()
+
+        self.bus_requests = deque()
+        self.bus_in_flight = deque()
+        self.issued_requests = deque()
+
+    def load_or_gen_mem(self, addr: int):
+        if addr not in self.mem:
+            self.mem[addr] = random.randrange(2**self.cp.word_width)
+        return self.mem[addr]
+
+    async def bus_requester(self, sim: TestbenchContext):
+        while True:
+            req = await self.m.bus_master_adapter.request_read_mock.call(sim)
+            addr = req.addr << exact_log2(self.cp.word_width_bytes)
+            self.bus_requests.append(addr)
+            self.bus_in_flight.append(addr)
+            await self.random_wait_geom(sim, 0.5)
+
+    async def bus_responder(self, sim: TestbenchContext):
+        while True:
+            while not self.bus_in_flight:
+                await sim.tick()
+            addr = self.bus_in_flight.popleft()
+            await self.random_wait_geom(sim, 0.5)
+            await self.m.bus_master_adapter.get_read_response_mock.call(
+                sim, data=self.load_or_gen_mem(addr), err=addr in self.bad_addrs
+            )
+
+    def assert_resp(self, ret: MethodData):
+        addr = self.issued_requests.popleft()
+        assert ret["error"] == (addr in self.bad_addrs)
+        if not ret["error"]:
+            assert ret["fetch_block"] == self.mem[addr]
+
+    def test_fetch_ahead(self):
+        stream_blocks = self.cp.stream_blocks
+        block = self.cp.fetch_block_bytes
+
+        async def user_process(sim: TestbenchContext):
+            self.issued_requests.append(0x1000)
+            await self.m.issue_req.call(sim, addr=0x1000)
+            self.assert_resp(await self.m.accept_res.call(sim))
+
+            # The following blocks are fetched ahead, up to the size of the buffer
+            await self.tick(sim, 20)
+            assert list(self.bus_requests) == [0x1000 + i * block for i in range(stream_blocks + 1)]
+            self.bus_requests.clear()
+
+            for i in range(1, stream_blocks):
+                self.issued_requests.append(0x1000 + i * block)
+                await self.m.issue_req.call(sim, addr=0x1000 + i * block)
+                self.assert_resp(await self.m.accept_res.call(sim))
+            await self.tick(sim, 20)
+            assert list(self.bus_requests) == [0x1000 + (stream_blocks + i) * block for i in range(1, stream_blocks)]
+            self.bus_requests.clear()
+
+            # A jump discards the stream
+            self.issued_requests.append(0x2000)
+            await self.m.issue_req.call(sim, addr=0x2000)
+            self.assert_resp(await self.m.accept_res.call(sim))
+            await self.tick(sim, 20)
+            assert list(self.bus_requests) == [0x2000 + i * block for i in range(stream_blocks + 1)]
+            self.bus_requests.clear()
+
+            # So does a flush
+            await self.m.flush.call(sim)
+            self.issued_requests.append(0x2000 + block)
+            await self.m.issue_req.call(sim, addr=0x2000 + block)
+            self.assert_resp(await self.m.accept_res.call(sim))
+            assert self.bus_requests[0] == 0x2000 + block
+
+        with self.run_simulation(self.m) as sim:
+            sim.add_testbench(self.bus_requester, background=True)
+            sim.add_testbench(self.bus_responder, background=True)
+            sim.add_testbench(user_process)
+
+    def test_random(self):
+        iterations = 500
+
+        async def sender(sim: TestbenchContext):
+            addr = 0
+            for _ in range(iterations):
+                if random.random() < 0.1:
+                    addr = random.randrange(0, 2**self.gen_params.isa.xlen, self.cp.fetch_block_bytes)
+                    if random.random() < 0.2:
+                        self.bad_addrs.add(addr)
+                else:
+                    addr = (addr + self.cp.fetch_block_bytes) % 2**self.gen_params.isa.xlen
+
+                if random.random() < 0.05:
+                    await self.m.flush.call(sim)
+
+                self.issued_requests.append(addr)
+                await self.m.issue_req.call(sim, addr=addr)
+                await self.random_wait_geom(sim, 0.5)
+
+        async def receiver(sim: TestbenchContext):
+            for _ in range(iterations):
+                while not self.issued_requests:
+                    await sim.tick()
+
+                self.assert_resp(await self.m.accept_res.call(sim))
+                await self.random_wait_geom(sim, 0.3)
+
+        with self.run_simulation(self.m) as sim:
+            sim.add_testbench(self.bus_requester, background=True)
+            sim.add_testbench(self.bus_responder, background=True)
+            sim.add_testbench(sender)
+            sim.add_testbench(receiver)
+
+
 class MockedCacheRefiller(Elaboratable, CacheRefillerInterface):
     def __init__(self, gen_params: GenParams):
         layouts = gen_params.get(ICacheLayouts)
@@ -306,7 +455,7 @@ class TestICache(TestCaseWithSimulator):
 
         self.mem = dict()
         self.bad_addrs = set()
-        self.bad_cache_lines = set()
+        self.bad_fetch_blocks = set()
         self.refill_requests = deque()
         self.refill_block_cnt = 0
         self.issued_requests = deque()
@@ -314,10 +463,12 @@ class TestICache(TestCaseWithSimulator):
         self.accept_refill_request = True
 
         self.refill_in_fly = False
+        self.refill_paused = False
+        self.pause_refill_after: Optional[int] = None
         self.refill_word_cnt = 0
         self.refill_addr = 0
 
-    def init_module(self, ways, sets) -> None:
+    def init_module(self, ways, sets, prefetch_lines=0, replacement=ICacheReplacementPolicy.PLRU) -> None:
         self.gen_params = GenParams(
             test_core_config.replace(
                 xlen=self.isa_xlen,
@@ -325,6 +476,8 @@ class TestICache(TestCaseWithSimulator):
                 icache_sets_bits=exact_log2(sets),
                 icache_line_bytes_log=self.line_size,
                 fetch_block_bytes_log=self.fetch_block,
+                icache_prefetch_lines=prefetch_lines,
+                icache_replacement=replacement,
             )
         )
         self.cp = self.gen_params.icache_params
@@ -340,11 +493,14 @@ class TestICache(TestCaseWithSimulator):
             self.refill_addr = addr
 
     def enen(self):
-        return self.refill_in_fly
+        return self.refill_in_fly and not self.refill_paused
 
     @def_method_mock(lambda self: self.m.refiller.accept_refill_mock, enable=enen)
     def accept_refill_mock(self):
-        addr = self.refill_addr + self.refill_block_cnt * self.cp.fetch_block_bytes
+        line_addr = self.refill_addr & ~(self.cp.line_size_bytes - 1)
+        addr = (
+            line_addr + (self.refill_addr + self.refill_block_cnt * self.cp.fetch_block_bytes) % self.cp.line_size_bytes
+        )
 
         fetch_block = 0
         bad_addr = False
@@ -358,6 +514,8 @@ class TestICache(TestCaseWithSimulator):
         @MethodMock.effect
         def eff():
             self.refill_block_cnt += 1
+            if self.refill_block_cnt == self.pause_refill_after:
+                self.refill_paused = True
 
             if last:
                 self.refill_in_fly = False
@@ -376,7 +534,7 @@ class TestICache(TestCaseWithSimulator):
 
     def add_bad_addr(self, addr: int):
         self.bad_addrs.add(addr)
-        self.bad_cache_lines.add(addr & ~((1 << self.cp.offset_bits) - 1))
+        self.bad_fetch_blocks.add(addr & ~(self.cp.fetch_block_bytes - 1))
 
     async def send_req(self, sim: TestbenchContext, addr: int):
         self.issued_requests.append(addr)
@@ -393,7 +551,8 @@ class TestICache(TestCaseWithSimulator):
     def assert_resp(self, resp: MethodData):
         addr = self.issued_requests.popleft() & ~(self.cp.fetch_block_bytes - 1)
 
-        if (addr & ~((1 << self.cp.offset_bits) - 1)) in self.bad_cache_lines:
+        # A line with an error isn't cached, so only the fetch block which caused the refill can fail
+        if addr in self.bad_fetch_blocks:
             assert resp["error"]
         else:
             assert not resp["error"]
@@ -404,7 +563,8 @@ class TestICache(TestCaseWithSimulator):
             assert resp["fetch_block"] == fetch_block
 
     def expect_refill(self, addr: int):
-        assert self.refill_requests.popleft() == addr
+        # The refill starts from the fetch block which missed
+        assert self.refill_requests.popleft() == addr & ~(self.cp.fetch_block_bytes - 1)
 
     async def call_cache(self, sim: TestbenchContext, addr: int):
         await self.send_req(sim, addr)
@@ -418,7 +578,7 @@ class TestICache(TestCaseWithSimulator):
         async def cache_user_process(sim: TestbenchContext):
             # The first request should cause a cache miss
             await self.call_cache(sim, 0x00010004)
-            self.expect_refill(0x00010000)
+            self.expect_refill(0x00010004)
 
             # Accesses to the same cache line shouldn't cause a cache miss
             for i in range(self.cp.fetch_blocks_in_line):
@@ -467,6 +627,98 @@ class TestICache(TestCaseWithSimulator):
         with self.run_simulation(self.m) as sim:
             sim.add_testbench(cache_process)
 
+    @pytest.mark.parametrize(
+        "replacement, evicted",
+        [
+            (ICacheReplacementPolicy.ROUND_ROBIN, 0),
+            (ICacheReplacementPolicy.PLRU, 3),
+            (ICacheReplacementPolicy.LRU, 3),
+        ],
+    )
+    def test_replacement(self, replacement: ICacheReplacementPolicy, evicted: int):
+        self.init_module(4, 4, replacement=replacement)
+
+        # Lines mapped to the same set
+        lines = [i * 0x00010000 for i in range(5)]
+
+        async def cache_process(sim: TestbenchContext):
+            for addr in lines[:4]:
+                await self.call_cache(sim, addr)
+                self.expect_refill(addr)
+
+            # Use all lines except the last one
+            for addr in lines[:3]:
+                await self.call_cache(sim, addr)
+            assert len(self.refill_requests) == 0
+
+            await self.call_cache(sim, lines[4])
+            self.expect_refill(lines[4])
+
+            for i, addr in enumerate(lines):
+                if i != evicted:
+                    await self.call_cache(sim, addr)
+            assert len(self.refill_requests) == 0
+
+            await self.call_cache(sim, lines[evicted])
+            self.expect_refill(lines[evicted])
+
+        with self.run_simulation(self.m) as sim:
+            sim.add_testbench(cache_process)
+
+    def test_early_restart(self):
+        self.init_module(1, 4)
+
+        async def cache_process(sim: TestbenchContext):
+            # Miss on the last fetch block of the line - the refill starts from it, and it is
+            # returned before the rest of the line is refilled
+            addr = 0x00010000 + self.cp.line_size_bytes - self.cp.fetch_block_bytes
+            await self.call_cache(sim, addr)
+            self.expect_refill(addr)
+            assert self.refill_in_fly == (self.cp.fetch_blocks_in_line > 1)
+
+            # The rest of the line is in the cache after the refill
+            for i in range(self.cp.fetch_blocks_in_line):
+                await self.call_cache(sim, 0x00010000 + i * self.cp.fetch_block_bytes)
+            assert len(self.refill_requests) == 0
+
+        with self.run_simulation(self.m) as sim:
+            sim.add_testbench(cache_process)
+
+    def test_hit_under_miss(self):
+        self.init_module(2, 4)
+
+        async def cache_process(sim: TestbenchContext):
+            await self.call_cache(sim, 0x00010000)
+            self.expect_refill(0x00010000)
+            while self.refill_in_fly:
+                await sim.tick()
+
+            # Stop the refill of a line in the same set after the fetch block which missed
+            self.pause_refill_after = 1
+            await self.call_cache(sim, 0x00020000)
+            self.expect_refill(0x00020000)
+            assert self.refill_in_fly == (self.cp.fetch_blocks_in_line > 1)
+
+            # Requests to the other line and to the arrived fetch block are served during the refill
+            for i in range(self.cp.fetch_blocks_in_line):
+                await self.call_cache(sim, 0x00010000 + i * self.cp.fetch_block_bytes)
+            await self.call_cache(sim, 0x00020000)
+            assert len(self.refill_requests) == 0
+
+            if self.cp.fetch_blocks_in_line > 1:
+                # A fetch block which didn't arrive yet waits for the refill
+                await self.send_req(sim, 0x00020000 + self.cp.fetch_block_bytes)
+                for _ in range(5):
+                    assert await self.m.accept_res.call_try(sim) is None
+
+                self.pause_refill_after = None
+                self.refill_paused = False
+                self.assert_resp(await self.m.accept_res.call(sim))
+                assert len(self.refill_requests) == 0
+
+        with self.run_simulation(self.m) as sim:
+            sim.add_testbench(cache_process)
+
     # Tests whether the cache is fully pipelined and the latency between requests and response is exactly one cycle.
     def test_pipeline(self):
         self.init_module(2, 4)
@@ -520,16 +772,15 @@ class TestICache(TestCaseWithSimulator):
 
             await self.tick(sim, 4)
 
-            # Schedule two requests, the first one causing a cache miss
+            # Schedule two requests, the first one causing a cache miss.
+            # The second one is looked up when the refill is finished.
             await self.send_req(sim, addr=0x00020000)
             await self.send_req(sim, addr=0x00010000 + self.cp.line_size_bytes)
 
             self.m.accept_res.enable(sim)
 
             await self.expect_resp(sim, wait=True)
-            await self.expect_resp(
-                sim,
-            )
+            await self.expect_resp(sim, wait=True)
             self.m.accept_res.disable(sim)
 
             await self.tick(sim, 2)
@@ -599,6 +850,11 @@ class TestICache(TestCaseWithSimulator):
             await self.call_cache(sim, 0x00010000)
             self.expect_refill(0x00010000)
 
+            # The response was returned before the end of the refill
+            while self.refill_in_fly:
+                await sim.tick()
+            await sim.tick()
+
             # Try to execute issue_req and flush_cache methods at the same time
             self.issued_requests.append(0x00010000)
             issue_req_res, flush_cache_res = (
@@ -636,6 +892,80 @@ class TestICache(TestCaseWithSimulator):
         with self.run_simulation(self.m) as sim:
             sim.add_testbench(cache_process)
 
+    def test_prefetch(self):
+        self.init_module(2, 4, prefetch_lines=2)
+
+        lines = 2 * self.cp.num_of_sets
+
+        async def cache_process(sim: TestbenchContext):
+            # Sequential code - after two misses to consecutive lines, the next lines are prefetched
+            for addr in range(0, lines * self.cp.line_size_bytes, self.cp.fetch_block_bytes):
+                await self.call_cache(sim, addr)
+
+            for _ in range(10 * self.cp.fetch_blocks_in_line):
+                await sim.tick()
+
+            # Every line was refilled once, and the refills continued past the end of the stream
+            requests = list(self.refill_requests)
+            assert requests == [i * self.cp.line_size_bytes for i in range(len(requests))]
+            assert len(requests) == lines + 2
+            self.refill_requests.clear()
+
+            # Prefetched lines which weren't used are dropped on flush
+            await self.m.flush_cache.call(sim)
+            self.mem.clear()
+
+            addr = lines * self.cp.line_size_bytes
+            await self.call_cache(sim, addr)
+            self.expect_refill(addr)
+
+            # A jump doesn't start prefetching
+            while self.refill_in_fly:
+                await sim.tick()
+            await self.call_cache(sim, 0x00010000)
+            self.expect_refill(0x00010000)
+            for _ in range(10):
+                await sim.tick()
+            assert len(self.refill_requests) == 0
+
+        with self.run_simulation(self.m) as sim:
+            sim.add_testbench(cache_process)
+
+    def test_prefetch_random(self):
+        self.init_module(2, 4, prefetch_lines=2)
+
+        max_addr = 16 * self.cp.line_size_bytes * self.cp.num_of_sets
+        iterations = 1000
+
+        for i in range(0, max_addr, 4):
+            if random.random() < 0.02:
+                self.add_bad_addr(i)
+
+        async def sender(sim: TestbenchContext):
+            addr = 0
+            for _ in range(iterations):
+                # Mostly sequential code, with occasional jumps and flushes
+                if random.random() < 0.1:
+                    addr = random.randrange(0, max_addr, 4)
+                else:
+                    addr = (addr + self.cp.fetch_block_bytes) % max_addr
+                if random.random() < 0.02:
+                    await self.m.flush_cache.call(sim)
+                await self.send_req(sim, addr)
+                await self.random_wait_geom(sim, 0.5)
+
+        async def receiver(sim: TestbenchContext):
+            for _ in range(iterations):
+                while len(self.issued_requests) == 0:
+                    await sim.tick()
+
+                self.assert_resp(await self.m.accept_res.call(sim))
+                await self.random_wait_geom(sim, 0.2)
+
+        with self.run_simulation(self.m) as sim:
+            sim.add_testbench(sender)
+            sim.add_testbench(receiver)
+
     def test_errors(self):
         self.init_module(1, 4)
 
@@ -647,17 +977,22 @@ class TestICache(TestCaseWithSimulator):
             )  # Bad addr at the end of the line
 
             await self.call_cache(sim, 0x00010008)
-            self.expect_refill(0x00010000)
+            self.expect_refill(0x00010008)
+
+            # Fetch blocks which arrived before the error can be served until the refill ends
+            while self.refill_in_fly:
+                await sim.tick()
+            await sim.tick()
 
             # Requesting a bad addr again should retrigger refill
             await self.call_cache(sim, 0x00010008)
-            self.expect_refill(0x00010000)
+            self.expect_refill(0x00010008)
 
             await self.call_cache(sim, 0x00020000)
             self.expect_refill(0x00020000)
 
             await self.call_cache(sim, 0x00030008)
-            self.expect_refill(0x00030000)
+            self.expect_refill(0x00030008)
 
             # Test how pipelining works with errors
 
@@ -0,0 +1,157 @@
+import pytest
+import random
+from parameterized import parameterized_class
+
+from transactron.testing import TestCaseWithSimulator, SimpleTestCircuit, TestbenchContext
+
+from coreblocks.frontend.branch_prediction.btb import BranchTargetBuffer
+from coreblocks.frontend.branch_prediction.jump_targets import PendingJumpTargets
+from coreblocks.arch import CfiType
+from coreblocks.params import *
+from coreblocks.params.configurations import test_core_config
+
+
+@parameterized_class(
+    ("name", "fetch_block_log", "with_rvc", "ways"),
+    [
+        ("block4B", 2, False, 2),
+        ("block4B_rvc", 2, True, 1),
+        ("block16B_rvc", 4, True, 4),
+    ],
+)
+class TestBranchTargetBuffer(TestCaseWithSimulator):
+    fetch_block_log: int
+    with_rvc: bool
+    ways: int
+
+    @pytest.fixture(autouse=True)
+    def setup(self, fixture_initialize_testing_env):
+        self.gen_params = GenParams(
+            test_core_config.replace(
+                compressed=self.with_rvc,
+                fetch_block_bytes_log=self.fetch_block_log,
+                bpu_btb_ways=self.ways,
+                bpu_btb_sets_bits=2,
+            )
+        )
+        self.m = SimpleTestCircuit(BranchTargetBuffer(self.gen_params))
+
+        # Each set is a list of ways holding (fb_addr, slot, cfi_type, target) or None.
+        self.sets: list[list[tuple[int, int, CfiType, int] | None]] = [
+            [None] * self.ways for _ in range(2**self.gen_params.bpu_params.btb_sets_bits)
+        ]
+        self.way_selector = 0
+
+        random.seed(42)
+
+    def update(self, pc: int, target: int, cfi_type: CfiType, rvc: bool, taken: bool):
+        fb_addr = pc >> self.gen_params.fetch_block_bytes_log
+        slot = (pc % self.gen_params.fetch_block_bytes) >> self.gen_params.min_instr_width_bytes_log
+
+        if not taken or (self.with_rvc and not rvc and slot == self.gen_params.fetch_width - 1):
+            return
+
+        entries = self.sets[fb_addr % len(self.sets)]
+        for way, entry in enumerate(entries):
+            if entry is not None and entry[0] == fb_addr and entry[1] == slot:
+                entries[way] = (fb_addr, slot, cfi_type, target)
+                return
+
+        entries[self.way_selector] = (fb_addr, slot, cfi_type, target)
+        self.way_selector = (self.way_selector + 1) % self.ways
+
+    def test_random(self):
+        async def proc(sim: TestbenchContext):
+            instr_width = self.gen_params.min_instr_width_bytes
+            pcs = [random.randrange(2**12) & ~(instr_width - 1) for _ in range(16)]
+
+            for _ in range(400):
+                if random.random() < 0.5:
+                    fb_addr = random.choice(pcs) >> self.gen_params.fetch_block_bytes_log
+                    res = await self.m.predict.call(sim, fb_addr=fb_addr)
+
+                    expected = {}
+                    for entry in self.sets[fb_addr % len(self.sets)]:
+                        if entry is not None and entry[0] == fb_addr:
+                            expected[entry[1]] = entry
+
+                    for i in range(self.gen_params.fetch_width):
+                        assert ((res.hit >> i) & 1) == (i in expected)
+                        if i in expected:
+                            assert res.cfi_types[i] == expected[i][2]
+                            assert res.targets[i] == expected[i][3]
+                else:
+                    pc = random.choice(pcs)
+                    target = random.randrange(2**12) & ~(instr_width - 1)
+                    cfi_type = random.choice([CfiType.BRANCH, CfiType.JAL, CfiType.JALR])
+                    rvc = self.with_rvc and random.random() < 0.5
+                    taken = random.random() < 0.8
+                    await self.m.update.call(
+                        sim,
+                        from_pc=pc,
+                        next_pc=target,
+                        cfi_type=cfi_type,
+                        rvc=rvc,
+                        taken=taken,
+                        misprediction=0,
+                    )
+                    self.update(pc, target, cfi_type, rvc, taken)
+
+        with self.run_simulation(self.m) as sim:
+            sim.add_testbench(proc)
+
+
+class TestPendingJumpTargets(TestCaseWithSimulator):
+    @pytest.fixture(autouse=True)
+    def setup(self, fixture_initialize_testing_env):
+        self.gen_params = GenParams(test_core_config)
+        self.m = SimpleTestCircuit(PendingJumpTargets(self.gen_params))
+        self.depth = self.gen_params.bpu_params.jump_targets_depth
+
+    def test_simple(self):
+        async def proc(sim: TestbenchContext):
+            # Two instances of the same jump with different targets
+            idx0 = (await self.m.insert.call(sim, pc=0x100, cfi_target=0x200)).jump_target_idx
+            idx1 = (await self.m.insert.call(sim, pc=0x100, cfi_target=0x300)).jump_target_idx
+            assert idx0 != idx1
+
+            for i in range(self.depth - 2):
+                await self.m.insert.call(sim, pc=0x104 + 4 * i, cfi_target=0x400)
+
+            # There is no free entry left
+            assert await self.m.insert.call_try(sim, pc=0x108, cfi_target=0x400) is None
+
+            res = await self.m.get.call(sim, pc=0x100, jump_target_idx=idx1)
+            assert res.valid and res.cfi_target == 0x300
+
+            # The entry was freed
+            res = await self.m.get.call(sim, pc=0x100, jump_target_idx=idx1)
+            assert not res.valid
+
+            # The entry holds a different jump
+            res = await self.m.get.call(sim, pc=0x104, jump_target_idx=idx0)
+            assert not res.valid
+
+            idx1 = (await self.m.insert.call(sim, pc=0x100, cfi_target=0x300)).jump_target_idx
+            await self.m.clear.call(sim)
+            res = await self.m.get.call(sim, pc=0x100, jump_target_idx=idx1)
+            assert not res.valid
+
+        with self.run_simulation(self.m) as sim:
+            sim.add_testbench(proc)
+
+    def test_rollback(self):
+        async def proc(sim: TestbenchContext):
+            idx0 = (await self.m.insert.call(sim, pc=0x100, cfi_target=0x200)).jump_target_idx
+            idx1 = (await self.m.insert.call(sim, pc=0x104, cfi_target=0x300)).jump_target_idx
+            await self.m.dispatch.call(sim, jump_target_idx=idx0)
+
+            # Only the jump which left the frontend keeps its target
+            await self.m.rollback.call(sim)
+            res = await self.m.get.call(sim, pc=0x104, jump_target_idx=idx1)
+            assert not res.valid
+            res = await self.m.get.call(sim, pc=0x100, jump_target_idx=idx0)
+            assert res.valid and res.cfi_target == 0x200
+
+        with self.run_simulation(self.m) as sim:
+            sim.add_testbench(proc)
@@ -0,0 +1,118 @@
+import pytest
+import random
+from parameterized import parameterized_class
+
+from transactron.testing import TestCaseWithSimulator, SimpleTestCircuit, TestbenchContext
+
+from coreblocks.frontend.branch_prediction.direction import DirectionPredictor
+from coreblocks.arch import CfiType
+from coreblocks.params import *
+from coreblocks.params.configurations import test_core_config
+
+
+@parameterized_class(
+    ("name", "direction", "fetch_block_log", "with_rvc"),
+    [
+        ("bimodal", DirectionPredictorType.BIMODAL, 2, False),
+        ("bimodal_block8B_rvc", DirectionPredictorType.BIMODAL, 3, True),
+        ("gshare", DirectionPredictorType.GSHARE, 2, False),
+        ("gshare_block16B", DirectionPredictorType.GSHARE, 4, False),
+    ],
+)
+class TestDirectionPredictor(TestCaseWithSimulator):
+    direction: DirectionPredictorType
+    fetch_block_log: int
+    with_rvc: bool
+
+    @pytest.fixture(autouse=True)
+    def setup(self, fixture_initialize_testing_env):
+        self.gen_params = GenParams(
+            test_core_config.replace(
+                compressed=self.with_rvc,
+                fetch_block_bytes_log=self.fetch_block_log,
+                bpu_direction=self.direction,
+                bpu_table_bits=4,
+                bpu_history_bits=3,
+            )
+        )
+        self.params = self.gen_params.bpu_params
+        self.m = SimpleTestCircuit(DirectionPredictor(self.gen_params))
+
+        # None denotes an entry which wasn't trained yet.
+        self.counters: list[list[int | None]] = [
+            [None] * self.gen_params.fetch_width for _ in range(self.params.table_size)
+        ]
+        self.spec_history = 0
+        self.history = 0
+
+        random.seed(42)
+
+    def index(self, fb_addr: int, history: int) -> int:
+        return (fb_addr ^ history) % self.params.table_size
+
+    def next_history(self, fb_addr: int, history: int) -> int:
+        return ((history << 1) ^ fb_addr) % 2**self.params.history_bits
+
+    def train(self, pc: int, cfi_type: CfiType, taken: bool, misprediction: bool):
+        fb_addr = pc >> self.gen_params.fetch_block_bytes_log
+        slot = (pc % self.gen_params.fetch_block_bytes) >> self.gen_params.min_instr_width_bytes_log
+
+        if cfi_type != CfiType.BRANCH:
+            if misprediction:
+                self.spec_history = self.history
+            return
+
+        row = self.counters[self.index(fb_addr, self.history)]
+        counter = row[slot]
+        if counter is None:
+            row[slot] = 0b10 if taken else 0b01
+        else:
+            row[slot] = min(counter + 1, 3) if taken else max(counter - 1, 0)
+
+        if taken:
+            self.history = self.next_history(fb_addr, self.history)
+        if misprediction:
+            self.spec_history = self.history
+
+    def test_random(self):
+        async def proc(sim: TestbenchContext):
+            # Use a small set of branches, so that they are trained many times.
+            pcs = [random.randrange(2**10) & ~(self.gen_params.min_instr_width_bytes - 1) for _ in range(8)]
+
+            for _ in range(500):
+                op = random.randrange(5)
+                if op == 0:
+                    fb_addr = random.choice(pcs) >> self.gen_params.fetch_block_bytes_log
+                    res = await self.m.predict.call(sim, fb_addr=fb_addr)
+                    assert res.history == self.spec_history
+                    row = self.counters[self.index(fb_addr, self.spec_history)]
+                    for i, counter in enumerate(row):
+                        assert ((res.known >> i) & 1) == (counter is not None)
+                        if counter is not None:
+                            assert ((res.taken >> i) & 1) == counter >> 1
+                elif op == 1:
+                    pc = random.choice(pcs)
+                    cfi_type = random.choice([CfiType.BRANCH] * 4 + [CfiType.JAL, CfiType.JALR])
+                    taken = random.random() < 0.7
+                    misprediction = random.random() < 0.2
+                    await self.m.train.call(
+                        sim, from_pc=pc, next_pc=0, cfi_type=cfi_type, rvc=0, taken=taken, misprediction=misprediction
+                    )
+                    self.train(pc, cfi_type, taken, misprediction)
+                elif op == 2:
+                    fb_addr = random.choice(pcs) >> self.gen_params.fetch_block_bytes_log
+                    await self.m.update_history.call(sim, fb_addr=fb_addr)
+                    if self.params.history_bits:
+                        self.spec_history = self.next_history(fb_addr, self.spec_history)
+                elif op == 3:
+                    fb_addr = random.choice(pcs) >> self.gen_params.fetch_block_bytes_log
+                    history = random.randrange(2**self.params.history_bits)
+                    taken = random.random() < 0.5
+                    await self.m.set_history.call(sim, history=history, fb_addr=fb_addr, taken=taken)
+                    self.spec_history = self.next_history(fb_addr, history) if taken else history
+                else:
+                    await self.m.restore.call(sim)
+                    self.spec_history = self.history
+
+        with self.run_simulation(self.m) as sim:
+            sim.add_testbench(proc)
@@ -101,6 +101,7 @@ class TestFetchUnit(TestCaseWithSimulator):
         self.input_q = deque()
         self.output_q = deque()
         self.stalled = False
+        self.return_addrs = []
 
         random.seed(41)
 
@@ -151,6 +152,20 @@ class TestFetchUnit(TestCaseWithSimulator):
 
         return self.add_instr(data, True, jump_offset=offset, branch_taken=taken)
 
+    def gen_call(self, offset: int) -> int:
+        data = JTypeInstr(opcode=Opcode.JAL, rd=Registers.X1, imm=offset).encode()
+        self.return_addrs.append(self.pc + 4)
+
+        return self.add_instr(data, True, jump_offset=offset, branch_taken=True)
+
+    def gen_ret(self) -> int:
+        data = ITypeInstr(opcode=Opcode.JALR, funct3=Funct3.JALR, rd=Registers.X0, rs1=Registers.X1, imm=0).encode()
+
+        instr_pc = self.add_instr(data, True, jump_offset=self.return_addrs.pop() - self.pc, branch_taken=True)
+        self.instr_queue[-1]["predicted_target"] = True
+
+        return instr_pc
+
     async def cache_process(self, sim: ProcessContext):
         while True:
             while len(self.input_q) == 0:
@@ -219,6 +234,13 @@ class TestFetchUnit(TestCaseWithSimulator):
             if (instr_data & 0b11) == 0b11:
                 assert v["instr"] == instr_data
 
+            if instr.get("predicted_target", False):
+                # The jump-branch unit would verify the target predicted by the fetch unit
+                res = await self.fetch.predicted_jump_target.call(
+                    sim, pc=instr["pc"], jump_target_idx=v["jump_target_idx"]
+                )
+                assert res.valid and res.cfi_target == instr["next_pc"]
+
             if (instr["jumps"] and (instr["branch_taken"] != v["predicted_taken"])) or access_fault:
                 await self.random_wait(sim, 5)
                 self.stalled = True
@@ -383,6 +405,24 @@ class TestFetchUnit(TestCaseWithSimulator):
 
         self.run_sim()
 
+    def test_calls(self):
+        # Nested calls, each function is placed far from its caller
+        for depth in range(3):
+            self.gen_non_branch_instr(rvc=False)
+            self.gen_call(0x400 * (depth + 1))
+
+        for _ in range(3):
+            self.gen_non_branch_instr(rvc=False)
+            self.gen_ret()
+
+        # A function consisting of just a return
+        self.gen_call(2 * self.gen_params.fetch_block_bytes)
+        self.gen_ret()
+
+        self.gen_non_branch_instr(rvc=False)
+
+        self.run_sim()
+
     def test_access_fault(self):
         for _ in range(self.gen_params.fetch_width):
             self.gen_non_branch_instr(rvc=False)
@@ -470,12 +510,13 @@ class TestPredictionChecker(TestCaseWithSimulator):
         cfi_type: CfiType,
         cfi_target: Optional[int],
         valid_mask: int = -1,
+        ret_target: Optional[int] = None,
     ) -> CheckerResult:
         # Fill the array with non-CFI instructions
         for _ in range(self.gen_params.fetch_width - len(predecoded)):
             predecoded.append((CfiType.INVALID, 0))
         predecoded_raw = [
-            {"cfi_type": predecoded[i][0], "cfi_offset": predecoded[i][1], "unsafe": 0}
+            {"cfi_type": predecoded[i][0], "cfi_offset": predecoded[i][1], "cfi_link": 0, "unsafe": 0}
             for i in range(self.gen_params.fetch_width)
         ]
 
@@ -500,6 +541,8 @@ class TestPredictionChecker(TestCaseWithSimulator):
             instr_valid=instr_valid,
             predecoded=predecoded_raw,
             prediction=prediction,
+            ret_target=ret_target or 0,
+            ret_target_valid=1 if ret_target is not None else 0,
         )
 
         return CheckerResult(
@@ -887,3 +930,30 @@ class TestPredictionChecker(TestCaseWithSimulator):
 
         with self.run_simulation(self.m) as sim:
             sim.add_testbench(proc)
+
+    def test_return_prediction(self):
+        async def proc(sim: TestbenchContext):
+            # A return without a target from the return address stack stalls the frontend
+            ret = await self.check(sim, 0x100, False, [(CfiType.RET, 0)], 0, 0, CfiType.INVALID, None)
+            self.assert_resp(ret, mispredicted=True, stall=True, fb_instr_idx=0)
+
+            # An unpredicted return is redirected to the top of the return address stack
+            ret = await self.check(sim, 0x100, False, [(CfiType.RET, 0)], 0, 0, CfiType.INVALID, None, ret_target=0x240)
+            self.assert_resp(ret, mispredicted=True, stall=False, fb_instr_idx=0, redirect_target=0x240)
+
+            # A return predicted with the same target
+            ret = await self.check(sim, 0x100, False, [(CfiType.RET, 0)], 0, 0, CfiType.JALR, 0x240, ret_target=0x240)
+            self.assert_resp(ret, mispredicted=False)
+
+            # A return predicted with a different target
+            ret = await self.check(sim, 0x100, False, [(CfiType.RET, 0)], 0, 0, CfiType.JALR, 0x300, ret_target=0x240)
+            self.assert_resp(ret, mispredicted=True, stall=False, fb_instr_idx=0, redirect_target=0x240)
+
+            # Other indirect jumps still stall the frontend
+            ret = await self.check(
+                sim, 0x100, False, [(CfiType.JALR, 0)], 0, 0, CfiType.INVALID, None, ret_target=0x240
+            )
+            self.assert_resp(ret, mispredicted=True, stall=True, fb_instr_idx=0)
+
+        with self.run_simulation(self.m) as sim:
+            sim.add_testbench(proc)
@@ -0,0 +1,47 @@
+import pytest
+import random
+
+from transactron.testing import TestCaseWithSimulator, SimpleTestCircuit, TestbenchContext
+
+from coreblocks.frontend.branch_prediction.ras import ReturnAddressStack
+from coreblocks.params import *
+from coreblocks.params.configurations import test_core_config
+
+
+class TestReturnAddressStack(TestCaseWithSimulator):
+    @pytest.fixture(autouse=True)
+    def setup(self, fixture_initialize_testing_env):
+        self.gen_params = GenParams(test_core_config.replace(bpu_ras_depth_bits=2))
+        self.m = SimpleTestCircuit(ReturnAddressStack(self.gen_params))
+
+        self.depth = self.gen_params.bpu_params.ras_depth
+        self.entries = [0] * self.depth
+        self.tos = 0
+
+        random.seed(42)
+
+    def test_random(self):
+        async def proc(sim: TestbenchContext):
+            for _ in range(300):
+                res = await self.m.peek.call(sim)
+                assert res.ras_tos == self.tos
+                assert res.cfi_target == self.entries[self.tos]
+
+                if random.random() < 0.7:
+                    push = random.random() < 0.6
+                    pop = random.random() < 0.5
+                    target = random.randrange(2**self.gen_params.isa.xlen) & ~1
+                    await self.m.update.call(sim, push=push, pop=pop, cfi_target=target)
+
+                    if pop:
+                        self.tos = (self.tos - 1) % self.depth
+                    if push:
+                        self.tos = (self.tos + 1) % self.depth
+                        self.entries[self.tos] = target
+                else:
+                    tos = random.randrange(self.depth)
+                    await self.m.repair.call(sim, ras_tos=tos)
+                    self.tos = tos
+
+        with self.run_simulation(self.m) as sim:
+            sim.add_testbench(proc)
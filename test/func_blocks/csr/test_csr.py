@@ -227,7 +227,7 @@ class TestCSRUnit(TestCaseWithSimulator):
             assert report is not None
             report_dict = data_const_to_dict(report)
             report_dict.pop("mtval")  # mtval tested in mtval.asm test
-            assert {"rob_id": rob_id, "cause": ExceptionCause.ILLEGAL_INSTRUCTION, "pc": 0} == report_dict
+            assert {"rob_id": rob_id, "cause": ExceptionCause.ILLEGAL_INSTRUCTION, "pc": 0, "tag": 0} == report_dict
 
     def test_exception(self):
         self.gen_params = GenParams(test_core_config)
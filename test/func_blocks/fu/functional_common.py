@@ -131,6 +131,7 @@ class FunctionalUnitTestCase(TestCaseWithSimulator, Generic[_T]):
             data2_is_imm = random.randint(0, 1)
             rob_id = random.randint(0, 2**self.gen_params.rob_entries_bits - 1)
             rp_dst = random.randint(0, 2**self.gen_params.phys_regs_bits - 1)
+            tag = random.randint(0, 2**self.gen_params.tag_bits - 1)
             exec_fn = self.ops[op]
             pc = random.randint(0, max_int) & ~0b11
             results = self.compute_result(data1, data2, data_imm, pc, op, self.gen_params.isa.xlen)
@@ -144,6 +145,7 @@ class FunctionalUnitTestCase(TestCaseWithSimulator, Generic[_T]):
                     "rp_dst": rp_dst,
                     "imm": data_imm if not self.zero_imm else data2 if data2_is_imm else 0,
                     "pc": pc,
+                    "tag": tag,
                 }
             )
 
@@ -156,6 +158,7 @@ class FunctionalUnitTestCase(TestCaseWithSimulator, Generic[_T]):
                         "cause": cause,
                         "pc": results.setdefault("exception_pc", pc),
                         "mtval": results.setdefault("mtval", 0),
+                        "tag": tag,
                     }
                 )
 
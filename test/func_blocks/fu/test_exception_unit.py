@@ -32,10 +32,11 @@ class TestExceptionUnit(FunctionalUnitTestCase[ExceptionUnitFn.Fn]):
                 cause = ExceptionCause.ENVIRONMENT_CALL_FROM_M
             case ExceptionUnitFn.Fn.INSTR_ACCESS_FAULT:
                 cause = ExceptionCause.INSTRUCTION_ACCESS_FAULT
-                mtval = pc
+                # the fault on the second half of the instruction is flagged in imm
+                mtval = pc + (i_imm & 0b10)
             case ExceptionUnitFn.Fn.INSTR_PAGE_FAULT:
                 cause = ExceptionCause.INSTRUCTION_PAGE_FAULT
-                mtval = pc
+                mtval = pc + (i_imm & 0b10)
             case ExceptionUnitFn.Fn.ILLEGAL_INSTRUCTION:
                 cause = ExceptionCause.ILLEGAL_INSTRUCTION
                 mtval = i_imm  # in case of illegal instruction, raw instr bits are passed in imm field
@@ -6,10 +6,10 @@ from coreblocks.params import *
 from coreblocks.func_blocks.fu.jumpbranch import JumpBranchFuncUnit, JumpBranchFn
 from transactron import Method, def_method, TModule, Transaction
 
-from coreblocks.interface.layouts import FuncUnitLayouts, JumpBranchLayouts
+from coreblocks.interface.layouts import FuncUnitLayouts, JumpBranchLayouts, RATLayouts, RetirementLayouts
 from coreblocks.func_blocks.interface.func_protocols import FuncUnit
-from coreblocks.arch import Funct3, OpType, ExceptionCause
-from coreblocks.interface.keys import PredictedJumpTargetKey
+from coreblocks.arch import Funct3, OpType, ExceptionCause, CfiType
+from coreblocks.interface.keys import ActiveTagsKey, BranchRollbackKey, CoreStateKey, PredictedJumpTargetKey
 
 from transactron.utils import signed_to_int, DependencyContext
 from transactron.lib import BasicFifo
@@ -18,15 +18,21 @@ from test.func_blocks.fu.functional_common import ExecFn, FunctionalUnitTestCase
 
 
 class JumpBranchWrapper(FuncUnit, Elaboratable):
-    def __init__(self, gen_params: GenParams, auipc_test: bool):
+    def __init__(self, gen_params: GenParams, auipc_test: bool, rollback_test: bool):
         self.gp = gen_params
         self.auipc_test = auipc_test
+        self.rollback_test = rollback_test
         layouts = gen_params.get(JumpBranchLayouts)
 
-        self.target_pred_req = Method(i=layouts.predicted_jump_target_req)
-        self.target_pred_resp = Method(o=layouts.predicted_jump_target_resp)
+        self.predicted_jump_target = Method(i=layouts.predicted_jump_target_req, o=layouts.predicted_jump_target_resp)
+        self.branch_rollback = Method(i=layouts.rollback)
+        self.get_active_tags = Method(o=gen_params.get(RATLayouts).get_active_tags_out)
+        self.core_state = Method(o=gen_params.get(RetirementLayouts).core_state)
 
-        DependencyContext.get().add_dependency(PredictedJumpTargetKey(), (self.target_pred_req, self.target_pred_resp))
+        DependencyContext.get().add_dependency(PredictedJumpTargetKey(), self.predicted_jump_target)
+        DependencyContext.get().add_dependency(BranchRollbackKey(), self.branch_rollback)
+        DependencyContext.get().add_dependency(ActiveTagsKey(), self.get_active_tags)
+        DependencyContext.get().add_dependency(CoreStateKey(), self.core_state)
 
         self.jb = JumpBranchFuncUnit(gen_params)
         self.issue = self.jb.issue
@@ -34,6 +40,7 @@ class JumpBranchWrapper(FuncUnit, Elaboratable):
             i=StructLayout(
                 gen_params.get(FuncUnitLayouts).push_result.members
                 | (gen_params.get(JumpBranchLayouts).verify_branch.members if not auipc_test else {})
+                | ({"rollback_pc": gen_params.isa.xlen} if rollback_test else {})
             )
         )
 
@@ -41,18 +48,41 @@ class JumpBranchWrapper(FuncUnit, Elaboratable):
         m = TModule()
 
         m.submodules.jb_unit = self.jb
-        m.submodules.res_fifo = res_fifo = BasicFifo(self.gp.get(FuncUnitLayouts).push_result, 2)
+        push_result_layout = self.gp.get(FuncUnitLayouts).push_result
+        m.submodules.res_fifo = res_fifo = BasicFifo(
+            StructLayout(push_result_layout.members | {"rollback_pc": self.gp.isa.xlen}), 2
+        )
 
-        self.jb.push_result.provide(res_fifo.write)
+        # The rollback has to happen in the same cycle as the result is pushed.
+        rollback_pc = Signal(self.gp.isa.xlen)
+        jb_push_result = Method(i=push_result_layout)
+        self.jb.push_result.provide(jb_push_result)
 
-        @def_method(m, self.target_pred_req)
-        def _():
-            pass
+        @def_method(m, jb_push_result)
+        def _(rob_id, result, rp_dst, exception):
+            res_fifo.write(m, rob_id=rob_id, result=result, rp_dst=rp_dst, exception=exception, rollback_pc=rollback_pc)
 
-        @def_method(m, self.target_pred_resp)
-        def _(arg):
+        @def_method(m, self.predicted_jump_target)
+        def _(pc, jump_target_idx):
             return {"valid": 0, "cfi_target": 0}
 
+        @def_method(m, self.branch_rollback)
+        def _(arg):
+            m.d.comb += rollback_pc.eq(arg.pc)
+
+        # All instructions are on the current path. Mispredictions are rolled back only if tags have checkpoints.
+        @def_method(m, self.get_active_tags, nonexclusive=True)
+        def _():
+            tags = Signal.like(self.get_active_tags.data_out)
+            m.d.av_comb += tags.active_tags.as_value().eq(-1)
+            if self.rollback_test:
+                m.d.av_comb += tags.checkpointed_tags.as_value().eq(-1)
+            return tags
+
+        @def_method(m, self.core_state, nonexclusive=True)
+        def _():
+            return {"flushing": 0}
+
         with Transaction().body(m):
             res = res_fifo.read(m)
             ret = {
@@ -66,20 +96,27 @@ class JumpBranchWrapper(FuncUnit, Elaboratable):
                 ret = ret | {
                     "next_pc": verify.next_pc,
                     "from_pc": verify.from_pc,
+                    "cfi_type": verify.cfi_type,
+                    "rvc": verify.rvc,
+                    "taken": verify.taken,
                     "misprediction": verify.misprediction,
                 }
 
+            if self.rollback_test:
+                ret = ret | {"rollback_pc": res.rollback_pc}
+
             self.push_result(m, ret)
 
         return m
 
 
 class JumpBranchWrapperComponent(FunctionalComponentParams):
-    def __init__(self, auipc_test: bool):
+    def __init__(self, auipc_test: bool, rollback_test: bool = False):
         self.auipc_test = auipc_test
+        self.rollback_test = rollback_test
 
     def get_module(self, gen_params: GenParams) -> FuncUnit:
-        return JumpBranchWrapper(gen_params, self.auipc_test)
+        return JumpBranchWrapper(gen_params, self.auipc_test, self.rollback_test)
 
     def get_optypes(self) -> set[OpType]:
         return JumpBranchFn().get_op_types()
@@ -89,26 +126,36 @@ class JumpBranchWrapperComponent(FunctionalComponentParams):
 def compute_result(i1: int, i2: int, i_imm: int, pc: int, fn: JumpBranchFn.Fn, xlen: int) -> dict[str, int]:
     max_int = 2**xlen - 1
     branch_target = pc + signed_to_int(i_imm, xlen)
-    next_pc = 0
     res = pc + 4
 
+    taken = True
+    cfi_type = CfiType.BRANCH
+
     match fn:
         case JumpBranchFn.Fn.JAL:
-            next_pc = pc + signed_to_int(i_imm, xlen)
+            cfi_type = CfiType.JAL
         case JumpBranchFn.Fn.JALR:
-            next_pc = (i1 + signed_to_int(i_imm, xlen)) & ~0x1
+            cfi_type = CfiType.JALR
         case JumpBranchFn.Fn.BEQ:
-            next_pc = branch_target if i1 == i2 else pc + 4
+            taken = i1 == i2
         case JumpBranchFn.Fn.BNE:
-            next_pc = branch_target if i1 != i2 else pc + 4
+            taken = i1 != i2
         case JumpBranchFn.Fn.BLT:
-            next_pc = branch_target if signed_to_int(i1, xlen) < signed_to_int(i2, xlen) else pc + 4
+            taken = signed_to_int(i1, xlen) < signed_to_int(i2, xlen)
         case JumpBranchFn.Fn.BLTU:
-            next_pc = branch_target if i1 < i2 else pc + 4
+            taken = i1 < i2
         case JumpBranchFn.Fn.BGE:
-            next_pc = branch_target if signed_to_int(i1, xlen) >= signed_to_int(i2, xlen) else pc + 4
+            taken = signed_to_int(i1, xlen) >= signed_to_int(i2, xlen)
         case JumpBranchFn.Fn.BGEU:
-            next_pc = branch_target if i1 >= i2 else pc + 4
+            taken = i1 >= i2
+
+    match fn:
+        case JumpBranchFn.Fn.JAL:
+            next_pc = pc + signed_to_int(i_imm, xlen)
+        case JumpBranchFn.Fn.JALR:
+            next_pc = (i1 + signed_to_int(i_imm, xlen)) & ~0x1
+        case _:
+            next_pc = branch_target if taken else pc + 4
 
     next_pc &= max_int
     res &= max_int
@@ -125,9 +172,28 @@ def compute_result(i1: int, i2: int, i_imm: int, pc: int, fn: JumpBranchFn.Fn, x
         exception = ExceptionCause._COREBLOCKS_MISPREDICTION
         exception_pc = next_pc
 
-    return {"result": res, "from_pc": pc, "next_pc": next_pc, "misprediction": misprediction} | (
-        {"exception": exception, "exception_pc": exception_pc, "mtval": mtval} if exception is not None else {}
-    )
+    return {
+        "result": res,
+        "from_pc": pc,
+        "next_pc": next_pc,
+        "cfi_type": cfi_type,
+        "rvc": 0,
+        "taken": taken,
+        "misprediction": misprediction,
+    } | ({"exception": exception, "exception_pc": exception_pc, "mtval": mtval} if exception is not None else {})
+
+
+@staticmethod
+def compute_result_rollback(i1: int, i2: int, i_imm: int, pc: int, fn: JumpBranchFn.Fn, xlen: int) -> dict[str, int]:
+    res = compute_result(i1, i2, i_imm, pc, fn, xlen)
+
+    # Mispredictions are rolled back instead of being reported.
+    res["rollback_pc"] = 0
+    if res.get("exception") == ExceptionCause._COREBLOCKS_MISPREDICTION:
+        res["rollback_pc"] = res["next_pc"]
+        del res["exception"], res["exception_pc"], res["mtval"]
+
+    return res
 
 
 @staticmethod
@@ -168,6 +234,12 @@ ops_auipc = {
             JumpBranchWrapperComponent(auipc_test=False),
             compute_result,
         ),
+        (
+            "branches_and_jumps_rollback",
+            ops,
+            JumpBranchWrapperComponent(auipc_test=False, rollback_test=True),
+            compute_result_rollback,
+        ),
         (
             "auipc",
             ops_auipc,
@@ -140,6 +140,7 @@ class TestDummyLSULoads(TestCaseWithSimulator):
             rp_dst = random.randint(0, 2**self.gen_params.phys_regs_bits - 1)
             self.last_rob_id = (self.last_rob_id + 1) % 2**self.gen_params.rob_entries_bits
             rob_id = self.last_rob_id
+            tag = rob_id % 2**self.gen_params.tag_bits
             instr = {
                 "rp_dst": rp_dst,
                 "rob_id": rob_id,
@@ -148,6 +149,7 @@ class TestDummyLSULoads(TestCaseWithSimulator):
                 "s2_val": 0,
                 "imm": imm,
                 "pc": 0,
+                "tag": tag,
             }
             self.instr_queue.appendleft(instr)
             self.mem_data_queue.appendleft(
@@ -170,6 +172,7 @@ class TestDummyLSULoads(TestCaseWithSimulator):
                         ),
                         "pc": 0,
                         "mtval": addr,
+                        "tag": tag,
                     }
                 )
 
@@ -180,7 +183,7 @@ class TestDummyLSULoads(TestCaseWithSimulator):
     def setup_method(self) -> None:
         random.seed(14)
         self.tests_number = 100
-        self.gen_params = GenParams(test_core_config.replace(phys_regs_bits=3, rob_entries_bits=4))
+        self.gen_params = GenParams(test_core_config.replace(phys_regs_bits=3, rob_entries_bits=4, dcache_enable=False))
         self.test_module = DummyLSUTestCircuit(self.gen_params)
         self.instr_queue = deque()
         self.mem_data_queue = deque()
@@ -292,7 +295,7 @@ class TestDummyLSULoadsCycles(TestCaseWithSimulator):
 
     def setup_method(self) -> None:
         random.seed(14)
-        self.gen_params = GenParams(test_core_config.replace(phys_regs_bits=3, rob_entries_bits=3))
+        self.gen_params = GenParams(test_core_config.replace(phys_regs_bits=3, rob_entries_bits=3, dcache_enable=False))
         self.test_module = DummyLSUTestCircuit(self.gen_params)
 
     async def one_instr_test(self, sim: TestbenchContext):
@@ -371,7 +374,9 @@ class TestDummyLSUStores(TestCaseWithSimulator):
     def setup_method(self) -> None:
         random.seed(14)
         self.tests_number = 100
-        self.gen_params = GenParams(test_core_config.replace(phys_regs_bits=3, rob_entries_bits=3))
+        self.gen_params = GenParams(
+            test_core_config.replace(phys_regs_bits=3, rob_entries_bits=3, dcache_enable=False, store_buffer_depth=0)
+        )
         self.test_module = DummyLSUTestCircuit(self.gen_params)
         self.instr_queue = deque()
         self.mem_data_queue = deque()
@@ -458,7 +463,7 @@ class TestDummyLSUFence(TestCaseWithSimulator):
         await self.push_one_instr(sim, self.get_instr(load_fn))
 
     def test_fence(self):
-        self.gen_params = GenParams(test_core_config.replace(phys_regs_bits=3, rob_entries_bits=3))
+        self.gen_params = GenParams(test_core_config.replace(phys_regs_bits=3, rob_entries_bits=3, dcache_enable=False))
         self.test_module = DummyLSUTestCircuit(self.gen_params)
 
         @def_method_mock(lambda: self.test_module.exception_report)
@@ -474,7 +479,7 @@ class TestDummyLSUFence(TestCaseWithSimulator):
         pending_req = False
 
         @def_method_mock(lambda: self.test_module.bus_master_adapter.request_read_mock, enable=lambda: not pending_req)
-        def request_read(addr, sel):
+        def request_read(addr, sel, burst, wrap_log):
             @MethodMock.effect
             def eff():
                 nonlocal pending_req
@@ -0,0 +1,260 @@
+import random
+from collections import deque
+from amaranth import *
+
+from transactron.lib import Adapter, AdapterTrans
+from transactron.utils import int_to_signed, signed_to_int
+from transactron.utils.dependencies import DependencyContext
+from transactron.testing.method_mock import MethodMock
+from transactron.testing import TestbenchIO, TestCaseWithSimulator, def_method_mock, TestbenchContext
+from coreblocks.params import GenParams
+from coreblocks.func_blocks.fu.lsu.lsq import LoadStoreQueue
+from coreblocks.params.configurations import test_core_config
+from coreblocks.arch import *
+from coreblocks.interface.keys import (
+    ActiveTagsKey,
+    CoreStateKey,
+    ExceptionReportKey,
+    InstructionPrecommitKey,
+    ROBIndicesKey,
+)
+from coreblocks.interface.layouts import ExceptionRegisterLayouts, RetirementLayouts, ROBLayouts, RATLayouts
+from ...peripherals.bus_mock import BusMockParameters, MockMasterAdapter
+
+
+class LSQTestCircuit(Elaboratable):
+    def __init__(self, gen: GenParams, entries: int):
+        self.gen = gen
+        self.entries = entries
+
+    def elaborate(self, platform):
+        m = Module()
+
+        bus_mock_params = BusMockParameters(data_width=self.gen.isa.ilen, addr_width=32)
+
+        self.bus_master_adapter = MockMasterAdapter(bus_mock_params)
+
+        m.submodules.exception_report = self.exception_report = TestbenchIO(
+            Adapter(i=self.gen.get(ExceptionRegisterLayouts).report)
+        )
+
+        DependencyContext.get().add_dependency(ExceptionReportKey(), lambda: self.exception_report.adapter.iface)
+
+        layouts = self.gen.get(RetirementLayouts)
+        m.submodules.precommit = self.precommit = TestbenchIO(
+            Adapter(
+                i=layouts.precommit_in,
+                o=layouts.precommit_out,
+                nonexclusive=True,
+                combiner=lambda m, args, runs: args[0],
+            ).set(with_validate_arguments=True)
+        )
+        DependencyContext.get().add_dependency(InstructionPrecommitKey(), self.precommit.adapter.iface)
+
+        m.submodules.core_state = self.core_state = TestbenchIO(Adapter(o=layouts.core_state, nonexclusive=True))
+        DependencyContext.get().add_dependency(CoreStateKey(), self.core_state.adapter.iface)
+
+        m.submodules.rob_indices = self.rob_indices = TestbenchIO(
+            Adapter(o=self.gen.get(ROBLayouts).get_indices, nonexclusive=True)
+        )
+        DependencyContext.get().add_dependency(ROBIndicesKey(), self.rob_indices.adapter.iface)
+
+        m.submodules.active_tags = self.active_tags = TestbenchIO(
+            Adapter(o=self.gen.get(RATLayouts).get_active_tags_out, nonexclusive=True)
+        )
+        DependencyContext.get().add_dependency(ActiveTagsKey(), self.active_tags.adapter.iface)
+
+        m.submodules.func_unit = self.func_unit = func_unit = LoadStoreQueue(
+            self.gen, self.bus_master_adapter, self.entries
+        )
+
+        m.submodules.reserve_mock = self.reserve = TestbenchIO(AdapterTrans.create(func_unit.reserve))
+        m.submodules.issue_mock = self.issue = TestbenchIO(AdapterTrans.create(func_unit.issue))
+        m.submodules.push_result_mock = self.push_result = TestbenchIO(Adapter.create(func_unit.push_result))
+        m.submodules.bus_master_adapter = self.bus_master_adapter
+        return m
+
+
+class TestLoadStoreQueue(TestCaseWithSimulator):
+    ops = [
+        (OpType.LOAD, Funct3.B),
+        (OpType.LOAD, Funct3.BU),
+        (OpType.LOAD, Funct3.H),
+        (OpType.LOAD, Funct3.HU),
+        (OpType.LOAD, Funct3.W),
+        (OpType.STORE, Funct3.B),
+        (OpType.STORE, Funct3.H),
+        (OpType.STORE, Funct3.W),
+    ]
+
+    def setup_method(self) -> None:
+        random.seed(14)
+        self.tests_number = 300
+        self.gen_params = GenParams(test_core_config.replace(phys_regs_bits=5, rob_entries_bits=5, dcache_enable=False))
+        self.entries = 6
+        self.test_module = LSQTestCircuit(self.gen_params, self.entries)
+
+        self.instrs = [self.generate_instr(i) for i in range(self.tests_number)]
+
+        # Memory as seen by the bus, and by the instructions retired so far
+        self.mem: dict[int, int] = {}
+        self.ref_mem: dict[int, int] = {}
+
+        self.head = 0  # index of the oldest instruction which is not retired
+        self.reserved = 0
+        self.issued: set[int] = set()
+        self.results: dict[int, tuple[int, bool]] = {}
+        self.replays = 0
+        self.bus_reads = deque()
+        self.bus_writes = deque()
+
+    def generate_instr(self, i: int):
+        op_type, funct3 = random.choice(self.ops)
+        size = {Funct3.B: 1, Funct3.BU: 1, Funct3.H: 2, Funct3.HU: 2, Funct3.W: 4}[funct3]
+        # A small range of addresses, so that memory accesses often overlap
+        addr = random.randrange(0, 0x10, size)
+        s1_val = random.randrange(0, addr + 1, size) if random.random() < 0.5 else addr
+        return {
+            "rp_dst": (i % 31 + 1) if op_type == OpType.LOAD else 0,
+            "rob_id": i % 2**self.gen_params.rob_entries_bits,
+            "exec_fn": {"op_type": op_type, "funct3": funct3, "funct7": 0},
+            "s1_val": s1_val,
+            "s2_val": random.randrange(2**32),
+            "imm": addr - s1_val,
+            "pc": 4 * i,
+            "tag": 0,
+        }
+
+    def load_result(self, instr) -> int:
+        funct3 = instr["exec_fn"]["funct3"]
+        addr = instr["s1_val"] + instr["imm"]
+        size = {Funct3.B: 1, Funct3.BU: 1, Funct3.H: 2, Funct3.HU: 2, Funct3.W: 4}[funct3]
+        data = (self.ref_mem.get(addr & ~3, 0) >> (8 * (addr & 3))) & (2 ** (8 * size) - 1)
+        if funct3 in {Funct3.B, Funct3.H}:
+            data = int_to_signed(signed_to_int(data, 8 * size), 32)
+        return data
+
+    def apply_store(self, mem: dict[int, int], addr: int, data: int, sel: int):
+        word = mem.get(addr, 0)
+        for i in range(4):
+            if sel & (1 << i):
+                byte = 0xFF << (8 * i)
+                word = (word & ~byte) | (data & byte)
+        mem[addr] = word
+
+    async def reserver(self, sim: TestbenchContext):
+        while self.reserved < self.tests_number:
+            await self.test_module.reserve.call(sim)
+            self.reserved += 1
+            await self.random_wait_geom(sim, 0.5)
+
+    async def issuer(self, sim: TestbenchContext):
+        while len(self.issued) < self.tests_number:
+            # Instructions are issued out of order, as soon as they are put to the RS
+            waiting = [i for i in range(self.head, self.reserved) if i not in self.issued]
+            if not waiting:
+                await sim.tick()
+                continue
+            i = random.choice(waiting)
+            self.issued.add(i)
+            await self.test_module.issue.call(sim, self.instrs[i])
+            await self.random_wait_geom(sim, 0.5)
+
+    async def retirer(self, sim: TestbenchContext):
+        while self.head < self.tests_number:
+            if self.head not in self.results:
+                await sim.tick()
+                continue
+
+            instr = self.instrs[self.head]
+            result, exception = self.results.pop(self.head)
+            addr = instr["s1_val"] + instr["imm"]
+            if instr["exec_fn"]["op_type"] == OpType.LOAD:
+                if exception:
+                    # The core would execute the load again, with the same result as below
+                    self.replays += 1
+                else:
+                    assert result == self.load_result(instr)
+            else:
+                assert not exception
+                data = instr["s2_val"] << (8 * (addr & 3))
+                sel = {Funct3.B: 0x1, Funct3.H: 0x3, Funct3.W: 0xF}[instr["exec_fn"]["funct3"]] << (addr & 3)
+                self.apply_store(self.ref_mem, addr & ~3, data, sel)
+
+            self.head += 1
+            await self.random_wait_geom(sim, 0.5)
+
+    async def result_consumer(self, sim: TestbenchContext):
+        while True:
+            v = await self.test_module.push_result.call(sim)
+            i = next(i for i in range(self.head, self.reserved) if self.instrs[i]["rob_id"] == v.rob_id)
+            if i in self.results:
+                # A load marked for replay after its result was pushed
+                assert v.exception
+                self.results[i] = (self.results[i][0], True)
+            else:
+                self.results[i] = (v.result, v.exception)
+            await self.random_wait_geom(sim, 0.7)
+
+    async def bus_mock(self, sim: TestbenchContext):
+        bus = self.test_module.bus_master_adapter
+        while True:
+            req = await bus.request_read_mock.call_try(sim)
+            if req is not None:
+                await self.random_wait_geom(sim, 0.5)
+                await bus.get_read_response_mock.call(sim, data=self.mem.get(req.addr << 2, 0), err=0)
+                continue
+
+            req = await bus.request_write_mock.call_try(sim)
+            if req is not None:
+                self.apply_store(self.mem, req.addr << 2, req.data, req.sel)
+                await self.random_wait_geom(sim, 0.5)
+                await bus.get_write_response_mock.call(sim, err=0)
+
+    async def checker(self, sim: TestbenchContext):
+        while self.head < self.tests_number:
+            await sim.tick()
+        while not sim.get(self.test_module.func_unit.stores_drained.ready):
+            await sim.tick()
+        assert self.mem == self.ref_mem
+        # Loads were executed before older stores to the same bytes
+        assert 0 < self.replays < self.tests_number // 4
+
+    def test_random(self):
+        @def_method_mock(lambda: self.test_module.exception_report)
+        def exception_consumer(arg):
+            @MethodMock.effect
+            def eff():
+                instr = next(instr for instr in self.instrs[self.head :] if instr["rob_id"] == arg["rob_id"])
+                assert instr["exec_fn"]["op_type"] == OpType.LOAD
+                assert arg["cause"] == ExceptionCause._COREBLOCKS_LOAD_REPLAY
+                assert arg["pc"] == instr["pc"]
+
+        @def_method_mock(
+            lambda: self.test_module.precommit,
+            validate_arguments=lambda rob_id: rob_id == self.head % 2**self.gen_params.rob_entries_bits,
+        )
+        def precommiter(rob_id):
+            return {"side_fx": 1}
+
+        @def_method_mock(lambda: self.test_module.core_state)
+        def core_state_process():
+            return {"flushing": 0}
+
+        @def_method_mock(lambda: self.test_module.rob_indices)
+        def rob_indices_process():
+            rob_entries = 2**self.gen_params.rob_entries_bits
+            return {"start": self.head % rob_entries, "end": self.reserved % rob_entries}
+
+        @def_method_mock(lambda: self.test_module.active_tags)
+        def active_tags_process():
+            tags = 2**self.gen_params.tag_bits
+            return {"active_tags": [1] * tags, "checkpointed_tags": [0] * tags}
+
+        with self.run_simulation(self.test_module) as sim:
+            sim.add_testbench(self.bus_mock, background=True)
+            sim.add_testbench(self.result_consumer, background=True)
+            sim.add_testbench(self.reserver)
+            sim.add_testbench(self.issuer)
+            sim.add_testbench(self.retirer)
+            sim.add_testbench(self.checker)
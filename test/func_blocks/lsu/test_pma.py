@@ -121,7 +121,7 @@ class TestPMAIndirect(TestCaseWithSimulator):
             PMARegion(0x10, 0x1F, False),
             PMARegion(0x20, 0x2F, True),
         ]
-        self.gen_params = GenParams(test_core_config.replace(pma=self.pma_regions))
+        self.gen_params = GenParams(test_core_config.replace(pma=self.pma_regions, dcache_enable=False))
         self.test_module = PMAIndirectTestCircuit(self.gen_params)
         self.precommit_enabled = False
 
@@ -0,0 +1,165 @@
+import random
+from collections import deque
+
+from amaranth import *
+
+from transactron import Method, TModule
+from transactron.lib import Adapter, AdapterTrans
+from transactron.testing import TestCaseWithSimulator, TestbenchIO, TestbenchContext
+from coreblocks.params import GenParams
+from coreblocks.params.configurations import test_core_config
+from coreblocks.interface.layouts import DCacheLayouts
+from coreblocks.func_blocks.fu.lsu.store_buffer import StoreBuffer
+
+MMIO_BASE = 0xE0000000
+
+
+class DCacheMock(Elaboratable):
+    def __init__(self, gen_params: GenParams):
+        layouts = gen_params.get(DCacheLayouts)
+        self.issue_req_io = TestbenchIO(Adapter(i=layouts.issue_req))
+        self.accept_res_io = TestbenchIO(Adapter(o=layouts.accept_res))
+        self.flush_io = TestbenchIO(Adapter())
+
+        self.issue_req: Method = self.issue_req_io.adapter.iface
+        self.accept_res: Method = self.accept_res_io.adapter.iface
+        self.flush: Method = self.flush_io.adapter.iface
+
+    def elaborate(self, platform):
+        m = TModule()
+        m.submodules.issue_req = self.issue_req_io
+        m.submodules.accept_res = self.accept_res_io
+        m.submodules.flush = self.flush_io
+        return m
+
+
+class StoreBufferTestCircuit(Elaboratable):
+    def __init__(self, gen_params: GenParams, depth: int):
+        self.gen_params = gen_params
+        self.depth = depth
+
+    def elaborate(self, platform):
+        m = TModule()
+
+        m.submodules.dcache = self.dcache = DCacheMock(self.gen_params)
+        m.submodules.store_buffer = self.store_buffer = StoreBuffer(self.gen_params, self.dcache, self.depth)
+        m.submodules.issue_req = self.issue_req = TestbenchIO(AdapterTrans.create(self.store_buffer.issue_req))
+        m.submodules.accept_res = self.accept_res = TestbenchIO(AdapterTrans.create(self.store_buffer.accept_res))
+
+        return m
+
+
+class TestStoreBuffer(TestCaseWithSimulator):
+    def setup_method(self) -> None:
+        random.seed(42)
+        self.gen_params = GenParams(test_core_config)
+        self.m = StoreBufferTestCircuit(self.gen_params, 4)
+
+        # Memory as seen by the data cache, and by the requests issued so far
+        self.mem: dict[int, int] = {}
+        self.ref_mem: dict[int, int] = {}
+        self.bad_addrs = {0x40, 0x44}
+
+        self.expected = deque()
+        self.mmio_stores = deque()
+        self.mmio_stores_expected = deque()
+        self.cache_stores = 0
+        self.stores_issued = 0
+        self.requests_number = 800
+
+    def apply_store(self, mem: dict[int, int], addr: int, data: int, byte_mask: int):
+        word = mem.get(addr, 0)
+        for i in range(4):
+            if byte_mask & (1 << i):
+                byte = 0xFF << (8 * i)
+                word = (word & ~byte) | (data & byte)
+        mem[addr] = word
+
+    async def dcache_process(self, sim: TestbenchContext):
+        while True:
+            req = await self.m.dcache.issue_req_io.call(sim)
+            await self.random_wait_geom(sim, 0.5)
+
+            err = req.addr in self.bad_addrs
+            data = 0
+            if req.store:
+                self.cache_stores += 1
+                if req.addr >= MMIO_BASE:
+                    self.mmio_stores.append((req.addr, req.data, req.byte_mask))
+                elif not err:
+                    self.apply_store(self.mem, req.addr, req.data, req.byte_mask)
+            else:
+                data = self.mem.get(req.addr, 0)
+
+            await self.m.dcache.accept_res_io.call(sim, data=data, error=err)
+
+    async def issue_process(self, sim: TestbenchContext):
+        for _ in range(self.requests_number):
+            store = random.random() < 0.5
+            if random.random() < 0.05:
+                addr = MMIO_BASE + random.randrange(0, 16, 4)
+                # Done by the LSU: MMIO requests wait for the buffered stores
+                while not sim.get(self.m.store_buffer.empty):
+                    await sim.tick()
+            elif not store and random.random() < 0.05:
+                addr = random.choice(list(self.bad_addrs))
+            else:
+                # A small range of addresses, so that stores are coalesced and forwarded
+                addr = random.randrange(0, 0x20, 4)
+            data = random.randrange(2**32)
+            byte_mask = random.choice([0x1, 0x2, 0x4, 0x8, 0x3, 0xC, 0xF])
+
+            if addr >= MMIO_BASE:
+                self.expected.append((False, None))
+                if store:
+                    self.mmio_stores_expected.append((addr, data, byte_mask))
+            elif store:
+                self.apply_store(self.ref_mem, addr, data, byte_mask)
+                self.expected.append((False, None))
+            else:
+                self.expected.append((addr in self.bad_addrs, self.ref_mem.get(addr, 0)))
+
+            self.stores_issued += store
+            await self.m.issue_req.call(sim, addr=addr, data=data, byte_mask=byte_mask, store=store)
+            await self.random_wait_geom(sim, 0.7)
+
+    async def accept_process(self, sim: TestbenchContext):
+        for _ in range(self.requests_number):
+            ret = await self.m.accept_res.call(sim)
+            err, data = self.expected.popleft()
+
+            assert ret.error == err
+            if not err and data is not None:
+                assert ret.data == data
+
+            await self.random_wait_geom(sim, 0.7)
+
+        while not sim.get(self.m.store_buffer.empty):
+            await sim.tick()
+
+        assert self.mem == self.ref_mem
+        assert self.mmio_stores == self.mmio_stores_expected
+
+    def test_random(self):
+        with self.run_simulation(self.m) as sim:
+            sim.add_testbench(self.dcache_process, background=True)
+            sim.add_testbench(self.issue_process)
+            sim.add_testbench(self.accept_process)
+
+        # Some stores were coalesced in the buffer
+        assert self.cache_stores < self.stores_issued
+
+    def test_stores_dont_wait_for_memory(self):
+        async def process(sim: TestbenchContext):
+            for i in range(4):
+                await self.m.issue_req.call(sim, addr=4 * i, data=i, byte_mask=0xF, store=1)
+                await self.m.accept_res.call(sim)
+            assert self.cache_stores == 0
+
+        async def dcache_process(sim: TestbenchContext):
+            await self.tick(sim, 30)
+            await self.dcache_process(sim)
+
+        with self.run_simulation(self.m) as sim:
+            sim.add_testbench(dcache_process, background=True)
+            sim.add_testbench(process)
@@ -1,4 +1,5 @@
 from collections.abc import Iterable
+import pytest
 import random
 from collections import deque
 
@@ -313,20 +314,26 @@ class TestPipelinedWishboneMaster(TestCaseWithSimulator):
 
 
 class WishboneMemorySlaveCircuit(Elaboratable):
-    def __init__(self, wb_params: WishboneParameters, mem_args: dict):
+    def __init__(self, wb_params: WishboneParameters, mem_args: dict, pipelined: bool = False):
         self.wb_params = wb_params
         self.mem_args = mem_args
+        self.pipelined = pipelined
 
     def elaborate(self, platform):
         m = Module()
 
-        m.submodules.mem_slave = self.mem_slave = WishboneMemorySlave(self.wb_params, **self.mem_args)
-        m.submodules.mem_master = self.mem_master = WishboneMaster(self.wb_params)
+        m.submodules.mem_slave = self.mem_slave = WishboneMemorySlave(
+            self.wb_params, pipelined=self.pipelined, **self.mem_args
+        )
+        if self.pipelined:
+            m.submodules.mem_master = self.mem_master = PipelinedWishboneMaster(self.wb_params)
+            connect(m, self.mem_master.wb, self.mem_slave.bus)
+        else:
+            m.submodules.mem_master = self.mem_master = WishboneMaster(self.wb_params)
+            connect(m, self.mem_master.wb_master, self.mem_slave.bus)
         m.submodules.request = self.request = TestbenchIO(AdapterTrans.create(self.mem_master.request))
         m.submodules.result = self.result = TestbenchIO(AdapterTrans.create(self.mem_master.result))
 
-        connect(m, self.mem_master.wb_master, self.mem_slave.bus)
-
         return m
 
 
@@ -337,13 +344,16 @@ class TestWishboneMemorySlave(TestCaseWithSimulator):
 
         self.addr_width = (self.memsize - 1).bit_length()  # nearest log2 >= log2(memsize)
         self.wb_params = WishboneParameters(data_width=32, addr_width=self.addr_width, granularity=16)
-        self.m = WishboneMemorySlaveCircuit(wb_params=self.wb_params, mem_args={"depth": self.memsize, "init": []})
 
         self.sel_width = self.wb_params.data_width // self.wb_params.granularity
 
         random.seed(42)
 
-    def test_randomized(self):
+    @pytest.mark.parametrize("pipelined", [False, True])
+    def test_randomized(self, pipelined: bool):
+        self.m = WishboneMemorySlaveCircuit(
+            wb_params=self.wb_params, mem_args={"depth": self.memsize, "init": []}, pipelined=pipelined
+        )
         req_queue = deque()
 
         mem_state = [0] * self.memsize
@@ -375,9 +385,50 @@ class TestWishboneMemorySlave(TestCaseWithSimulator):
                             granularity_mask = (2**self.wb_params.granularity - 1) << (i * self.wb_params.granularity)
                             mem_state[req["addr"]] &= ~granularity_mask
                             mem_state[req["addr"]] |= req["data"] & granularity_mask
-                    val = sim.get(Value.cast(self.m.mem_slave.mem.data[req["addr"]]))
-                    assert val == mem_state[req["addr"]]
+                    # the pipelined master can already send younger writes
+                    if not pipelined:
+                        val = sim.get(Value.cast(self.m.mem_slave.mem.data[req["addr"]]))
+                        assert val == mem_state[req["addr"]]
+
+            for addr in range(self.memsize):
+                assert sim.get(Value.cast(self.m.mem_slave.mem.data[addr])) == mem_state[addr]
 
         with self.run_simulation(self.m, max_cycles=3000) as sim:
             sim.add_testbench(request_process)
             sim.add_testbench(result_process)
+
+    @pytest.mark.parametrize("bte", list(BurstType))
+    def test_burst(self, bte: BurstType):
+        self.m = WishboneMemorySlaveCircuit(
+            wb_params=self.wb_params, mem_args={"depth": self.memsize, "init": []}, pipelined=False
+        )
+        wrap = {BurstType.LINEAR: 0, BurstType.WRAP_4: 4, BurstType.WRAP_8: 8, BurstType.WRAP_16: 16}[bte]
+        beats = 16
+        mem_init = [random.randint(0, 2**self.wb_params.data_width - 1) for _ in range(self.memsize)]
+        self.m.mem_args["init"] = mem_init
+
+        start = random.randrange(0, self.memsize - beats)
+        addrs = [start]
+        for _ in range(beats - 1):
+            addr = addrs[-1] + 1
+            if wrap:
+                addr = addrs[-1] - addrs[-1] % wrap + addr % wrap
+            addrs.append(addr)
+
+        async def request_process(sim: TestbenchContext):
+            for i, addr in enumerate(addrs):
+                cti = CycleType.END_OF_BURST if i == beats - 1 else CycleType.INCR_BURST
+                await self.m.request.call(sim, addr=addr, data=0, we=0, sel=0, cti=cti, bte=bte)
+
+        async def result_process(sim: TestbenchContext):
+            res = await self.m.result.call(sim)
+            assert res["data"] == mem_init[addrs[0]]
+            for addr in addrs[1:]:
+                # the following beats of the burst are acknowledged in consecutive cycles
+                res = await self.m.result.call_try(sim)
+                assert res is not None
+                assert res["data"] == mem_init[addr]
+
+        with self.run_simulation(self.m, max_cycles=300) as sim:
+            sim.add_testbench(request_process)
+            sim.add_testbench(result_process)
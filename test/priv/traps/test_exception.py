@@ -1,5 +1,5 @@
 from amaranth import *
-from coreblocks.interface.layouts import ROBLayouts
+from coreblocks.interface.layouts import RATLayouts, ROBLayouts
 
 from coreblocks.priv.traps.exception import ExceptionInformationRegister
 from coreblocks.params import GenParams
@@ -27,20 +27,35 @@ class TestExceptionInformationRegister(TestCaseWithSimulator):
 
         return False
 
-    def test_randomized(self):
-        self.gen_params = GenParams(test_core_config)
-        random.seed(2)
-
-        self.cycles = 256
-
+    def create_circuit(self):
         self.rob_idx_mock = TestbenchIO(Adapter(o=self.gen_params.get(ROBLayouts).get_indices))
         self.fetch_stall_mock = TestbenchIO(Adapter())
+        self.fetch_cancel_stall_mock = TestbenchIO(Adapter())
+        self.active_tags_mock = TestbenchIO(Adapter(o=self.gen_params.get(RATLayouts).get_active_tags_out))
         self.dut = SimpleTestCircuit(
             ExceptionInformationRegister(
-                self.gen_params, self.rob_idx_mock.adapter.iface, self.fetch_stall_mock.adapter.iface
+                self.gen_params,
+                self.rob_idx_mock.adapter.iface,
+                self.fetch_stall_mock.adapter.iface,
+                self.fetch_cancel_stall_mock.adapter.iface,
+                self.active_tags_mock.adapter.iface,
             ),
         )
-        m = ModuleConnector(self.dut, rob_idx_mock=self.rob_idx_mock, fetch_stall_mock=self.fetch_stall_mock)
+        return ModuleConnector(
+            self.dut,
+            rob_idx_mock=self.rob_idx_mock,
+            fetch_stall_mock=self.fetch_stall_mock,
+            fetch_cancel_stall_mock=self.fetch_cancel_stall_mock,
+            active_tags_mock=self.active_tags_mock,
+        )
+
+    def test_randomized(self):
+        self.gen_params = GenParams(test_core_config)
+        random.seed(2)
+
+        self.cycles = 256
+
+        m = self.create_circuit()
 
         self.rob_id = 0
 
@@ -58,7 +73,14 @@ class TestExceptionInformationRegister(TestCaseWithSimulator):
                     report_rob = random.randint(0, self.rob_max)
                 report_pc = random.randrange(2**self.gen_params.isa.xlen)
                 report_mtval = random.randrange(2**self.gen_params.isa.xlen)
-                report_arg = {"cause": cause, "rob_id": report_rob, "pc": report_pc, "mtval": report_mtval}
+                report_tag = random.randrange(2**self.gen_params.tag_bits)
+                report_arg = {
+                    "cause": cause,
+                    "rob_id": report_rob,
+                    "pc": report_pc,
+                    "mtval": report_mtval,
+                    "tag": report_tag,
+                }
 
                 expected = report_arg if self.should_update(report_arg, saved_entry, self.rob_id) else saved_entry
                 res1, res2 = (
@@ -76,5 +98,60 @@ class TestExceptionInformationRegister(TestCaseWithSimulator):
         def process_rob_idx_mock():
             return {"start": self.rob_id, "end": 0}
 
+        @def_method_mock(lambda: self.active_tags_mock)
+        def process_active_tags_mock():
+            tags_count = 2**self.gen_params.tag_bits
+            return {"active_tags": [1] * tags_count, "checkpointed_tags": [0] * tags_count}
+
+        with self.run_simulation(m) as sim:
+            sim.add_testbench(process_test)
+
+    def test_rollback(self):
+        self.gen_params = GenParams(test_core_config)
+        tags_count = 2**self.gen_params.tag_bits
+
+        m = self.create_circuit()
+
+        self.active_tags = [1] * tags_count
+        self.cancel_count = 0
+
+        async def process_test(sim: TestbenchContext):
+            self.fetch_stall_mock.enable(sim)
+
+            report_arg = {"cause": ExceptionCause.ILLEGAL_INSTRUCTION, "rob_id": 3, "pc": 0x100, "mtval": 0, "tag": 2}
+            await self.dut.report.call(sim, report_arg)
+
+            # A rollback which doesn't squash the exception
+            self.active_tags[3] = 0
+            await self.dut.rollback.call(sim, tag=2)
+            await self.tick(sim, 2)
+            assert self.cancel_count == 0
+            assert data_const_to_dict(await self.dut.get.call(sim)) == report_arg | {"valid": 1}
+
+            # Exceptions of squashed instructions are ignored
+            await self.dut.report.call(sim, report_arg | {"rob_id": 2, "tag": 3})
+            assert data_const_to_dict(await self.dut.get.call(sim)) == report_arg | {"valid": 1}
+
+            # A rollback which squashes the exception
+            self.active_tags[2] = 0
+            await self.dut.rollback.call(sim, tag=1)
+            await self.tick(sim, 2)
+            assert self.cancel_count == 1
+            assert not (await self.dut.get.call(sim)).valid
+
+        @def_method_mock(lambda: self.rob_idx_mock)
+        def process_rob_idx_mock():
+            return {"start": 0, "end": 0}
+
+        @def_method_mock(lambda: self.active_tags_mock)
+        def process_active_tags_mock():
+            return {"active_tags": self.active_tags, "checkpointed_tags": [0] * tags_count}
+
+        @def_method_mock(lambda: self.fetch_cancel_stall_mock)
+        def process_fetch_cancel_stall_mock():
+            @MethodMock.effect
+            def eff():
+                self.cancel_count += 1
+
         with self.run_simulation(m) as sim:
             sim.add_testbench(process_test)
@@ -16,6 +16,7 @@ from cocotb.result import SimTimeoutError
 from .memory import *
 from .common import SimulationBackend, SimulationExecutionResult
 
+from coreblocks.peripherals.wishbone import CycleType, BurstType
 from transactron.profiler import CycleProfile, MethodSamples, Profile, ProfileSamples, TransactionSamples
 from transactron.utils.gen import GenerationInfo
 
@@ -26,6 +27,8 @@ class WishboneMasterSignals:
     we: Any = 0
     sel: Any = 0
     dat_w: Any = 0
+    cti: Any = 0
+    bte: Any = 0
 
 
 @dataclass
@@ -38,7 +41,7 @@ class WishboneSlaveSignals:
 
 class WishboneBus(Bus):
     _signals = ["cyc", "stb", "we", "adr", "dat_r", "dat_w", "ack"]
-    _optional_signals = ["sel", "err", "rty"]
+    _optional_signals = ["sel", "err", "rty", "cti", "bte"]
 
     cyc: ModifiableObject
     stb: ModifiableObject
@@ -50,6 +53,8 @@ class WishboneBus(Bus):
     sel: ModifiableObject
     err: ModifiableObject
     rty: ModifiableObject
+    cti: ModifiableObject
+    bte: ModifiableObject
 
     def __init__(self, entity, name):
         # case_insensitive is a workaround for cocotb_bus/verilator problem
@@ -74,9 +79,21 @@ class WishboneSlave:
         self.bus = WishboneBus(entity, name)
         self.bus.drive(WishboneSlaveSignals())
 
+    @staticmethod
+    def burst_next_address(adr: int, bte: int) -> int:
+        wrap_mask = {BurstType.LINEAR: 0, BurstType.WRAP_4: 0b11, BurstType.WRAP_8: 0b111, BurstType.WRAP_16: 0b1111}[
+            BurstType(bte)
+        ]
+        if not wrap_mask:
+            return adr + 1
+        return (adr & ~wrap_mask) | ((adr + 1) & wrap_mask)
+
     async def start(self):
         clock_edge_event = FallingEdge(self.clock)
 
+        # address of the next beat of an incrementing burst
+        burst_addr = None
+
         while True:
             while not (self.bus.stb.value and self.bus.cyc.value):
                 await clock_edge_event  # type: ignore
@@ -84,6 +101,12 @@ class WishboneSlave:
             sig_m = WishboneMasterSignals()
             self.bus.sample(sig_m)
 
+            # The next beat of a burst is answered without waiting, like in a slave with registered feedback
+            continues_burst = not sig_m.we and sig_m.adr == burst_addr
+            burst_addr = None
+            if sig_m.cti == CycleType.INCR_BURST:
+                burst_addr = self.burst_next_address(int(sig_m.adr), int(sig_m.bte))
+
             addr = sig_m.adr << self.word_bits
 
             sig_s = WishboneSlaveSignals()
@@ -119,8 +142,9 @@ class WishboneSlave:
                         raise ValueError("Bus doesn't support rty")
                     sig_s.rty = 1
 
-            for _ in range(self.delay):
-                await clock_edge_event  # type: ignore
+            if not continues_burst:
+                for _ in range(self.delay):
+                    await clock_edge_event  # type: ignore
 
             self.bus.drive(sig_s)
             await clock_edge_event  # type: ignore
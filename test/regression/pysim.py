@@ -24,6 +24,7 @@ from transactron.lib.metrics import HardwareMetricsManager
 from ..peripherals.test_wishbone import WishboneInterfaceWrapper
 
 from coreblocks.core import Core
+from coreblocks.peripherals.wishbone import CycleType, burst_next_address
 from coreblocks.params import GenParams
 from coreblocks.params.configurations import full_core_config
 
@@ -44,8 +45,20 @@ class PySimulation(SimulationBackend):
         self, mem_model: CoreMemoryModel, wb_ctrl: WishboneInterfaceWrapper, is_instr_bus: bool, delay: int = 0
     ):
         async def f(sim: TestbenchContext):
+            # address of the next beat of an incrementing burst
+            burst_addr = None
+
             while True:
-                await wb_ctrl.slave_wait(sim)
+                # The next beat of a burst is answered without waiting, like in a slave with registered feedback
+                continues_burst = (
+                    burst_addr is not None
+                    and sim.get(wb_ctrl.wb.stb)
+                    and sim.get(wb_ctrl.wb.cyc)
+                    and not sim.get(wb_ctrl.wb.we)
+                    and sim.get(wb_ctrl.wb.adr) == burst_addr
+                )
+                if not continues_burst:
+                    await wb_ctrl.slave_wait(sim)
 
                 word_width_bytes = self.gp.isa.xlen // 8
 
@@ -80,8 +93,13 @@ class PySimulation(SimulationBackend):
                     case ReplyStatus.RETRY:
                         rty = 1
 
-                for _ in range(delay):
-                    await sim.tick()
+                if not continues_burst:
+                    for _ in range(delay):
+                        await sim.tick()
+
+                burst_addr = None
+                if sim.get(wb_ctrl.wb.cti) == CycleType.INCR_BURST:
+                    burst_addr = sim.get(burst_next_address(wb_ctrl.wb.adr, wb_ctrl.wb.bte))
 
                 await wb_ctrl.slave_respond(sim, resp_data, ack=ack, err=err, rty=rty)
 
@@ -41,10 +41,18 @@ class CoreTestElaboratable(Elaboratable):
         # Align the size of the memory to the length of a cache line.
         instr_mem_depth = align_to_power_of_two(len(self.instr_mem), self.gen_params.icache_params.line_bytes_log)
         self.wb_mem_slave = WishboneMemorySlave(
-            wb_params=self.gen_params.wb_params, shape=32, depth=instr_mem_depth, init=self.instr_mem
+            wb_params=self.gen_params.wb_params,
+            pipelined=self.gen_params.wb_instr_pipelined,
+            shape=32,
+            depth=instr_mem_depth,
+            init=self.instr_mem,
         )
         self.wb_mem_slave_data = WishboneMemorySlave(
-            wb_params=self.gen_params.wb_params, shape=32, depth=len(self.data_mem), init=self.data_mem
+            wb_params=self.gen_params.wb_params,
+            pipelined=self.gen_params.wb_data_pipelined,
+            shape=32,
+            depth=len(self.data_mem),
+            init=self.data_mem,
         )
 
         self.core = Core(gen_params=self.gen_params)
@@ -146,6 +154,13 @@ class TestCoreAsmSourceBase(TestCoreBase):
         ("fibonacci", "fibonacci.asm", 500, {2: 2971215073}, basic_core_config),
         ("fibonacci_mem", "fibonacci_mem.asm", 400, {3: 55}, basic_core_config),
         ("fibonacci_mem_tiny", "fibonacci_mem.asm", 250, {3: 55}, tiny_core_config),
+        (
+            "fibonacci_mem_pipelined",
+            "fibonacci_mem.asm",
+            400,
+            {3: 55},
+            basic_core_config.replace(wb_instr_pipelined=True, wb_data_pipelined=True),
+        ),
         ("csr", "csr.asm", 200, {1: 1, 2: 4}, full_core_config),
         ("csr_mmode", "csr_mmode.asm", 1000, {1: 0, 2: 44, 3: 0, 4: 0, 5: 0, 6: 4, 15: 0}, full_core_config),
         ("exception", "exception.asm", 200, {1: 1, 2: 2}, basic_core_config),